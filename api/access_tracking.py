@@ -0,0 +1,80 @@
+"""Buffered tracking of CommonModel dateaccessed
+
+Accessed (model, pk) pairs are collected in memory and written
+as single UPDATE per model when buffer flushes. Buffer is never flushed
+while records are loaded, so reads do not write: it flushes on request end
+and in long-running loops by flush_if_needed() when buffer overflows
+ACCESS_TRACKING_BUFFER_SIZE or ACCESS_TRACKING_FLUSH_INTERVAL seconds
+passed since first access
+"""
+
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.utils import timezone
+
+
+class AccessBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.accessed = defaultdict(set)
+        self.size = 0
+        self.started = None
+
+    def touch(self, model, pk):
+        """Remembers access to model record
+        """
+
+        with self.lock:
+            pks = self.accessed[model]
+
+            if pk in pks:
+                return
+
+            pks.add(pk)
+            self.size += 1
+
+            if self.started is None:
+                self.started = time.monotonic()
+
+    def is_flush_needed(self) -> bool:
+        with self.lock:
+            return self.size >= settings.ACCESS_TRACKING_BUFFER_SIZE or \
+                self.started is not None and time.monotonic() - self.started >= settings.ACCESS_TRACKING_FLUSH_INTERVAL
+
+    def flush_if_needed(self) -> int:
+        """Flushes buffer if it is full or too old
+
+        Returns count of written records
+        """
+
+        return self.flush() if self.is_flush_needed() else 0
+
+    def flush(self) -> int:
+        """Writes dateaccessed of all buffered records
+
+        Returns count of written records
+        """
+
+        with self.lock:
+            accessed, self.accessed = self.accessed, defaultdict(set)
+            self.size = 0
+            self.started = None
+
+        now = timezone.now()
+        count = 0
+
+        for model, pks in accessed.items():
+            count += model.objects.filter(pk__in=pks).update(dateaccessed=now)
+
+        return count
+
+    def clear(self):
+        with self.lock:
+            self.accessed = defaultdict(set)
+            self.size = 0
+            self.started = None
+
+
+buffer = AccessBuffer()
@@ -1,12 +1,21 @@
+from datetime import timedelta
+import json
+import os
 from api.utilities import Utilities, ReadAPI, WriteAPI, EventImportAPI
-from api.importers import ReferenceImporter
+import api.import_jobs as import_jobs
+from api.free_time import find_free_time
+import api.placement as placement
 import api.utility_filters as filters
 from django.contrib import admin, messages
 from django.contrib.admin.actions import delete_selected
+from django.core.files import File
+from django.core.files.storage import default_storage
 from django.forms import BaseInlineFormSet
 from django.utils import timezone
+from django.utils.html import format_html
 from django.urls import path
 from django.http import HttpResponseRedirect
+from django.shortcuts import render
 from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
 from rest_framework.authtoken.admin import TokenAdmin
 from api.models import (
@@ -26,10 +35,24 @@ from api.models import (
     TimeSlot,
     DayDateOverride,
     EventCancel,
-    AbstractEventChanges
+    AbstractEventChanges,
+    ImportJob
 )
 
 
+def enqueue_import(request, kind : str, file, options : dict|None = None) -> ImportJob:
+    """Queues import of uploaded file and shows link to its job
+    """
+
+    job = import_jobs.enqueue(kind, file, options, request.user)
+    messages.success(
+        request,
+        format_html('Файл поставлен в очередь импорта: <a href="{}">задача №{}</a>', job.get_absolute_url(), job.pk)
+    )
+
+    return job
+
+
 class BaseAdmin(admin.ModelAdmin):
     readonly_fields = ("dateaccessed", "datemodified", "datecreated")
 
@@ -51,8 +74,7 @@ class SubjectAdmin(BaseAdmin):
 
     def import_subject_reference(self, request):
         if request.method == "POST" and request.FILES.get("subject_reference_file"):
-            ReferenceImporter.import_subject_reference(request.FILES['subject_reference_file'].read())
-            messages.success(request, "Импорт успешно произведён")
+            enqueue_import(request, ImportJob.Kind.SUBJECTS, request.FILES['subject_reference_file'])
 
         return HttpResponseRedirect("../")
 
@@ -63,6 +85,9 @@ class EventParticipantAdmin(BaseAdmin):
     list_display = ("name", "role")
     search_fields = ("name", "role")
     list_filter = ("role",)
+    actions = ["find_free_time"]
+    FREE_TIME_DAYS = 14
+    FREE_TIME_LIMIT = 10
 
     def get_urls(self):
         return [path("import_teacher_reference/", self.import_teacher_reference),
@@ -70,18 +95,35 @@ class EventParticipantAdmin(BaseAdmin):
 
     def import_teacher_reference(self, request):
         if request.method == "POST" and request.FILES.get("teacher_reference_file"):
-            ReferenceImporter.import_teacher_reference(request.FILES['teacher_reference_file'].read())
-            messages.success(request, "Импорт успешно произведён")
+            enqueue_import(request, ImportJob.Kind.TEACHERS, request.FILES['teacher_reference_file'])
 
         return HttpResponseRedirect("../")
     
     def import_student_reference(self, request):
         if request.method == "POST" and request.FILES.get("student_reference_file"):
-            ReferenceImporter.import_student_reference(request.FILES['student_reference_file'].read())
-            messages.success(request, "Импорт успешно произведён")
+            enqueue_import(request, ImportJob.Kind.STUDENTS, request.FILES['student_reference_file'])
 
         return HttpResponseRedirect("../")
 
+    @admin.action(description="Найти общее свободное время")
+    def find_free_time(modeladmin, request, queryset):
+        """Shows nearest dates, TimeSlots and EventPlaces when all selected participants are free
+        """
+
+        date_from = timezone.localdate()
+        free_time = find_free_time(
+            list(queryset.values_list("pk", flat=True)),
+            date_from,
+            date_from + timedelta(days=modeladmin.FREE_TIME_DAYS - 1),
+            limit=modeladmin.FREE_TIME_LIMIT
+        )
+
+        for candidate in free_time:
+            messages.info(request, repr(candidate))
+
+        if not free_time:
+            messages.warning(request, f"В ближайшие {modeladmin.FREE_TIME_DAYS} дней общее свободное время не найдено")
+
 
 @admin.register(EventPlace)
 class EventPlaceAdmin(BaseAdmin):
@@ -95,8 +137,7 @@ class EventPlaceAdmin(BaseAdmin):
 
     def import_place_reference(self, request):
         if request.method == "POST" and request.FILES.get("place_reference_file"):
-            ReferenceImporter.import_place_reference(request.FILES['place_reference_file'].read())
-            messages.success(request, "Импорт успешно произведён")
+            enqueue_import(request, ImportJob.Kind.PLACES, request.FILES['place_reference_file'])
 
         return HttpResponseRedirect("../")
 
@@ -147,7 +188,7 @@ class ScheduleAdmin(BaseAdmin):
         "metadata__years"
     )
 
-    actions = ["extended_delete"]
+    actions = ["extended_delete", "check_conflicts"]
 
     def get_urls(self):
         return [path("import_schedule/", self.import_schedule_data),
@@ -156,10 +197,9 @@ class ScheduleAdmin(BaseAdmin):
     def import_schedule_data(self, request):
         if request.method == "POST" and request.FILES.get("selected_file"):
             if "common_import" in request.POST:
-                ReferenceImporter.import_schedule(request.FILES['selected_file'].read(), True)
+                enqueue_import(request, ImportJob.Kind.SCHEDULES, request.FILES['selected_file'], {"save_archive_schedules" : True})
             elif "delete_import" in request.POST:
-                ReferenceImporter.import_schedule(request.FILES['selected_file'].read(), False)
-            messages.success(request, "Импорт успешно произведён")
+                enqueue_import(request, ImportJob.Kind.SCHEDULES, request.FILES['selected_file'], {"save_archive_schedules" : False})
 
         return HttpResponseRedirect("../")
     
@@ -180,6 +220,21 @@ class ScheduleAdmin(BaseAdmin):
 
         messages.success(request, "Успешно удалены")
 
+    @admin.action(description="Проверить на накладки в расписании")
+    def check_conflicts(modeladmin, request, queryset):
+        """Checks all AbstractEvents of selected Schedules for double usage
+        """
+
+        is_any_warning_shown = False
+
+        for _, message in Utilities.check_abstract_events(AbstractEvent.objects.filter(schedule__in=queryset)):
+            is_any_warning_shown = True
+
+            messages.warning(request, message)
+
+        if not is_any_warning_shown:
+            messages.success(request, "В выбранных расписаниях накладки не найдены")
+
     @admin.display(description=Schedule._meta.get_field("schedule_template").verbose_name, 
                    ordering="schedule_template__metadata__faculty")
     def faculty(self, obj):
@@ -225,6 +280,30 @@ class EventAdmin(BaseAdmin):
     search_fields = ("participants_override__name", "subject_override__name", "places_override__building", "places_override__room", "kind_override__name", "date")
     list_filter = (EventOverridenFilter, "kind_override", "is_event_canceled")
 
+    actions = ["check_conflicts"]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+
+        # warns about double usage on every save
+        for _, message in Utilities.check_events([form.instance]):
+            messages.warning(request, message)
+
+    @admin.action(description="Проверить на накладки в расписании")
+    def check_conflicts(modeladmin, request, queryset):
+        """Checks selected Events for double usage by other Events on the same dates
+        """
+
+        is_any_warning_shown = False
+
+        for _, message in Utilities.check_events(queryset):
+            is_any_warning_shown = True
+
+            messages.warning(request, message)
+
+        if not is_any_warning_shown:
+            messages.success(request, "В выбранных событиях накладки не найдены")
+
     @admin.display(description=AbstractEvent._meta.get_field("abstract_day").verbose_name, 
                    ordering="name")
     def abstract_day(self, obj):
@@ -298,16 +377,80 @@ class AbstractEventAdmin(BaseAdmin):
     search_fields = ("participants__name", "subject__name", "places__building", "places__room", "kind__name")
     list_filter = ("kind__name",)
 
-    actions = ["delete_events", "fill", "check_fields"]
+    actions = ["delete_events", "fill", "check_fields", "place"]
 
     def get_urls(self):
-        return [path("import_data/", self.import_event_data)] + super().get_urls()
+        return [path("import_data/", self.import_event_data),
+                path("preview_import_data/", self.preview_import_data),
+                path("cancel_import_preview/", self.cancel_import_preview)] + super().get_urls()
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+
+        # warns about double usage on every save
+        is_double_usage_found, message = Utilities.check_abstract_event(
+            form.instance, form.cleaned_data.get("participants"), form.cleaned_data.get("places")
+        )
+
+        if is_double_usage_found:
+            messages.warning(request, message)
 
     def import_event_data(self, request):
-        if request.method == "POST" and request.FILES.get("selected_file"):
-            ## TODO: when working with big files should use chunks() instead
-            EventImportAPI.import_event_data(request.FILES['selected_file'].read())
-            messages.success(request, "Импорт успешно произведён")
+        if request.method != "POST":
+            return HttpResponseRedirect("../")
+
+        if request.FILES.get("selected_file"):
+            enqueue_import(request, ImportJob.Kind.EVENTS, request.FILES['selected_file'])
+        elif request.session.get("import_preview"):
+            # file checked on preview page
+            name = request.session.pop("import_preview")
+
+            if not default_storage.exists(name):
+                messages.error(request, "Проверенный файл устарел, загрузите его повторно")
+
+                return HttpResponseRedirect("../")
+
+            try:
+                with default_storage.open(name, "rb") as file:
+                    enqueue_import(request, ImportJob.Kind.EVENTS, File(file, name=os.path.basename(name)))
+            finally:
+                import_jobs.delete_preview(name)
+
+        return HttpResponseRedirect("../")
+
+    def preview_import_data(self, request):
+        """Shows what import of uploaded file would do,
+        file is kept until import is confirmed or canceled
+        """
+
+        if request.method != "POST" or not request.FILES.get("selected_file"):
+            return HttpResponseRedirect("../")
+
+        import_jobs.delete_preview(request.session.pop("import_preview", None))
+        name = import_jobs.store_preview(request.FILES["selected_file"])
+
+        try:
+            with default_storage.open(name, "rb") as data_file:
+                plan = EventImportAPI.plan_event_import(data_file)
+        except Exception as e:
+            import_jobs.delete_preview(name)
+            messages.error(request, f"Файл не может быть импортирован: {e}")
+
+            return HttpResponseRedirect("../")
+
+        request.session["import_preview"] = name
+
+        return render(request, "api/abstractEventImportPreview.html", {
+            **self.admin_site.each_context(request),
+            "opts" : self.model._meta,
+            "title" : "Проверка импорта расписания",
+            "plan" : plan,
+            "plan_json" : json.dumps(plan, ensure_ascii=False, indent=4)
+        })
+
+    def cancel_import_preview(self, request):
+        if request.method == "POST":
+            import_jobs.delete_preview(request.session.pop("import_preview", None))
 
         return HttpResponseRedirect("../")
 
@@ -336,17 +479,32 @@ class AbstractEventAdmin(BaseAdmin):
         
         is_any_warning_shown = False
 
-        for ae in queryset:
-            is_double_usage_found, message = Utilities.check_abstract_event(ae)
-
-            if is_double_usage_found:
-                is_any_warning_shown = True
+        for _, message in Utilities.check_abstract_events(queryset):
+            is_any_warning_shown = True
 
-                messages.warning(request, message)
+            messages.warning(request, message)
 
         if not is_any_warning_shown:
             messages.success(request, "В выбранных запланированных событиях накладки не найдены")
 
+    @admin.action(description="Расставить автоматически")
+    def place(modeladmin, request, queryset):
+        """Places selected AbstractEvents into free days, time slots and places of its schedules
+        """
+
+        for schedule_pk in queryset.order_by("schedule").values_list("schedule", flat=True).distinct():
+            try:
+                solution = placement.place_abstract_events(queryset.filter(schedule=schedule_pk))
+            except ValueError as e:
+                messages.error(request, str(e))
+
+                continue
+
+            if solution.unplaced:
+                messages.warning(request, f"{Schedule.objects.get(pk=schedule_pk)}: {solution!r}")
+            else:
+                messages.success(request, f"{Schedule.objects.get(pk=schedule_pk)}: {solution!r}")
+
 
 @admin.register(AbstractDay)
 class AbstractDayAdmin(BaseAdmin):
@@ -394,15 +552,13 @@ class DepartmentAdmin(BaseAdmin):
 
     def import_faculty_reference(self, request):
         if request.method == "POST" and request.FILES.get("faculty_reference_file"):
-            ReferenceImporter.import_faculty_reference(request.FILES['faculty_reference_file'].read())
-            messages.success(request, "Импорт успешно произведён")
+            enqueue_import(request, ImportJob.Kind.FACULTIES, request.FILES['faculty_reference_file'])
 
         return HttpResponseRedirect("../")
     
     def import_department_reference(self, request):
         if request.method == "POST" and request.FILES.get("department_reference_file"):
-            ReferenceImporter.import_department_reference(request.FILES['department_reference_file'].read())
-            messages.success(request, "Импорт успешно произведён")
+            enqueue_import(request, ImportJob.Kind.DEPARTMENTS, request.FILES['department_reference_file'])
 
         return HttpResponseRedirect("../")
 
@@ -481,4 +637,25 @@ class EventCancelAdmin(BaseAdmin):
     search_fields = ("date", "department")
 
 
+
+@admin.register(ImportJob)
+class ImportJobAdmin(BaseAdmin):
+    list_display = ("pk", "kind", "status", "progress", "datecreated", "started_at", "finished_at")
+    list_filter = ("status", "kind")
+    readonly_fields = BaseAdmin.readonly_fields + (
+        "kind", "status", "file", "options", "processed", "total", "stages", "result", "error", "started_at", "finished_at"
+    )
+
+    def has_add_permission(self, request):
+        # jobs are created by import forms of other models
+        return False
+
+    @admin.display(description="Обработано записей")
+    def progress(self, obj):
+        if obj.total:
+            return f"{obj.processed} из {obj.total} ({obj.processed * 100 // obj.total}%)"
+
+        return obj.processed
+
+
 TokenAdmin.raw_id_fields = ["user"]
\ No newline at end of file
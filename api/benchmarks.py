@@ -0,0 +1,803 @@
+"""Synthetic datasets and scenarios used by `py manage.py benchmark`
+
+Every scenario returns a list of measurements:
+    [(name, seconds, queries), ...]
+"""
+
+import json
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.utils.html import format_html
+from django.utils.safestring import SafeText, mark_safe
+from api.utilities import Utilities, WriteAPI, EventImportAPI
+from api.free_time import find_free_time, get_days
+from api.importers import ReferenceImporter
+import api.room_occupancy as room_occupancy
+import api.conflicts as conflicts
+import api.placement as placement
+import api.instrumentation as instrumentation
+from api.models import (
+    AbstractEvent,
+    AbstractDay,
+    ScheduleTemplateMetadata,
+    ScheduleMetadata,
+    ScheduleTemplate,
+    Schedule,
+    Department,
+    Organization,
+    Event,
+    EventKind,
+    EventParticipant,
+    EventPlace,
+    Subject,
+    TimeSlot,
+    DayDateOverride,
+    EventCancel,
+)
+
+
+class QueryCounter:
+    """Counts SQL queries executed by connection
+
+    Unlike CaptureQueriesContext not stores queries, so can be used
+    for operations with unlimited queries count
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def measure(results : list, name : str):
+    """Measures wall time and queries count of block and appends it into results
+    """
+
+    counter = QueryCounter()
+    started = time.perf_counter()
+
+    with connection.execute_wrapper(counter):
+        yield
+
+    results.append((name, time.perf_counter() - started, counter.count))
+
+
+@contextmanager
+def measure_memory(results : list, name : str):
+    """Measures peak of memory allocated by Python inside block and appends it into results
+    """
+
+    tracemalloc.start()
+
+    try:
+        yield
+    finally:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    results.append((f"{name}: пик памяти {peak / 2 ** 20:.1f} МБ", 0, 0))
+
+
+class SyntheticUniversity:
+    """Creates department-sized schedule with two-week repeating AbstractEvents
+
+    Every group has LESSONS_PER_GROUP lessons in two weeks,
+    every lesson has group, teacher and place
+    """
+
+    LESSONS_PER_GROUP = 20
+    TEACHERS_PER_GROUP = 3
+    START_DATE = date(2024, 9, 2)
+    END_DATE = date(2025, 1, 26)
+
+    def __init__(self, groups_count : int):
+        self.groups_count = groups_count
+
+        WriteAPI.create_common_abstract_days()
+        WriteAPI.create_common_time_slots()
+
+        organization = Organization.objects.create(name="Benchmark")
+        self.department = Department.objects.create(name="Benchmark", code="bench", organization=organization)
+        schedule_template = ScheduleTemplate.objects.create(
+            metadata=ScheduleTemplateMetadata.objects.create(faculty="BENCH", scope=ScheduleTemplateMetadata.Scope.BACHELOR),
+            repetition_period=14,
+            repeatable=True,
+            aligned_by_week_day=1,
+            department=self.department
+        )
+        self.schedule = Schedule.objects.create(
+            metadata=ScheduleMetadata.objects.create(years="2024-2025", course=1, semester=1),
+            start_date=self.START_DATE,
+            end_date=self.END_DATE,
+            starting_day_number=AbstractDay.objects.get(day_number=0),
+            schedule_template=schedule_template
+        )
+
+        self.abstract_days = list(AbstractDay.objects.filter(day_number__lt=13).exclude(day_number=6).order_by("day_number"))
+        self.time_slots = list(TimeSlot.objects.order_by("start_time"))
+        self.kind = EventKind.objects.create(name="Лекция")
+        self.subjects = Subject.objects.bulk_create([Subject(name=f"Предмет {i}") for i in range(self.LESSONS_PER_GROUP)])
+        self.groups = EventParticipant.objects.bulk_create([
+            EventParticipant(name=f"ГР-{i}", role=EventParticipant.Role.STUDENT, is_group=True, department=self.department)
+            for i in range(groups_count)
+        ])
+        self.teachers = EventParticipant.objects.bulk_create([
+            EventParticipant(name=f"Преподаватель {i}", role=EventParticipant.Role.TEACHER, department=self.department)
+            for i in range(groups_count * self.TEACHERS_PER_GROUP)
+        ])
+        self.places = EventPlace.objects.bulk_create([
+            EventPlace(building="Б", room=str(100 + i)) for i in range(groups_count * 2)
+        ])
+
+        self.create_abstract_events()
+        self.create_calendar_exceptions()
+
+    def create_abstract_events(self):
+        """Creates AbstractEvents without Events
+        """
+
+        abstract_events = []
+        participants = []
+        places = []
+
+        for group_index, group in enumerate(self.groups):
+            for lesson_index in range(self.LESSONS_PER_GROUP):
+                abstract_events.append(AbstractEvent(
+                    kind=self.kind,
+                    subject=self.subjects[lesson_index],
+                    abstract_day=self.abstract_days[lesson_index % len(self.abstract_days)],
+                    time_slot=self.time_slots[(lesson_index + group_index) % 4],
+                    schedule=self.schedule
+                ))
+
+        AbstractEvent.objects.bulk_create(abstract_events)
+
+        for i, ae in enumerate(abstract_events):
+            group_index = i // self.LESSONS_PER_GROUP
+
+            participants.append(AbstractEvent.participants.through(abstractevent_id=ae.pk, eventparticipant_id=self.groups[group_index].pk))
+            participants.append(AbstractEvent.participants.through(
+                abstractevent_id=ae.pk,
+                eventparticipant_id=self.teachers[group_index * self.TEACHERS_PER_GROUP + i % self.TEACHERS_PER_GROUP].pk
+            ))
+            places.append(AbstractEvent.places.through(abstractevent_id=ae.pk, eventplace_id=self.places[i % len(self.places)].pk))
+
+        AbstractEvent.participants.through.objects.bulk_create(participants)
+        AbstractEvent.places.through.objects.bulk_create(places)
+
+        self.abstract_events = AbstractEvent.objects.filter(schedule=self.schedule)
+
+    def create_calendar_exceptions(self):
+        """Creates holidays and transferred days
+        """
+
+        DayDateOverride.objects.create(day_source=date(2024, 11, 4), day_destination=date(2024, 11, 2), department=self.department)
+        DayDateOverride.objects.create(day_source=date(2024, 12, 30), day_destination=date(2024, 12, 28), department=self.department)
+        EventCancel.objects.create(date=date(2024, 12, 31), department=self.department)
+        EventCancel.objects.create(date=date(2025, 1, 7), department=self.department)
+
+
+def events_snapshot(events) -> list[tuple]:
+    """Returns comparable state of given Events
+    """
+
+    snapshot = []
+
+    for e in events.prefetch_related("participants_override", "places_override"):
+        snapshot.append((
+            e.abstract_event_id,
+            e.date,
+            e.date_override_id,
+            e.kind_override_id,
+            e.subject_override_id,
+            e.time_slot_override_id,
+            e.is_event_canceled,
+            e.event_cancel_id,
+            tuple(sorted(p.pk for p in e.participants_override.all())),
+            tuple(sorted(p.pk for p in e.places_override.all()))
+        ))
+
+    return sorted(snapshot)
+
+
+def legacy_check_event(event : Event, created : bool):
+    """Event pre_save handler used before calendar index and changes tracking
+
+    Related objects are accessed the same way, so the same queries are made
+    """
+
+    previous_event = None
+
+    if not created:
+        previous_event = Event.objects.get(pk=event.pk)
+
+        # check for override by non m2m fields
+        if not event.is_event_overriden:
+            if event.kind_override != event.abstract_event.kind or \
+                event.subject_override != event.abstract_event.subject or \
+                event.time_slot_override != event.abstract_event.time_slot or \
+                event.is_event_canceled and not event.event_cancel:
+                event.is_event_overriden = True
+
+    if not event.date_override:
+        date_overrides = DayDateOverride.objects.filter(day_source=event.date, department=event.department)
+
+        if date_overrides.exists():
+            date_override = date_overrides.first()
+            event.date = date_override.day_destination
+            event.date_override = date_override
+    elif event.date_override.day_destination != event.date:
+        event.date_override = None
+
+    # skip manualy canceled events
+    if (created or previous_event.date != event.date) and not (event.is_event_canceled and not event.event_cancel):
+        event_cancels = EventCancel.objects.filter(department=event.department, date=event.date)
+
+        if event_cancels.exists():
+            event.is_event_canceled = True
+            event.event_cancel = event_cancels.first()
+        else:
+            event.is_event_canceled = False
+            event.event_cancel = None
+
+    if not created and not event.is_event_canceled and not previous_event.event_cancel and event.event_cancel:
+        event.is_event_canceled = True
+
+
+def legacy_save(event : Event):
+    """Event save() used before calendar index and changes tracking
+
+    Row is written without current save hooks, so only legacy queries are made
+    """
+
+    created = event.pk is None
+    legacy_check_event(event, created)
+
+    if created:
+        Event.objects.bulk_create([event])
+    else:
+        Event.objects.filter(pk=event.pk).update(**{
+            f.attname : getattr(event, f.attname) for f in Event._meta.concrete_fields if not f.primary_key
+        })
+
+
+def legacy_add(event : Event, field : str, related_field : str, objs : list):
+    """Event m2m add() and its m2m_changed handler used before changes tracking
+    """
+
+    if not objs:
+        return
+
+    through = getattr(Event, field).through
+    existing = set(through.objects.filter(event=event, **{f"{related_field}__in" : objs}).values_list(related_field, flat=True))
+
+    through.objects.bulk_create([through(event=event, **{related_field : obj}) for obj in objs if obj.pk not in existing])
+
+    ae_field = field.removesuffix("_override")
+
+    if not event.is_event_overriden and list(getattr(event, field).all()) != list(getattr(event.abstract_event, ae_field).all()):
+        event.is_event_overriden = True
+
+        legacy_save(event)
+
+
+def legacy_create_event(date_ : date, abstract_event : AbstractEvent):
+    """WriteAPI.create_event used before bulk materialization
+    """
+
+    event = Event()
+
+    event.date = date_
+    event.kind_override = abstract_event.kind
+    event.subject_override = abstract_event.subject
+    event.time_slot_override = abstract_event.time_slot
+    event.abstract_event = abstract_event
+    event.is_event_canceled = False
+
+    legacy_save(event)
+
+    legacy_add(event, "participants_override", "eventparticipant", list(abstract_event.participants.all()))
+    legacy_add(event, "places_override", "eventplace", list(abstract_event.places.all()))
+
+
+def legacy_fill(abstract_event : AbstractEvent):
+    """Per-Event semester filling used before bulk materialization,
+    copy of WriteAPI.fill_semester_by_repeating of that time
+    """
+
+    if abstract_event.holds_on_date != None:
+        legacy_create_event(abstract_event.holds_on_date, abstract_event)
+    else:
+        semester_start_date, semester_end_date, date_, repetition_period = WriteAPI.get_semester_filling_parameters(abstract_event)
+
+        while date_ <= semester_end_date:
+            if date_ >= semester_start_date:
+                legacy_create_event(date_, abstract_event)
+
+                # creating Event for only first acceptable date
+                # if abstract_event is not repeatable
+                if not abstract_event.schedule.schedule_template.repeatable:
+                    break
+
+            date_ += timedelta(days=repetition_period)
+
+    # applying date overrides to Events
+    for ddo in DayDateOverride.objects.filter(department=abstract_event.department):
+        events = Event.objects.filter(abstract_event=abstract_event, date=ddo.day_source)
+
+        if events.exists():
+            for e in events:
+                e.date = ddo.day_destination
+                e.date_override = ddo
+
+                legacy_save(e)
+
+
+def fill_scenario(scale : int) -> list:
+    """Compares per-Event and bulk semester filling
+    """
+
+    results = []
+    university = SyntheticUniversity(scale)
+    events = Event.objects.filter(abstract_event__schedule=university.schedule)
+
+    with measure(results, "fill: per-event"):
+        for ae in university.abstract_events:
+            legacy_fill(ae)
+
+    legacy_snapshot = events_snapshot(events)
+    events.delete()
+
+    with measure(results, "fill: bulk"):
+        WriteAPI.fill_event_table(university.abstract_events)
+
+    if events_snapshot(events) != legacy_snapshot:
+        raise AssertionError("Bulk filling result differs from per-event filling")
+
+    return results
+
+
+def legacy_cancel(event_cancel : EventCancel):
+    """Per-Event EventCancel applying used before single UPDATE
+    """
+
+    for e in Event.objects.filter(date=event_cancel.date, abstract_event__schedule__schedule_template__department=event_cancel.department):
+        e.is_event_canceled = True
+        e.event_cancel = event_cancel
+
+        legacy_save(e)
+
+
+def legacy_date_override(date_override : DayDateOverride):
+    """Per-Event DayDateOverride applying used before bulk UPDATE
+    """
+
+    for e in Event.objects.filter(date=date_override.day_source, abstract_event__schedule__schedule_template__department=date_override.department):
+        e.date = date_override.day_destination
+        e.date_override = date_override
+
+        legacy_save(e)
+
+
+def calendar_scenario(scale : int) -> list:
+    """Compares per-Event and bulk applying of EventCancel and DayDateOverride
+    on the busiest day of department
+    """
+
+    results = []
+    university = SyntheticUniversity(scale)
+
+    WriteAPI.fill_event_table(university.abstract_events)
+
+    busiest_date = Event.objects.filter(
+        date_override__isnull=True, 
+        is_event_canceled=False
+    ).values("date").annotate(events_count=Count("pk")).order_by("-events_count")[0]["date"]
+    events = Event.objects.filter(date=busiest_date)
+    events_count = events.count()
+
+    # created without save() to apply it by both ways
+    [event_cancel] = EventCancel.objects.bulk_create([EventCancel(date=busiest_date, department=university.department)])
+
+    with measure(results, f"cancel {events_count} events: per-event"):
+        legacy_cancel(event_cancel)
+
+    legacy_snapshot = events_snapshot(events)
+    events.update(is_event_canceled=False, event_cancel=None)
+
+    with measure(results, f"cancel {events_count} events: bulk"):
+        WriteAPI.apply_event_cancel_in_bulk(event_cancel)
+
+    if events_snapshot(events) != legacy_snapshot:
+        raise AssertionError("Bulk canceling result differs from per-event canceling")
+    
+    events.update(is_event_canceled=False, event_cancel=None)
+
+    [date_override] = DayDateOverride.objects.bulk_create([DayDateOverride(
+        day_source=busiest_date, 
+        day_destination=busiest_date + timedelta(days=5), 
+        department=university.department
+    )])
+    events = Event.objects.filter(date_override=date_override)
+
+    with measure(results, f"move {events_count} events: per-event"):
+        legacy_date_override(date_override)
+
+    legacy_snapshot = events_snapshot(events)
+    events.update(date=busiest_date, date_override=None)
+
+    with measure(results, f"move {events_count} events: bulk"):
+        WriteAPI.apply_date_override_in_bulk(date_override)
+
+    if events_snapshot(events) != legacy_snapshot:
+        raise AssertionError("Bulk date override result differs from per-event date override")
+
+    return results
+
+
+def legacy_check_duplicates(abstract_event : AbstractEvent, field : str, base_message : str, get_name) -> tuple[SafeText|None, list]:
+    """Utilities.check_for_participants_duplicate and check_for_places_duplicate
+    used before occupancy index
+
+    Returns message or None and found (resource pk, other AbstractEvent pk)
+    """
+
+    resources = getattr(abstract_event, field)
+    other_aes = AbstractEvent.objects.filter(**{f"{field}__in" : resources.all()},
+                                             abstract_day=abstract_event.abstract_day,
+                                             time_slot=abstract_event.time_slot).exclude(pk=abstract_event.pk).distinct()
+
+    if not other_aes.exists():
+        return None, []
+
+    message = mark_safe(base_message)
+    found = []
+
+    for ae in other_aes:
+        urls = mark_safe("")
+
+        for r in resources.filter(pk__in=getattr(ae, field).values_list("pk", flat=True)):
+            urls += format_html('<a href="{}">{}</a>, ', r.get_absolute_url(), get_name(r))
+            found.append((r.pk, ae.pk))
+
+        urls = mark_safe(urls[:-2])
+
+        message += format_html(Utilities.DUPLICATE_MESSAGE_TEMPLATE, ae.get_absolute_url(), str(ae), urls)
+
+    return message, found
+
+
+def legacy_check_abstract_event(abstract_event : AbstractEvent) -> tuple[bool, SafeText, set]:
+    """Utilities.check_abstract_event used before occupancy index
+
+    Returns state of double usage, message and found
+    (AbstractEvent pk, kind, resource pk, other AbstractEvent pk)
+    """
+
+    checks = [
+        (conflicts.PARTICIPANT, "participants", Utilities.PARTICIPANTS_BASE_MESSAGE, lambda p: str(p.name)),
+        (conflicts.PLACE, "places", Utilities.PLACES_BASE_MESSAGE, str)
+    ]
+    message = format_html(Utilities.HEADER_MESSAGE_TEMPLATE, abstract_event.get_absolute_url(), str(abstract_event))
+    found = set()
+
+    for kind, field, base_message, get_name in checks:
+        m, duplicates = legacy_check_duplicates(abstract_event, field, base_message, get_name)
+
+        if m is not None:
+            message += m
+            message += mark_safe("<br>")
+            found.update((abstract_event.pk, kind, resource_pk, other_pk) for resource_pk, other_pk in duplicates)
+
+    return bool(found), mark_safe(message[:-4]), found
+
+
+def conflicts_scenario(scale : int) -> list:
+    """Compares per-AbstractEvent double usage checking and single sweep
+    over whole schedule
+    """
+
+    results = []
+    university = SyntheticUniversity(scale)
+    abstract_events = list(university.abstract_events)
+
+    with measure(results, f"check {len(abstract_events)} abstract events: per-event"):
+        legacy_found = set()
+
+        for ae in abstract_events:
+            is_double_usage_found, message, found = legacy_check_abstract_event(ae)
+            legacy_found.update(found)
+
+    with measure(results, f"check {len(abstract_events)} abstract events: sweep"):
+        messages = Utilities.check_abstract_events(university.abstract_events)
+
+    found = {
+        (ae.pk, c.kind, c.resource.pk, other.pk)
+        for c in conflicts.find_conflicts(university.abstract_events)
+        for ae in c.abstract_events
+        for other in c.abstract_events
+        if other.pk != ae.pk
+    }
+
+    if found != legacy_found or len(messages) != len({ae_pk for ae_pk, _, _, _ in legacy_found}):
+        raise AssertionError("Sweep result differs from per-event checking")
+
+    return results
+
+
+def legacy_free_time(participant_pks : list[int], date_from : date, date_to : date, limit : int) -> list[tuple]:
+    """Per-TimeSlot free time search with queries for every date and TimeSlot
+    """
+
+    time_slots = list(TimeSlot.objects.order_by("start_time", "pk"))
+    places = list(EventPlace.objects.order_by("building", "room"))
+    candidates = []
+
+    for date_ in get_days(date_from, date_to):
+        for time_slot in time_slots:
+            events = Event.objects.filter(date=date_, time_slot_override=time_slot, is_event_canceled=False)
+
+            if events.filter(participants_override__in=participant_pks).exists():
+                continue
+
+            busy_places = set(events.values_list("places_override", flat=True))
+            free_places = [place for place in places if place.pk not in busy_places][:3]
+            candidates.extend((date_, time_slot.pk, place.pk) for place in free_places)
+
+            if len(candidates) >= limit:
+                return candidates[:limit]
+
+    return candidates
+
+
+def free_time_scenario(scale : int) -> list:
+    """Compares per-TimeSlot and bitset search of common free time
+    of groups and teachers over semester
+    """
+
+    results = []
+    university = SyntheticUniversity(scale)
+    WriteAPI.fill_event_table(university.abstract_events)
+    room_occupancy.index.invalidate()
+
+    participants = [p.pk for p in university.groups[:10] + university.teachers[:30]]
+    # only far candidates remain when participants are busy at nearest times
+    limit = 1000
+
+    with measure(results, f"free time of {len(participants)} participants: per-time-slot"):
+        legacy_candidates = legacy_free_time(participants, university.START_DATE, university.END_DATE, limit)
+
+    with measure(results, f"free time of {len(participants)} participants: bitsets"):
+        candidates = find_free_time(participants, university.START_DATE, university.END_DATE, limit=limit)
+
+    with measure(results, f"free time of {len(participants)} participants: bitsets, cached rooms"):
+        find_free_time(participants, university.START_DATE, university.END_DATE, limit=limit)
+
+    if [(c.date, c.time_slot.pk, c.place.pk) for c in candidates] != legacy_candidates:
+        raise AssertionError("Bitset search result differs from per-time-slot search")
+
+    return results
+
+
+def placement_scenario(scale : int) -> list:
+    """Places all AbstractEvents of schedule without places from scratch
+    """
+
+    results = []
+    university = SyntheticUniversity(scale)
+    AbstractEvent.places.through.objects.filter(abstractevent__schedule=university.schedule).delete()
+
+    with measure(results, "placement: build problem"):
+        problem = placement.build_problem(university.abstract_events)
+
+    with measure(results, f"placement: solve {len(problem.items)} abstract events"):
+        solution = placement.solve(problem)
+
+    with measure(results, "placement: solve, 4 restarts in 4 processes"):
+        restarted_solution = placement.solve(problem, restarts=4, processes=4)
+
+    if restarted_solution.is_better(solution):
+        solution = restarted_solution
+
+    with measure(results, "placement: write back"):
+        placement.apply_solution(solution)
+
+    results.append((repr(solution), 0, 0))
+
+    if not solution.unplaced and conflicts.find_conflicts(university.abstract_events):
+        raise AssertionError("Placed abstract events have conflicts")
+
+    return results
+
+
+def write_import_json(university : SyntheticUniversity, file):
+    """Writes AbstractEvents of synthetic university as schedule JSON for EventImportAPI
+    """
+
+    months = ["сентябрь", "октябрь", "ноябрь", "декабрь", "январь"]
+    weeks = {"first_week" : {}, "second_week" : {}}
+    day = university.START_DATE
+
+    while day <= university.END_DATE:
+        if day.weekday() != 6:
+            week = "first_week" if (day - university.START_DATE).days // 7 % 2 == 0 else "second_week"
+            week_day = weeks[week].setdefault(day.weekday(), {})
+            week_day.setdefault(months.index(Utilities.get_month_name(day.month).lower()), []).append(str(day.day))
+
+        day += timedelta(days=1)
+
+    grid = [
+        {
+            "subject" : ae.subject.name,
+            "kind" : ae.kind.name,
+            "participants" : {
+                "teachers" : [p.name for p in ae.participants.all() if not p.is_group],
+                "student_groups" : [p.name for p in ae.participants.all() if p.is_group]
+            },
+            "places" : [f"{place.building} {place.room}" for place in ae.places.all()],
+            "hours" : [f"{ae.time_slot.start_time.hour}.{ae.time_slot.start_time.minute:02}"],
+            "week_day_index" : ae.abstract_day.day_number % 7,
+            "week" : "first_week" if ae.abstract_day.day_number < 7 else "second_week",
+            "holds_on_date" : []
+        }
+        for ae in university.abstract_events.select_related(
+            "subject", "kind", "time_slot", "abstract_day"
+        ).prefetch_related("participants", "places")
+    ]
+
+    data = {
+        "title" : "Учебные занятия 1 курса бакалавриат на 1 семестр 2024-2025 учебного года",
+        "table" : {
+            "grid" : grid,
+            "datetime" : {
+                "weeks" : {
+                    week : [
+                        {
+                            "week_day_index" : week_day_index,
+                            "calendar" : [
+                                {"month_index" : month_index, "month_days" : month_days}
+                                for month_index, month_days in calendar.items()
+                            ]
+                        }
+                        for week_day_index, calendar in week_days.items()
+                    ]
+                    for week, week_days in weeks.items()
+                },
+                "week_days" : ["ПОНЕДЕЛЬНИК", "ВТОРНИК", "СРЕДА", "ЧЕТВЕРГ", "ПЯТНИЦА", "СУББОТА"],
+                "months" : months
+            }
+        }
+    }
+
+    file.write(json.dumps(data, ensure_ascii=False, indent=4).encode("utf-8"))
+    file.seek(0)
+
+
+def legacy_read(file) -> tuple[dict, list]:
+    """Reading of whole JSON into memory used before streaming
+
+    Returns reference data and grid entries
+    """
+
+    json_data = json.loads(file.read().decode("utf-8"))
+    entries = json_data["table"]["grid"]
+
+    return EventImportAPI._collect_reference_data(entries), entries
+
+
+def streamed_read(file) -> tuple[dict, int]:
+    """Reads JSON twice as streaming import does
+
+    Returns reference data and grid entries count
+    """
+
+    header = {}
+    reference_data = EventImportAPI._collect_reference_data(EventImportAPI._read_event_data(file, header))
+
+    return reference_data, sum(1 for _ in EventImportAPI._read_event_data(file, {}))
+
+
+def import_scenario(scale : int) -> list:
+    """Compares reading of JSON loaded into memory and streamed JSON,
+    then imports streamed JSON and imports it again with one changed entry
+    """
+
+    results = []
+    university = SyntheticUniversity(scale)
+
+    with tempfile.TemporaryFile() as file:
+        write_import_json(university, file)
+        size = file.seek(0, 2)
+        university.abstract_events.delete()
+
+        results.append((f"import: JSON {size / 2 ** 20:.1f} МБ", 0, 0))
+
+        file.seek(0)
+
+        with measure_memory(results, "import: read loaded JSON"), measure(results, "import: read loaded JSON"):
+            legacy_reference_data, entries = legacy_read(file)
+
+        with measure_memory(results, "import: read streamed JSON"), measure(results, "import: read streamed JSON"):
+            reference_data, entries_count = streamed_read(file)
+
+        if reference_data != legacy_reference_data or entries_count != len(entries):
+            raise AssertionError("Streamed JSON differs from loaded JSON")
+
+        del entries, legacy_reference_data
+
+        with measure_memory(results, "import: streamed JSON"), measure(results, "import: streamed JSON"), \
+            instrumentation.profiling(trace_memory=False) as profiler:
+            EventImportAPI.import_event_data(file)
+
+        for stage in profiler.report()["stages"]:
+            results.append((f"import: stage {stage['name']} ({stage['calls']} раз, строк: {stage['rows_written']})", stage["seconds"], stage["queries"]))
+
+        file.seek(0)
+        data = json.loads(file.read())
+        data["table"]["grid"][0]["subject"] = university.subjects[-1].name
+
+        with measure(results, "import: same JSON with one changed entry"):
+            EventImportAPI.import_event_data(json.dumps(data, ensure_ascii=False))
+
+    results.append((
+        f"Импортировано: {university.abstract_events.count()} запланированных событий, "
+        f"{Event.objects.filter(abstract_event__schedule=university.schedule).count()} событий",
+        0,
+        0
+    ))
+
+    return results
+
+def reference_scenario(scale : int) -> list:
+    """Imports bundled VSTU reference files into empty database,
+    then imports them again to check existing records
+
+    Scale is not used
+    """
+
+    results = []
+    Organization.objects.create(name="ВолгГТУ")
+
+    imports = [
+        ("faculties", "vstu-faculties.json", ReferenceImporter.import_faculty_reference),
+        ("departments", "vstu-departments.json", ReferenceImporter.import_department_reference),
+        ("groups", "vstu-groups.json", ReferenceImporter.import_student_reference),
+        ("teachers", "vstu-teachers.json", ReferenceImporter.import_teacher_reference),
+        ("disciplines", "vstu-disciplines.json", ReferenceImporter.import_subject_reference),
+    ]
+
+    for run in ("reference", "reference again"):
+        for name, file_name, import_ in imports:
+            reference_data = (settings.BASE_DIR / "testdata" / file_name).read_text(encoding="utf-8")
+
+            with measure(results, f"{run}: {name}"):
+                import_(reference_data)
+
+    results.append((
+        f"Импортировано: {Department.objects.count()} подразделений, "
+        f"{EventParticipant.objects.count()} участников, {Subject.objects.count()} предметов",
+        0,
+        0
+    ))
+
+    return results
+
+SCENARIOS = {
+    "fill" : fill_scenario,
+    "calendar" : calendar_scenario,
+    "conflicts" : conflicts_scenario,
+    "free_time" : free_time_scenario,
+    "placement" : placement_scenario,
+    "import" : import_scenario,
+    "reference" : reference_scenario,
+}
@@ -0,0 +1,289 @@
+"""Bulk mode for imports and fills
+
+Inside bulk_operation() per instance signal handlers of AbstractEvent
+and Event only record what was saved. State they derive (AbstractEventChanges
+of created AbstractEvents, DayDateOverride and EventCancel attachment,
+overriden flags, refilling of moved AbstractEvents) is computed once
+with few queries when block exits
+"""
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+import api.calendar_index as calendar_index
+from api.models import (
+    AbstractEvent,
+    AbstractEventChanges,
+    EventParticipant,
+    Event
+)
+
+
+EVENT_DERIVED_FIELDS = [
+    "date",
+    "date_override",
+    "is_event_canceled",
+    "event_cancel",
+    "is_event_overriden"
+]
+
+_local = threading.local()
+
+
+class BulkState:
+    def __init__(self):
+        # {AbstractEvent pk : AbstractEvent} created inside block
+        self.created_abstract_events = {}
+        # AbstractEvent pks which participants or places changed after creation
+        self.m2m_changed_abstract_events = set()
+        # {AbstractEvent pk : AbstractEvent} which Events need reconciling
+        self.refilled_abstract_events = {}
+        # {id(Event) : SavedEvent}
+        self.saved_events = {}
+        # {Event pk : Event} which participants or places changed
+        self.m2m_changed_events = {}
+
+
+class SavedEvent:
+    """Event saved inside block with state needed to derive its fields
+    """
+
+    def __init__(self, event : Event):
+        self.event = event
+        self.created = event.pk is None
+        self.changed_fields = set(event.changed_fields())
+        self.loaded_date = None if self.created else event.loaded_value("date")
+        self.loaded_event_cancel_id = None if self.created else event.loaded_value("event_cancel")
+
+
+def get_state() -> BulkState|None:
+    return getattr(_local, "state", None)
+
+
+def is_active() -> bool:
+    return get_state() is not None
+
+
+@contextmanager
+def bulk_operation():
+    """Suspends per instance signal handlers for block and
+    applies derived state once on exit
+
+    Block runs in transaction. Nested blocks are part of outer one
+    """
+
+    if is_active():
+        yield
+
+        return
+
+    with transaction.atomic(), calendar_index.calendar_scope():
+        _local.state = BulkState()
+
+        try:
+            yield
+
+            state = _local.state
+        finally:
+            _local.state = None
+
+        apply(state)
+
+
+def record_created_abstract_event(abstract_event : AbstractEvent):
+    get_state().created_abstract_events[abstract_event.pk] = abstract_event
+
+
+def is_created_abstract_event(abstract_event : AbstractEvent) -> bool:
+    return abstract_event.pk in get_state().created_abstract_events
+
+
+def record_abstract_event_m2m(abstract_event : AbstractEvent):
+    get_state().m2m_changed_abstract_events.add(abstract_event.pk)
+
+
+def record_refill(abstract_event : AbstractEvent):
+    get_state().refilled_abstract_events[abstract_event.pk] = abstract_event
+
+
+def record_saved_event(event : Event):
+    saved_events = get_state().saved_events
+    saved_event = SavedEvent(event)
+
+    # Event saved several times inside block
+    if id(event) in saved_events:
+        previous = saved_events[id(event)]
+
+        previous.changed_fields |= saved_event.changed_fields
+
+        return
+
+    saved_events[id(event)] = saved_event
+
+
+def record_event_m2m(event : Event):
+    get_state().m2m_changed_events[event.pk] = event
+
+
+def apply(state : BulkState):
+    """Computes state derived by suspended signal handlers
+    """
+
+    from api.utilities import WriteAPI
+
+    create_changes(list(state.created_abstract_events.values()))
+    derive_events_state(list(state.saved_events.values()))
+    mark_overriden_events(list(state.m2m_changed_events.values()))
+
+    # Events could be created before participants or places were set
+    m2m_changed = [
+        state.created_abstract_events[pk]
+        for pk in state.m2m_changed_abstract_events & state.created_abstract_events.keys()
+    ]
+
+    if m2m_changed:
+        WriteAPI.reconcile_events_m2m(
+            m2m_changed,
+            list(Event.objects.filter(abstract_event__in=m2m_changed, is_event_overriden=False)),
+            []
+        )
+
+    if state.refilled_abstract_events:
+        WriteAPI.fill_event_table(list(state.refilled_abstract_events.values()))
+
+
+def create_changes(abstract_events : list[AbstractEvent]):
+    """Creates AbstractEventChanges for created AbstractEvents in bulk
+
+    Same as AbstractEvent.generate_changes_on_creating
+    followed by participants and places changes
+    """
+
+    from api.utilities import WriteAPI
+
+    if not abstract_events:
+        return
+
+    prefetch_related_objects(abstract_events, "abstract_day", "time_slot", "subject", "kind")
+
+    participants = defaultdict(list)
+    places = defaultdict(list)
+
+    for link in AbstractEvent.participants.through.objects.filter(
+        abstractevent__in=abstract_events
+    ).select_related("eventparticipant").order_by("eventparticipant"):
+        participants[link.abstractevent_id].append(link.eventparticipant)
+
+    for link in AbstractEvent.places.through.objects.filter(
+        abstractevent__in=abstract_events
+    ).select_related("eventplace").order_by("eventplace"):
+        places[link.abstractevent_id].append(link.eventplace)
+
+    teacher_roles = [EventParticipant.Role.TEACHER, EventParticipant.Role.ASSISTANT]
+    changes = []
+
+    for ae in abstract_events:
+        ae_changes = AbstractEventChanges(
+            date_time=AbstractEventChanges.str_from_date_time(ae),
+            subject=ae.subject.name,
+            is_created=True,
+            final_kind=ae.kind.name if ae.kind else ""
+        )
+
+        if ae.holds_on_date:
+            ae_changes.final_holds_on_date = ae.holds_on_date
+
+        if participants[ae.pk]:
+            ae_changes.group = AbstractEventChanges.str_from_participants(
+                p for p in participants[ae.pk] if p.is_group
+            )
+            ae_changes.final_teachers = AbstractEventChanges.str_from_participants(
+                p for p in participants[ae.pk] if p.role in teacher_roles
+            )
+
+        if places[ae.pk]:
+            ae_changes.final_places = AbstractEventChanges.str_from_places(places[ae.pk])
+
+        changes.append(ae_changes)
+
+    AbstractEventChanges.objects.bulk_create(changes, batch_size=WriteAPI.BULK_BATCH_SIZE)
+
+    for ae, ae_changes in zip(abstract_events, changes):
+        ae.changes = ae_changes
+
+    AbstractEvent.objects.bulk_update(abstract_events, ["changes"], batch_size=WriteAPI.BULK_BATCH_SIZE)
+
+    for ae in abstract_events:
+        ae.get_loaded_values()["changes_id"] = ae.changes_id
+
+
+def derive_events_state(saved_events : list[SavedEvent]):
+    """Attaches DayDateOverrides and EventCancels to saved Events
+    and sets overriden flags as on_event_save does
+    """
+
+    from api.utilities import WriteAPI
+
+    if not saved_events:
+        return
+
+    events = [s.event for s in saved_events]
+
+    prefetch_related_objects(events, "abstract_event", "date_override")
+
+    for s in saved_events:
+        s.event.derive_state(s.created, s.changed_fields, s.loaded_date, s.loaded_event_cancel_id)
+
+    Event.objects.bulk_update(events, EVENT_DERIVED_FIELDS, batch_size=WriteAPI.BULK_BATCH_SIZE)
+
+    for e in events:
+        loaded_values = e.get_loaded_values()
+
+        for field in EVENT_DERIVED_FIELDS:
+            attname = Event._meta.get_field(field).attname
+
+            loaded_values[attname] = getattr(e, attname)
+
+
+def mark_overriden_events(events : list[Event]):
+    """Marks Events which participants or places differ from its AbstractEvent ones
+    as overriden
+    """
+
+    events = [e for e in events if not e.is_event_overriden]
+
+    if not events:
+        return
+
+    overriden = set()
+
+    for ae_field, event_field, related_field in (
+        ("participants", "participants_override", "eventparticipant"),
+        ("places", "places_override", "eventplace")
+    ):
+        expected = defaultdict(set)
+        current = defaultdict(set)
+
+        for ae_pk, related_pk in getattr(AbstractEvent, ae_field).through.objects.filter(
+            abstractevent__in={e.abstract_event_id for e in events}
+        ).values_list("abstractevent", related_field):
+            expected[ae_pk].add(related_pk)
+
+        for event_pk, related_pk in getattr(Event, event_field).through.objects.filter(
+            event__in=events
+        ).values_list("event", related_field):
+            current[event_pk].add(related_pk)
+
+        overriden.update(e.pk for e in events if current[e.pk] != expected[e.abstract_event_id])
+
+    if not overriden:
+        return
+
+    Event.objects.filter(pk__in=overriden).update(is_event_overriden=True)
+
+    for e in events:
+        if e.pk in overriden:
+            e.is_event_overriden = True
+            e.get_loaded_values()["is_event_overriden"] = True
@@ -0,0 +1,192 @@
+"""Department calendars: DayDateOverrides and EventCancels indexed by date
+
+Inside calendar_scope() calendars and Departments of Schedules are loaded
+once and kept by operation, they are dropped when DayDateOverride,
+EventCancel, Schedule or ScheduleTemplate is changed inside it.
+Out of scope they are loaded on every call, so changes made
+by other processes are always seen by next operation
+"""
+
+import threading
+from contextlib import contextmanager
+from datetime import date
+from django.db.models import Q
+from api.models import (
+    Schedule,
+    DayDateOverride,
+    EventCancel
+)
+
+
+class DepartmentCalendar:
+    """DayDateOverrides and EventCancels of single Department
+
+    Use department_pk=None for calendar of DayDateOverrides without Department
+    """
+
+    def __init__(self, department_pk : int|None, date_overrides : list[DayDateOverride], event_cancels : list[EventCancel]):
+        self.department_pk = department_pk
+        # ordered by pk
+        self.date_overrides = date_overrides
+        self.overrides_by_source = {}
+        self.cancels_by_date = {}
+        self.resolved_dates = {}
+
+        # only first DayDateOverride and EventCancel applies on date
+        for ddo in date_overrides:
+            self.overrides_by_source.setdefault(ddo.day_source, ddo)
+
+        for ec in event_cancels:
+            self.cancels_by_date.setdefault(ec.date, ec)
+
+    def get_override(self, date_ : date) -> DayDateOverride|None:
+        """Returns DayDateOverride which moves given date
+        """
+
+        return self.overrides_by_source.get(date_)
+
+    def get_cancel(self, date_ : date) -> EventCancel|None:
+        """Returns EventCancel for given date
+        """
+
+        return self.cancels_by_date.get(date_)
+
+    def resolve_date(self, date_ : date) -> tuple[date, DayDateOverride|None]:
+        """Applies DayDateOverrides on given date as it happens
+        when Event saves and then checks for date overrides
+
+        Returns resulting date and last applied DayDateOverride
+        """
+
+        if date_ not in self.resolved_dates:
+            resolved_date, date_override = date_, self.get_override(date_)
+
+            # attaching on Event save
+            if date_override:
+                resolved_date = date_override.day_destination
+
+            # applying all DayDateOverrides after filling
+            for ddo in self.date_overrides:
+                if ddo.day_source == resolved_date:
+                    resolved_date, date_override = ddo.day_destination, ddo
+
+            self.resolved_dates[date_] = (resolved_date, date_override)
+
+        return self.resolved_dates[date_]
+
+    @classmethod
+    def load(cls, department_pks) -> dict:
+        """Loads calendars of given Departments in two queries
+
+        Returns {department_pk : DepartmentCalendar}
+        """
+
+        department_pks = set(department_pks)
+        department_query = Q(department__in=department_pks - {None})
+
+        # AbstractEvents without Department
+        # interact with DayDateOverrides and EventCancels without Department
+        if None in department_pks:
+            department_query |= Q(department__isnull=True)
+
+        date_overrides = {pk : [] for pk in department_pks}
+        event_cancels = {pk : [] for pk in department_pks}
+
+        if department_pks:
+            for ddo in DayDateOverride.objects.filter(department_query).order_by("pk"):
+                date_overrides[ddo.department_id].append(ddo)
+
+            for ec in EventCancel.objects.filter(department_query).order_by("pk"):
+                event_cancels[ec.department_id].append(ec)
+
+        return {pk : cls(pk, date_overrides[pk], event_cancels[pk]) for pk in department_pks}
+
+
+_local = threading.local()
+
+
+@contextmanager
+def calendar_scope():
+    """Keeps loaded calendars and Schedules Departments for block
+
+    Nested scopes share calendars of outer one
+    """
+
+    if getattr(_local, "calendars", None) is not None:
+        yield
+
+        return
+
+    _local.calendars = {}
+    _local.departments = {}
+
+    try:
+        yield
+    finally:
+        _local.calendars = None
+        _local.departments = None
+
+
+def get_cached(name : str, keys, load) -> dict:
+    """Returns {key : value} from scope cache with given name, values of missing keys
+    are loaded by load(keys) which returns {key : value}
+
+    Out of calendar_scope() values are loaded on every call
+    """
+
+    keys = set(keys)
+    scope = getattr(_local, name, None)
+
+    if scope is None:
+        return load(keys)
+
+    found = {k : scope[k] for k in keys if k in scope}
+    missing = keys - found.keys()
+
+    if missing:
+        loaded = load(missing)
+        scope.update(loaded)
+        found.update(loaded)
+
+    return found
+
+
+def get_calendars(department_pks) -> dict:
+    """Returns {department_pk : DepartmentCalendar} for given Departments
+    """
+
+    return get_cached("calendars", department_pks, DepartmentCalendar.load)
+
+
+def get_calendar(department_pk : int|None) -> DepartmentCalendar:
+    return get_calendars([department_pk])[department_pk]
+
+
+def load_departments(schedule_pks) -> dict:
+    return dict(Schedule.objects.filter(pk__in=schedule_pks).values_list("pk", "schedule_template__department"))
+
+
+def get_departments_by_schedules(schedule_pks) -> dict:
+    """Returns Department pk for every given Schedule pk in single query
+    """
+
+    schedule_pks = set(schedule_pks)
+    departments = get_cached("departments", schedule_pks, load_departments)
+
+    return {pk : departments.get(pk) for pk in schedule_pks}
+
+
+def get_schedule_calendar(schedule_pk : int) -> DepartmentCalendar:
+    """Returns calendar of Department which given Schedule belongs to
+    """
+
+    return get_calendar(get_departments_by_schedules([schedule_pk]).get(schedule_pk))
+
+
+def invalidate():
+    """Drops calendars and Schedules Departments loaded in current scope
+    """
+
+    for scope in (getattr(_local, "calendars", None), getattr(_local, "departments", None)):
+        if scope is not None:
+            scope.clear()
@@ -0,0 +1,153 @@
+"""Transaction-scoped journal of AbstractEvent participants and places changes
+
+Changes are collected while transaction runs and applied once on commit:
+Events of every changed AbstractEvent are updated once
+and its AbstractEventChanges are written once.
+Outside of transaction changes are applied immediately
+"""
+
+import threading
+import weakref
+from django.db import transaction
+from api.models import AbstractEvent, AbstractEventChanges
+
+
+PARTICIPANTS = "participants"
+PLACES = "places"
+
+_local = threading.local()
+
+
+class JournalEntry:
+    def __init__(self, abstract_event : AbstractEvent):
+        self.abstract_event = abstract_event
+        self.aspects = set()
+        # AbstractEventChanges with origin values, not saved until commit
+        self.new_changes = None
+
+
+class Flush:
+    """Callback applying journal on commit
+
+    Kept by weak reference, as Django drops it with rolled back transaction
+    """
+
+    def __call__(self):
+        flush()
+
+
+def is_flush_dropped() -> bool:
+    scheduled = getattr(_local, "scheduled", None)
+
+    return scheduled is not None and scheduled() is None
+
+
+def schedule_flush():
+    callback = Flush()
+    _local.scheduled = weakref.ref(callback)
+
+    transaction.on_commit(callback)
+
+
+def get_journal() -> dict:
+    """Returns {AbstractEvent pk : JournalEntry} of current transaction
+    """
+
+    journal = getattr(_local, "journal", None)
+    is_in_transaction = not transaction.get_autocommit()
+
+    # journal of rolled back transaction or left without recording outside of transaction
+    if journal is not None and (is_flush_dropped() or is_in_transaction and _local.scheduled is None):
+        journal = None
+
+    if journal is None:
+        journal = _local.journal = {}
+        _local.scheduled = None
+
+        # journal is dropped with transaction even if nothing is recorded
+        if is_in_transaction:
+            schedule_flush()
+
+    return journal
+
+
+def get_entry(abstract_event : AbstractEvent) -> JournalEntry:
+    journal = get_journal()
+
+    if abstract_event.pk not in journal:
+        journal[abstract_event.pk] = JournalEntry(abstract_event)
+
+    return journal[abstract_event.pk]
+
+
+def remember_origin(abstract_event : AbstractEvent):
+    """Keeps origin values of AbstractEvent before its first change
+
+    Should be called before participants or places change
+    """
+
+    entry = get_entry(abstract_event)
+
+    if entry.new_changes or abstract_event.changes_id:
+        return
+
+    entry.new_changes = AbstractEventChanges()
+
+    entry.new_changes.initialize(abstract_event)
+
+
+def record(abstract_event : AbstractEvent, aspect : str):
+    """Records change of AbstractEvent participants or places
+
+    Should be called after participants or places change
+    """
+
+    get_entry(abstract_event).aspects.add(aspect)
+
+    # outside of transaction flush is called at once
+    if _local.scheduled is None:
+        schedule_flush()
+
+
+def flush():
+    """Applies recorded changes
+    """
+
+    from api.utilities import WriteAPI
+
+    journal = getattr(_local, "journal", None) or {}
+
+    _local.journal = None
+    _local.scheduled = None
+
+    for entry in journal.values():
+        if not entry.aspects:
+            continue
+
+        ae = entry.abstract_event
+
+        WriteAPI.update_events(
+            ae,
+            update_non_m2m=False,
+            update_participants=PARTICIPANTS in entry.aspects,
+            update_places=PLACES in entry.aspects
+        )
+
+        changes = entry.new_changes or ae.changes
+
+        if not changes:
+            continue
+
+        if PARTICIPANTS in entry.aspects:
+            changes.group = AbstractEventChanges.str_from_participants(ae.get_groups())
+            changes.final_teachers = AbstractEventChanges.str_from_participants(ae.get_teachers())
+
+        if PLACES in entry.aspects:
+            changes.final_places = AbstractEventChanges.str_from_places(ae.places.all())
+
+        changes.save()
+
+        if entry.new_changes:
+            ae.changes = changes
+
+            AbstractEvent.objects.filter(pk=ae.pk).update(changes=changes)
@@ -0,0 +1,278 @@
+"""Sweep of EventParticipants and EventPlaces double usage
+
+AbstractEvents are indexed in memory by (resource, abstract_day, time_slot),
+so all double usages of schedule, department or whole university
+are found in single pass with constant number of queries. AbstractEvents
+collide only if semesters of their Schedules overlap.
+
+Events are indexed by (resource, date, time_slot_override), so
+holds_on_date, DayDateOverrides, EventCancels, Events overrides
+and semester bounds are taken into account
+"""
+
+from collections import defaultdict
+from datetime import date
+from django.db.models import QuerySet
+from api.models import (
+    Schedule,
+    Department,
+    AbstractEvent,
+    Event,
+    EventParticipant,
+    EventPlace
+)
+
+
+PARTICIPANT = "participant"
+PLACE = "place"
+
+# (kind, AbstractEvent m2m field, related field of through model)
+RESOURCE_FIELDS = (
+    (PARTICIPANT, "participants", "eventparticipant"),
+    (PLACE, "places", "eventplace")
+)
+
+# (kind, Event m2m field, related field of through model)
+EVENT_RESOURCE_FIELDS = (
+    (PARTICIPANT, "participants_override", "eventparticipant"),
+    (PLACE, "places_override", "eventplace")
+)
+
+# bounds of Schedule without semester dates
+UNBOUNDED_WINDOW = (date.min, date.max)
+
+
+def get_window(start_date : date|None, end_date : date|None) -> tuple[date, date]:
+    """Returns semester bounds of Schedule, missing bounds are unlimited
+    """
+
+    return (start_date or date.min, end_date or date.max)
+
+
+def windows_overlap(window : tuple[date, date], other_window : tuple[date, date]) -> bool:
+    return window[0] <= other_window[1] and other_window[0] <= window[1]
+
+
+def get_colliding(windows : dict[int, tuple[date, date]], selected_pks : set[int]) -> list[int]:
+    """Returns pks of AbstractEvents which semester overlaps semester
+    of other one, at least one of them should be selected
+
+    Windows are {AbstractEvent pk : semester bounds}
+    """
+
+    items = sorted(windows.items())
+    colliding = set()
+
+    for i, (pk, window) in enumerate(items):
+        for other_pk, other_window in items[i + 1:]:
+            if (pk in selected_pks or other_pk in selected_pks) and windows_overlap(window, other_window):
+                colliding.update((pk, other_pk))
+
+    return sorted(colliding)
+
+
+class Conflict:
+    """EventParticipant or EventPlace used by several AbstractEvents
+    at same abstract day and time slot
+    """
+
+    def __init__(self, kind : str, resource : EventParticipant|EventPlace, abstract_events : list[AbstractEvent]):
+        self.kind = kind
+        self.resource = resource
+        # ordered by pk
+        self.abstract_events = abstract_events
+
+    @property
+    def abstract_day(self):
+        return self.abstract_events[0].abstract_day
+
+    @property
+    def time_slot(self):
+        return self.abstract_events[0].time_slot
+
+    def __repr__(self):
+        return f"{self.resource} / {self.abstract_day} / {self.time_slot.alt_name}ч.: " + \
+            "; ".join(str(ae) for ae in self.abstract_events)
+
+
+def get_scope(schedule : Schedule|None = None, department : Department|None = None) -> QuerySet:
+    """Returns AbstractEvents of given Schedule or Department
+
+    Returns all AbstractEvents if nothing given
+    """
+
+    abstract_events = AbstractEvent.objects.all()
+
+    if schedule:
+        abstract_events = abstract_events.filter(schedule=schedule)
+
+    if department:
+        abstract_events = abstract_events.filter(schedule__schedule_template__department=department)
+
+    return abstract_events
+
+
+def find_conflicts(abstract_events) -> list[Conflict]:
+    """Finds double usages of participants and places of given AbstractEvents
+
+    AbstractEvents out of given ones are also checked for collision with them.
+    Uses at most six queries regardless of AbstractEvents count
+
+    Returns conflicts ordered by kind, resource, abstract day and time slot
+    """
+
+    if not isinstance(abstract_events, QuerySet):
+        abstract_events = AbstractEvent.objects.filter(pk__in=[ae.pk for ae in abstract_events])
+
+    selected_pks = set(abstract_events.values_list("pk", flat=True))
+
+    if not selected_pks:
+        return []
+
+    # {(kind, resource pk, abstract_day pk, time_slot pk) : {AbstractEvent pk : semester bounds}}
+    index = defaultdict(dict)
+    selected_keys = set()
+
+    for kind, ae_field, related_field in RESOURCE_FIELDS:
+        Through = getattr(AbstractEvent, ae_field).through
+        used_resources = Through.objects.filter(abstractevent__in=abstract_events).values(related_field)
+
+        for ae_pk, resource_pk, abstract_day_pk, time_slot_pk, start_date, end_date in Through.objects.filter(
+            **{f"{related_field}__in" : used_resources}
+        ).values_list(
+            "abstractevent", related_field, "abstractevent__abstract_day", "abstractevent__time_slot",
+            "abstractevent__schedule__start_date", "abstractevent__schedule__end_date"
+        ):
+            key = (kind, resource_pk, abstract_day_pk, time_slot_pk)
+
+            index[key][ae_pk] = get_window(start_date, end_date)
+
+            if ae_pk in selected_pks:
+                selected_keys.add(key)
+
+    # {key : [colliding AbstractEvent pk]}
+    colliding = {}
+
+    for key in sorted(selected_keys):
+        if len(index[key]) > 1:
+            colliding_pks = get_colliding(index[key], selected_pks)
+
+            if colliding_pks:
+                colliding[key] = colliding_pks
+
+    if not colliding:
+        return []
+
+    conflicting_keys = list(colliding)
+    involved_pks = {ae_pk for pks in colliding.values() for ae_pk in pks}
+    loaded_abstract_events = AbstractEvent.objects.select_related(
+        "subject", "abstract_day", "time_slot"
+    ).in_bulk(involved_pks)
+    resources = {
+        PARTICIPANT : EventParticipant.objects.in_bulk({key[1] for key in conflicting_keys if key[0] == PARTICIPANT}),
+        PLACE : EventPlace.objects.in_bulk({key[1] for key in conflicting_keys if key[0] == PLACE})
+    }
+
+    return [
+        Conflict(
+            kind,
+            resources[kind][resource_pk],
+            [loaded_abstract_events[pk] for pk in colliding[(kind, resource_pk, abstract_day_pk, time_slot_pk)]]
+        )
+        for kind, resource_pk, abstract_day_pk, time_slot_pk in conflicting_keys
+    ]
+
+
+class EventConflict:
+    """EventParticipant or EventPlace used by several not canceled Events
+    at same date and time slot
+    """
+
+    def __init__(self, kind : str, resource : EventParticipant|EventPlace, events : list[Event]):
+        self.kind = kind
+        self.resource = resource
+        # ordered by pk
+        self.events = events
+
+    @property
+    def date(self):
+        return self.events[0].date
+
+    @property
+    def time_slot(self):
+        return self.events[0].time_slot_override
+
+    def __repr__(self):
+        return f"{self.resource} / {self.date.strftime('%d.%m.%Y')} / {self.time_slot.alt_name}ч.: " + \
+            "; ".join(str(e) for e in self.events)
+
+
+def find_event_conflicts(date_from : date, date_to : date, events=None) -> list[EventConflict]:
+    """Finds double usages of participants and places by Events in given date range
+
+    If Events given finds only double usages with them.
+    Canceled Events are skipped. Uses at most six queries regardless of Events count
+
+    Returns conflicts ordered by kind, resource, date and time slot
+    """
+
+    occurrences = Event.objects.filter(
+        date__range=(date_from, date_to),
+        is_event_canceled=False,
+        time_slot_override__isnull=False
+    )
+    selected_pks = None
+
+    if events is not None:
+        if not isinstance(events, QuerySet):
+            events = Event.objects.filter(pk__in=[e.pk for e in events])
+
+        events = events.filter(date__range=(date_from, date_to), is_event_canceled=False)
+        selected_pks = set(events.values_list("pk", flat=True))
+
+        if not selected_pks:
+            return []
+
+    # {(kind, resource pk, date, time_slot pk) : [Event pk]}
+    index = defaultdict(list)
+    selected_keys = set()
+
+    for kind, event_field, related_field in EVENT_RESOURCE_FIELDS:
+        Through = getattr(Event, event_field).through
+        links = Through.objects.filter(event__in=occurrences)
+
+        if events is not None:
+            links = links.filter(**{f"{related_field}__in" : Through.objects.filter(event__in=events).values(related_field)})
+
+        for event_pk, resource_pk, date_, time_slot_pk in links.values_list(
+            "event", related_field, "event__date", "event__time_slot_override"
+        ):
+            key = (kind, resource_pk, date_, time_slot_pk)
+
+            index[key].append(event_pk)
+
+            if selected_pks is None or event_pk in selected_pks:
+                selected_keys.add(key)
+
+    conflicting_keys = sorted(key for key in selected_keys if len(set(index[key])) > 1)
+
+    if not conflicting_keys:
+        return []
+
+    involved_pks = {event_pk for key in conflicting_keys for event_pk in index[key]}
+    loaded_events = Event.objects.select_related(
+        "abstract_event__subject", "time_slot_override"
+    ).in_bulk(involved_pks)
+    resources = {
+        PARTICIPANT : EventParticipant.objects.in_bulk({key[1] for key in conflicting_keys if key[0] == PARTICIPANT}),
+        PLACE : EventPlace.objects.in_bulk({key[1] for key in conflicting_keys if key[0] == PLACE})
+    }
+
+    return [
+        EventConflict(
+            kind,
+            resources[kind][resource_pk],
+            [loaded_events[pk] for pk in sorted(set(index[(kind, resource_pk, date_, time_slot_pk)]))]
+        )
+        for kind, resource_pk, date_, time_slot_pk in conflicting_keys
+    ]
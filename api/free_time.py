@@ -0,0 +1,156 @@
+"""Search of time when given EventParticipants and some EventPlace are free
+
+Occupancy of every EventParticipant over date range is single integer bitset:
+bit (day * TimeSlots count + i) is set if EventParticipant has not canceled
+Event at i-th TimeSlot of day. Bitsets of all EventParticipants are merged
+by single OR and compared with EventPlaces bitsets by single AND for each
+EventPlace, so cost barely depends on range length and participants count
+"""
+
+from datetime import date, timedelta
+from api.room_occupancy import index as room_index
+from api.models import (
+    Event,
+    EventPlace,
+    TimeSlot
+)
+
+
+class FreeTime:
+    """Candidate date, TimeSlot and EventPlace for Event
+    """
+
+    def __init__(self, date_ : date, time_slot : TimeSlot, place : EventPlace):
+        self.date = date_
+        self.time_slot = time_slot
+        self.place = place
+
+    def __repr__(self):
+        return f"{self.date.strftime('%d.%m.%Y')} / {self.time_slot.alt_name}ч. / {self.place}"
+
+
+def get_days(date_from : date, date_to : date) -> list[date]:
+    """Returns days of range except Sundays
+    """
+
+    days = []
+    date_ = date_from
+
+    while date_ <= date_to:
+        if date_.weekday() != 6:
+            days.append(date_)
+
+        date_ += timedelta(days=1)
+
+    return days
+
+
+def get_participants_bitset(participant_pks : list[int], days : list[date], time_slots : list[int]) -> int:
+    """Returns merged occupancy bitset of given EventParticipants in single query
+    """
+
+    day_indexes = {d : i for i, d in enumerate(days)}
+    slot_indexes = {pk : i for i, pk in enumerate(time_slots)}
+    bitset = 0
+
+    for date_, time_slot_pk in Event.participants_override.through.objects.filter(
+        eventparticipant__in=participant_pks,
+        event__date__range=(days[0], days[-1]),
+        event__is_event_canceled=False,
+        event__time_slot_override__isnull=False
+    ).values_list("event__date", "event__time_slot_override").distinct():
+        if date_ in day_indexes and time_slot_pk in slot_indexes:
+            bitset |= 1 << (day_indexes[date_] * len(time_slots) + slot_indexes[time_slot_pk])
+
+    return bitset
+
+
+def get_places_bitsets(days : list[date],
+                       time_slots : list[int],
+                       bitmaps : dict[date, dict[int, int]]) -> dict[int, int]:
+    """Returns {EventPlace pk : occupancy bitset} built from room occupancy bitmaps
+    """
+
+    bitsets = {}
+
+    for day_index, d in enumerate(days):
+        shift = day_index * len(time_slots)
+
+        for place_pk, bitmap in bitmaps[d].items():
+            bitsets[place_pk] = bitsets.get(place_pk, 0) | bitmap << shift
+
+    return bitsets
+
+
+def find_free_time(participant_pks : list[int],
+                   date_from : date,
+                   date_to : date,
+                   time_slot_pks : list[int]|None = None,
+                   building : str|None = None,
+                   near : date|None = None,
+                   limit : int = 50,
+                   places_per_slot : int = 3) -> list[FreeTime]:
+    """Finds dates and TimeSlots when all given EventParticipants
+    and some EventPlace are free
+
+    Candidates are ranked by distance from near date (date_from by default),
+    then by TimeSlot start time, then by EventPlace.
+    For every date and TimeSlot at most places_per_slot EventPlaces are offered
+
+    Returns at most limit candidates
+    """
+
+    days = get_days(date_from, date_to)
+
+    if not days:
+        return []
+
+    # bitmaps are built with same TimeSlots
+    time_slots, bitmaps = room_index.get_occupancy(days)
+    slots_count = len(time_slots)
+    allowed_slots = 0
+
+    for i, pk in enumerate(time_slots):
+        if not time_slot_pks or pk in time_slot_pks:
+            allowed_slots |= 1 << i
+
+    allowed = 0
+
+    for day_index in range(len(days)):
+        allowed |= allowed_slots << day_index * slots_count
+
+    free = allowed & ~get_participants_bitset(participant_pks, days, time_slots)
+
+    if not free:
+        return []
+
+    near = near or date_from
+    cells = sorted(
+        (i for i in range(len(days) * slots_count) if free >> i & 1),
+        key=lambda i: (abs((days[i // slots_count] - near).days), i % slots_count, i)
+    )
+
+    places = EventPlace.objects.order_by("building", "room")
+
+    if building:
+        places = places.filter(building=building)
+
+    places_bitsets = get_places_bitsets(days, time_slots, bitmaps)
+    places_free = [(place, free & ~places_bitsets.get(place.pk, 0)) for place in places]
+    time_slot_models = TimeSlot.objects.in_bulk(time_slots)
+    candidates = []
+
+    for cell in cells:
+        cell_places = (place for place, place_free in places_free if place_free >> cell & 1)
+
+        for _, place in zip(range(places_per_slot), cell_places):
+            candidates.append(FreeTime(
+                days[cell // slots_count],
+                time_slot_models[time_slots[cell % slots_count]],
+                place
+            ))
+
+            if len(candidates) >= limit:
+                return candidates
+
+    return candidates
@@ -0,0 +1,245 @@
+"""Queue of import jobs stored in database
+
+Uploaded file is saved with queued ImportJob and imported later by worker
+process (manage.py import_worker), so import is not limited by HTTP request
+timeout. Worker records processed entries, time of import stages and errors
+of every job, admin and API show them while job is running. Stored file
+is deleted when job finishes.
+
+Progress also updates datemodified of job, running jobs without progress
+for IMPORT_JOB_TIMEOUT seconds (e.g. of killed worker) are failed when
+jobs are claimed. Import is made in single transaction, so nothing of
+such job is saved and it could be queued again.
+
+Files checked on admin preview page are stored until import is confirmed
+or canceled, previews older than IMPORT_PREVIEW_TIMEOUT seconds are deleted
+when other file is checked or jobs are claimed.
+
+On SQLite progress is written in connection of import, as database allows
+single writer, so it is visible only when job finishes
+"""
+
+import json
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+from api.importers import JSONImporter, ReferenceImporter
+from api.utilities import EventImportAPI
+from api.models import ImportJob
+
+
+logger = logging.getLogger(__name__)
+
+# directory of storage for files checked on preview page
+PREVIEW_DIR = "import_previews"
+
+# import is made in single transaction, so progress is written
+# in own connection to be visible before import is committed,
+# the connection is configured for PostgreSQL only
+PROGRESS_DATABASE = "import_progress" if "import_progress" in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+class JobProgress:
+    """Progress callback of importer, writes processed entries
+    and time of import stages into job
+    """
+
+    def __init__(self, job : ImportJob):
+        self.job = job
+        self.stage = None
+        self.stage_started_at = None
+
+    def __call__(self, stage : str, processed : int, total : int|None):
+        now = time.perf_counter()
+
+        if stage != self.stage:
+            self.finish_stage(now)
+            self.stage = stage
+            self.stage_started_at = now
+
+        self.job.processed = processed
+        self.job.total = total
+        # time of last progress tells that worker is alive
+        self.job.datemodified = timezone.now()
+        self.job.save(using=PROGRESS_DATABASE, update_fields=["processed", "total", "stages", "datemodified"])
+
+    def finish_stage(self, now : float|None = None):
+        if self.stage is None:
+            return
+
+        elapsed = (now or time.perf_counter()) - self.stage_started_at
+        self.job.stages[self.stage] = round(self.job.stages.get(self.stage, 0) + elapsed, 3)
+        self.stage = None
+
+
+def import_reference(importer):
+    """Makes job importer of reference importer reading whole file,
+    options of job are given to importer as keyword arguments
+    """
+
+    def run(file, options : dict, progress : JobProgress):
+        progress("import", 0, None)
+
+        return importer(file.read(), **options)
+
+    return run
+
+
+IMPORTERS = {
+    ImportJob.Kind.EVENTS : lambda file, options, progress: EventImportAPI.import_event_data(file, progress),
+    ImportJob.Kind.JSON : import_reference(lambda data: JSONImporter(json.loads(data)).import_data()),
+    ImportJob.Kind.SCHEDULES : import_reference(ReferenceImporter.import_schedule),
+    ImportJob.Kind.SUBJECTS : import_reference(ReferenceImporter.import_subject_reference),
+    ImportJob.Kind.TEACHERS : import_reference(ReferenceImporter.import_teacher_reference),
+    ImportJob.Kind.STUDENTS : import_reference(ReferenceImporter.import_student_reference),
+    ImportJob.Kind.PLACES : import_reference(ReferenceImporter.import_place_reference),
+    ImportJob.Kind.FACULTIES : import_reference(ReferenceImporter.import_faculty_reference),
+    ImportJob.Kind.DEPARTMENTS : import_reference(ReferenceImporter.import_department_reference),
+}
+
+
+def enqueue(kind : str, file, options : dict|None = None, author=None) -> ImportJob:
+    """Stores uploaded file or bytes and creates queued job for it
+    """
+
+    if isinstance(file, bytes):
+        file = ContentFile(file, name=f"{kind}.json")
+
+    return ImportJob.objects.create(kind=kind, file=file, options=options or {}, author=author)
+
+
+def fail_stale_jobs() -> int:
+    """Marks running jobs without progress for IMPORT_JOB_TIMEOUT seconds as failed
+    and deletes their files
+
+    Returns count of failed jobs
+    """
+
+    stale_jobs = ImportJob.objects.filter(
+        status=ImportJob.Status.RUNNING,
+        datemodified__lt=timezone.now() - timedelta(seconds=settings.IMPORT_JOB_TIMEOUT)
+    )
+    count = 0
+
+    for job in stale_jobs:
+        # job could be finished by its worker meanwhile
+        if ImportJob.objects.filter(pk=job.pk, status=ImportJob.Status.RUNNING).update(
+            status=ImportJob.Status.FAILED,
+            error="Задача не выполнялась дольше допустимого времени, импорт не сохранен",
+            finished_at=timezone.now()
+        ):
+            logger.warning("Import job %s is stale and failed", job.pk)
+            delete_file(job)
+            count += 1
+
+    return count
+
+
+def delete_file(job : ImportJob):
+    """Deletes stored file of finished job
+    """
+
+    if not job.file:
+        return
+
+    job.file.delete(save=False)
+    ImportJob.objects.filter(pk=job.pk).update(file="")
+
+
+def store_preview(file) -> str:
+    """Stores file checked on preview page, stale previews are deleted before
+
+    Returns name of file in storage
+    """
+
+    delete_stale_previews()
+
+    return default_storage.save(f"{PREVIEW_DIR}/preview.json", file)
+
+
+def delete_preview(name : str|None):
+    if name and name.startswith(f"{PREVIEW_DIR}/"):
+        default_storage.delete(name)
+
+
+def delete_stale_previews() -> int:
+    """Deletes previews not confirmed or canceled for IMPORT_PREVIEW_TIMEOUT seconds
+
+    Returns count of deleted files
+    """
+
+    if not default_storage.exists(PREVIEW_DIR):
+        return 0
+
+    expired_at = timezone.now() - timedelta(seconds=settings.IMPORT_PREVIEW_TIMEOUT)
+    count = 0
+
+    for name in default_storage.listdir(PREVIEW_DIR)[1]:
+        name = f"{PREVIEW_DIR}/{name}"
+
+        if default_storage.get_modified_time(name) < expired_at:
+            default_storage.delete(name)
+            count += 1
+
+    return count
+
+
+def claim_jobs(limit : int) -> list[ImportJob]:
+    """Marks up to limit queued jobs as running in order of queueing
+
+    Jobs locked or claimed by other workers are skipped,
+    stale running jobs and previews are deleted before
+
+    Returns claimed jobs
+    """
+
+    fail_stale_jobs()
+    delete_stale_previews()
+
+    claimed = []
+
+    with transaction.atomic():
+        queued = ImportJob.objects.select_for_update(skip_locked=True).filter(
+            status=ImportJob.Status.QUEUED
+        ).order_by("pk")[:limit]
+
+        for job in queued:
+            job.status = ImportJob.Status.RUNNING
+            job.started_at = job.datemodified = timezone.now()
+
+            # without row locks (SQLite) only one of workers changes status
+            if ImportJob.objects.filter(pk=job.pk, status=ImportJob.Status.QUEUED).update(
+                status=job.status, started_at=job.started_at, datemodified=job.datemodified
+            ):
+                claimed.append(job)
+
+    return claimed
+
+
+def run_job(job : ImportJob) -> ImportJob:
+    """Imports file of claimed job and records its result or error
+    """
+
+    progress = JobProgress(job)
+
+    try:
+        with job.file.open("rb") as file:
+            job.result = IMPORTERS[job.kind](file, job.options, progress)
+    except Exception as e:
+        logger.exception("Import job %s failed", job.pk)
+        job.status = ImportJob.Status.FAILED
+        job.error = str(e)
+    else:
+        job.status = ImportJob.Status.DONE
+
+    progress.finish_stage()
+    job.finished_at = timezone.now()
+    job.save(using=PROGRESS_DATABASE, update_fields=["status", "result", "error", "stages", "finished_at"])
+    delete_file(job)
+
+    return job
@@ -2,6 +2,7 @@ import json
 import re
 from datetime import datetime, date, timedelta
 from api.utilities import Utilities, ReadAPI, WriteAPI
+from api.bulk_operations import bulk_operation
 from rest_framework.exceptions import ValidationError
 from api.models import (
     EventPlace,
@@ -178,19 +179,20 @@ class EventImporter:
         schedule = cls.find_schedule(Utilities.replace_all_roman_with_arabic_numerals(title))
         reference_lookup : dict = {}
 
-        for entry in entries:
-            cls.correct_event_data(schedule, entry)
+        with bulk_operation():
+            for entry in entries:
+                cls.correct_event_data(schedule, entry)
 
-            reference_data = cls.collect_reference_data(entry)
-            cls.ensure_reference_data(reference_data)
-            reference_lookup.update(cls.build_reference_lookup(reference_data)) ## TODO: test
+                reference_data = cls.collect_reference_data(entry)
+                cls.ensure_reference_data(reference_data)
+                reference_lookup.update(cls.build_reference_lookup(reference_data)) ## TODO: test
 
-            calendar = cls.make_calendar(weeks, months, schedule)
+                calendar = cls.make_calendar(weeks, months, schedule)
 
-            cls.create_events(
-                schedule,
-                *cls.parse_data(entry, calendar, week_days, reference_lookup)
-            )
+                cls.create_events(
+                    schedule,
+                    *cls.parse_data(entry, calendar, week_days, reference_lookup)
+                )
 
     @classmethod
     def correct_event_data(cls, schedule : Schedule, event_data) -> None:
@@ -576,6 +578,24 @@ class EventImporter:
 
 
 class ReferenceImporter:
+    """Imports reference data in bulk
+
+    Existing records and Departments are fetched by single query per table,
+    duplicates are found by sets
+    """
+
+    @staticmethod
+    def get_departments_by_code(codes) -> dict[str, Department]:
+        """Returns {code : Department} for given codes in single query
+        """
+
+        departments = {}
+
+        for department in Department.objects.filter(code__in=set(codes)).order_by("pk"):
+            departments.setdefault(department.code, department)
+
+        return departments
+
     @staticmethod
     def import_place_reference(reference_data : str):
         """
@@ -585,26 +605,22 @@ class ReferenceImporter:
 
         json_data = json.loads(reference_data)
 
-        places_to_create = []
-        already_read_places = []
-
-        for place in json_data["places"]:
-            normalized_place = Utilities.normalize_place_repr(place)
-
-            if normalized_place in already_read_places or ReadAPI.is_place_already_exists(*normalized_place):
-                continue
-
-            places_to_create.append(
-                EventPlace(
-                    building=normalized_place[0],
-                    room=normalized_place[1]
-                )
-            )
-            
-            already_read_places.append(normalized_place)
+        places = {
+            normalized_place : None
+            for normalized_place in map(Utilities.normalize_place_repr, json_data["places"])
+            if normalized_place
+        }
+        existing_places = set(
+            EventPlace.objects.filter(room__in={room for _, room in places}).values_list("building", "room")
+        )
+        places_to_create = [
+            EventPlace(building=building, room=room)
+            for building, room in places
+            if (building, room) not in existing_places
+        ]
 
         if places_to_create:
-            EventPlace.objects.bulk_create(places_to_create)
+            EventPlace.objects.bulk_create(places_to_create, batch_size=WriteAPI.BULK_BATCH_SIZE)
 
     @staticmethod
     def import_subject_reference(reference_data : str):
@@ -615,26 +631,19 @@ class ReferenceImporter:
 
         json_data = json.loads(reference_data)
 
-        subjects_to_create = []
-        already_read_subjects = []
-
-        for entry in json_data:
-            subject = entry["discipline_name"]
-            
-            if subject in already_read_subjects or ReadAPI.is_subject_already_exists(subject):
-                continue
-
-            subjects_to_create.append(
-                Subject(name=subject)
-            )
-            
-            already_read_subjects.append(subject)
+        subjects = dict.fromkeys(entry["discipline_name"] for entry in json_data)
+        existing_subjects = set(Subject.objects.filter(name__in=subjects).values_list("name", flat=True))
+        subjects_to_create = [
+            Subject(name=subject)
+            for subject in subjects
+            if subject not in existing_subjects
+        ]
         
         if subjects_to_create:
-            Subject.objects.bulk_create(subjects_to_create)
+            Subject.objects.bulk_create(subjects_to_create, batch_size=WriteAPI.BULK_BATCH_SIZE)
 
-    @staticmethod
-    def import_faculty_reference(reference_data : str):
+    @classmethod
+    def import_faculty_reference(cls, reference_data : str):
         """
 
         Not create duplicates
@@ -642,37 +651,13 @@ class ReferenceImporter:
 
         json_data = json.loads(reference_data)
 
-        # TODO: looking baad
-        organization = Organization.objects.get(name="ВолгГТУ")
-        faculties_to_create = []
-        already_read_faculties = []
-
-        for entry in json_data:
-            department_name = entry["faculty_fullname"]
-            department_shortname = entry["faculty_shortname"]
-            department_code = entry["faculty_id"]
-
-            if (department_name, department_shortname, department_code) in already_read_faculties \
-                or ReadAPI.is_department_already_exists(department_name, department_shortname, department_code):
-                continue
+        cls.create_departments([
+            (entry["faculty_fullname"], entry["faculty_shortname"], entry["faculty_id"], None)
+            for entry in json_data
+        ])
 
-            faculties_to_create.append(
-                Department(
-                    name=department_name,
-                    shortname=department_shortname,
-                    code=department_code,
-                    parent_department=None,
-                    organization=organization
-                )
-            )
-
-            already_read_faculties.append((department_name, department_shortname, department_code))
-        
-        if faculties_to_create:
-            Department.objects.bulk_create(faculties_to_create)
-
-    @staticmethod
-    def import_department_reference(reference_data : str):
+    @classmethod
+    def import_department_reference(cls, reference_data : str):
         """
 
         Creates Department even parent_department not found
@@ -682,42 +667,46 @@ class ReferenceImporter:
 
         json_data = json.loads(reference_data)
 
+        cls.create_departments([
+            (entry["department_fullname"], entry["department_shortname"], entry["department_code"], entry["faculty_id"])
+            for entry in json_data
+        ])
+
+    @classmethod
+    def create_departments(cls, departments : list[tuple[str, str, str, str|None]]):
+        """Creates not existing Departments from (name, shortname, code, parent Department code)
+
+        Not create duplicates
+        """
+
         # TODO: looking baad
         organization = Organization.objects.get(name="ВолгГТУ")
-        departments_to_create = []
-        already_read_departments = []
 
-        for entry in json_data:
-            department_name = entry["department_fullname"]
-            department_shortname = entry["department_shortname"]
-            department_code = entry["department_code"]
+        existing_departments = set(
+            Department.objects.filter(code__in={code for _, _, code, _ in departments}).values_list("name", "shortname", "code")
+        )
+        parent_departments = cls.get_departments_by_code(
+            parent_code for _, _, _, parent_code in departments if parent_code is not None
+        )
+        departments_to_create = {}
 
-            if (department_name, department_shortname, department_code) in already_read_departments \
-                or ReadAPI.is_department_already_exists(department_name, department_shortname, department_code):
+        for name, shortname, code, parent_code in departments:
+            if (name, shortname, code) in existing_departments:
                 continue
 
-            try:
-                parent_department = Department.objects.get(code=entry["faculty_id"])
-            except Department.DoesNotExist:
-                parent_department = None
-
-            departments_to_create.append(
-                Department(
-                    name=department_name,
-                    shortname=department_shortname,
-                    code=department_code,
-                    parent_department=parent_department,
-                    organization=organization
-                )
-            )
-
-            already_read_departments.append((department_name, department_shortname, department_code))
+            departments_to_create.setdefault((name, shortname, code), Department(
+                name=name,
+                shortname=shortname,
+                code=code,
+                parent_department=parent_departments.get(parent_code),
+                organization=organization
+            ))
         
         if departments_to_create:
-            Department.objects.bulk_create(departments_to_create)
+            Department.objects.bulk_create(departments_to_create.values(), batch_size=WriteAPI.BULK_BATCH_SIZE)
 
-    @staticmethod
-    def import_teacher_reference(reference_data : str):
+    @classmethod
+    def import_teacher_reference(cls, reference_data : str):
         """
 
         Creates EventParticipant (teacher) even Department not found
@@ -727,32 +716,26 @@ class ReferenceImporter:
 
         json_data = json.loads(reference_data)
 
-        teachers_to_create = []
-
-        for entry in json_data:
-            try:
-                department = Department.objects.get(code=entry["staff_department_code"])
-            except Department.DoesNotExist:
-                department = None
-
-            teachers_to_create.append(
-                EventParticipant(
-                    name=Utilities.format_participant_name(
-                        entry["staff_surname"], 
-                        entry["staff_name"], 
-                        entry["staff_patronymic"]
-                    ),
-                    role=EventParticipant.Role.TEACHER, ## TODO: assistant
-                    is_group=False,
-                    department=department
-                )
+        departments = cls.get_departments_by_code(entry["staff_department_code"] for entry in json_data)
+        teachers_to_create = [
+            EventParticipant(
+                name=Utilities.format_participant_name(
+                    entry["staff_surname"], 
+                    entry["staff_name"], 
+                    entry["staff_patronymic"]
+                ),
+                role=EventParticipant.Role.TEACHER, ## TODO: assistant
+                is_group=False,
+                department=departments.get(entry["staff_department_code"])
             )
+            for entry in json_data
+        ]
         
         if teachers_to_create:
-            EventParticipant.objects.bulk_create(teachers_to_create)
+            EventParticipant.objects.bulk_create(teachers_to_create, batch_size=WriteAPI.BULK_BATCH_SIZE)
 
-    @staticmethod
-    def import_student_reference(reference_data : str):
+    @classmethod
+    def import_student_reference(cls, reference_data : str):
         """
 
         Creates EventParticipant (student) even Department not found
@@ -762,32 +745,28 @@ class ReferenceImporter:
         
         json_data = json.loads(reference_data)
 
-        students_to_create = []
-        already_read_students = []
+        departments = cls.get_departments_by_code(entry["faculty_id"] for entry in json_data)
+        existing_students = set(
+            EventParticipant.objects.filter(name__in={entry["group_name"] for entry in json_data}).values_list("name", "department")
+        )
+        students_to_create = {}
 
         for entry in json_data:
-            try:
-                department = Department.objects.get(code=entry["faculty_id"])
-            except Department.DoesNotExist:
-                department = None
-
+            department = departments.get(entry["faculty_id"])
             student_name = entry["group_name"]
 
-            if student_name in already_read_students or ReadAPI.is_participant_already_exists(student_name, department):
+            if student_name in students_to_create or (student_name, department.pk if department else None) in existing_students:
                 continue
 
-            students_to_create.append(
-                EventParticipant(
-                    name=student_name,
-                    role=EventParticipant.Role.STUDENT,
-                    is_group=True,
-                    department=department
-                )
+            students_to_create[student_name] = EventParticipant(
+                name=student_name,
+                role=EventParticipant.Role.STUDENT,
+                is_group=True,
+                department=department
             )
-            already_read_students.append(student_name)
         
         if students_to_create:
-            EventParticipant.objects.bulk_create(students_to_create)
+            EventParticipant.objects.bulk_create(students_to_create.values(), batch_size=WriteAPI.BULK_BATCH_SIZE)
 
     @staticmethod
     def import_schedule(reference_data : str, save_archive_schedules : bool):
@@ -0,0 +1,232 @@
+"""Timing and counters of import stages
+
+Inside profiling() block every stage() records wall time, count of queries,
+rows written by INSERT, UPDATE and DELETE and peak of memory allocated by
+Python above memory at stage start. Outside of block stage() does nothing,
+so stages are kept in import code.
+
+Stage could be entered many times (e.g. parse_data for every batch), its
+values are summed up, peak of memory is maximal one. Values of nested stages
+are included in outer ones, except of cProfile dumps
+"""
+
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE")
+
+
+class StageStats:
+    def __init__(self, name : str):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.rows_written = 0
+        # bytes, None if memory is not traced
+        self.peak_memory = None
+        self.profile = None
+        self.profile_path = None
+
+    def as_dict(self) -> dict:
+        return {
+            "name" : self.name,
+            "calls" : self.calls,
+            "seconds" : round(self.seconds, 4),
+            "queries" : self.queries,
+            "rows_written" : self.rows_written,
+            "peak_memory" : self.peak_memory,
+            "profile" : self.profile_path
+        }
+
+
+class Profiler:
+    """Collects stats of stages entered inside profiling() block
+    """
+
+    def __init__(self, trace_memory : bool = True, profile_dir : str|None = None):
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        # {name : StageStats} in order of first entering
+        self.stages = {}
+        self.seconds = 0.0
+        self.queries = 0
+        self.rows_written = 0
+        # entered stages and their peaks of memory before nested stages
+        self.stack = []
+        self.peaks = []
+        # cursor of last writing query
+        self.write_cursor = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count_rows_written()
+
+        result = execute(sql, params, many, context)
+        self.queries += 1
+
+        if sql.lstrip()[:6].upper() in WRITE_STATEMENTS:
+            self.write_cursor = context["cursor"]
+
+        return result
+
+    def count_rows_written(self):
+        """Adds rows written by last writing query
+
+        Rows inserted with RETURNING are counted by SQLite when they are fetched,
+        so cursor is checked on next query or on stage exit
+        """
+
+        if self.write_cursor is not None:
+            self.rows_written += max(self.write_cursor.rowcount, 0)
+            self.write_cursor = None
+
+    @contextmanager
+    def stage(self, name : str):
+        stats = self.stages.get(name)
+
+        if stats is None:
+            stats = self.stages[name] = StageStats(name)
+
+        if self.trace_memory:
+            memory, peak = tracemalloc.get_traced_memory()
+
+            # peak is reset for stage, outer one keeps peak reached before
+            if self.peaks:
+                self.peaks[-1] = max(self.peaks[-1], peak)
+
+            tracemalloc.reset_peak()
+
+        if self.profile_dir:
+            # only one profiler could be enabled at once
+            if self.stack:
+                self.stack[-1].profile.disable()
+
+            if stats.profile is None:
+                stats.profile = cProfile.Profile()
+
+            stats.profile.enable()
+
+        self.stack.append(stats)
+        self.peaks.append(0)
+        queries = self.queries
+        rows_written = self.rows_written
+        started = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.count_rows_written()
+            stats.calls += 1
+            stats.seconds += time.perf_counter() - started
+            stats.queries += self.queries - queries
+            stats.rows_written += self.rows_written - rows_written
+
+            self.stack.pop()
+            peak = self.peaks.pop()
+
+            if self.trace_memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                stats.peak_memory = max(stats.peak_memory or 0, peak - memory)
+
+                if self.peaks:
+                    self.peaks[-1] = max(self.peaks[-1], peak)
+
+            if self.profile_dir:
+                stats.profile.disable()
+
+                if self.stack:
+                    self.stack[-1].profile.enable()
+
+    def dump_profiles(self):
+        """Writes cProfile stats of every stage into profile_dir/<stage>.prof
+        """
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+
+        for stats in self.stages.values():
+            if stats.profile is not None:
+                stats.profile_path = os.path.join(self.profile_dir, f"{stats.name}.prof")
+                stats.profile.dump_stats(stats.profile_path)
+
+    def report(self) -> dict:
+        return {
+            "seconds" : round(self.seconds, 4),
+            "queries" : self.queries,
+            "rows_written" : self.rows_written,
+            "stages" : [stats.as_dict() for stats in self.stages.values()]
+        }
+
+
+def get_profiler() -> Profiler|None:
+    return getattr(_local, "profiler", None)
+
+
+@contextmanager
+def profiling(trace_memory : bool = True, profile_dir : str|None = None, using : str = DEFAULT_DB_ALIAS):
+    """Records stages entered inside block, yields Profiler
+
+    Queries are counted on connection of given alias. Memory tracing slows
+    Python code down, so it could be disabled for timing. If profile_dir is
+    given, cProfile stats of every stage are dumped there on exit.
+    Report is logged on exit. Nested blocks are part of outer one
+    """
+
+    profiler = get_profiler()
+
+    if profiler is not None:
+        yield profiler
+
+        return
+
+    profiler = Profiler(trace_memory, profile_dir)
+    is_tracing_started = trace_memory and not tracemalloc.is_tracing()
+
+    if is_tracing_started:
+        tracemalloc.start()
+
+    _local.profiler = profiler
+    started = time.perf_counter()
+
+    try:
+        with connections[using].execute_wrapper(profiler):
+            yield profiler
+    finally:
+        profiler.count_rows_written()
+        profiler.seconds = time.perf_counter() - started
+        _local.profiler = None
+
+        if is_tracing_started:
+            tracemalloc.stop()
+
+        if profile_dir:
+            profiler.dump_profiles()
+
+    logger.info("Import stages: %s", json.dumps(profiler.report(), ensure_ascii=False))
+
+
+@contextmanager
+def stage(name : str):
+    """Records stats of block as stage with given name if profiling is active
+    """
+
+    profiler = get_profiler()
+
+    if profiler is None:
+        yield
+
+        return
+
+    with profiler.stage(name):
+        yield
@@ -0,0 +1,216 @@
+"""Streaming reader of large JSON documents
+
+Walks document from file once and decodes only values at requested paths.
+Items of requested arrays are decoded one by one and other values are
+skipped without decoding, so memory depends on size of single item,
+not on document size.
+
+Path is tuple of object keys from document root, e.g. ("table", "grid")
+"""
+
+import codecs
+import json
+
+
+WHITESPACE = " \t\n\r"
+SCALAR_END = WHITESPACE + ",]}"
+
+
+class JSONStream:
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, file, chunk_size : int|None = None):
+        # file opened in text or binary mode
+        self.file = file
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.is_eof = False
+
+    def fill(self) -> bool:
+        """Appends next chunk of file to buffer dropping parsed part
+
+        Returns False on end of file
+        """
+
+        if self.is_eof:
+            return False
+
+        while True:
+            raw_chunk = self.file.read(self.chunk_size)
+            chunk = raw_chunk
+
+            if isinstance(raw_chunk, bytes):
+                # chunk could end inside of multibyte char
+                chunk = self.decoder.decode(raw_chunk, final=not raw_chunk)
+
+            if chunk or not raw_chunk:
+                break
+
+        if not chunk:
+            self.is_eof = True
+
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+        return not self.is_eof
+
+    def peek(self) -> str|None:
+        """Returns next not whitespace char without consuming it
+        """
+
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+
+            if not self.fill():
+                return None
+
+    def expect(self, chars : str) -> str:
+        char = self.peek()
+
+        if char is None or char not in chars:
+            raise ValueError(f"Ожидался один из символов '{chars}' в JSON, найдено: {char!r}")
+
+        self.pos += 1
+
+        return char
+
+    def decode_value(self):
+        """Decodes next value
+        """
+
+        char = self.peek()
+
+        if char is None:
+            raise ValueError("Неожиданный конец JSON")
+
+        if char not in '{["':
+            # number or literal could be cut by chunk end
+            while not any(c in SCALAR_END for c in self.buffer[self.pos:]) and self.fill():
+                pass
+
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+
+                continue
+
+            self.pos = end
+
+            return value
+
+    def skip_value(self):
+        """Skips next value without decoding it
+        """
+
+        char = self.peek()
+
+        if char == '"':
+            self.skip_string()
+        elif char in "{[":
+            depth = 0
+
+            while True:
+                if self.pos >= len(self.buffer) and not self.fill():
+                    raise ValueError("Неожиданный конец JSON")
+
+                char = self.buffer[self.pos]
+
+                if char == '"':
+                    self.skip_string()
+
+                    continue
+
+                self.pos += 1
+
+                if char in "{[":
+                    depth += 1
+                elif char in "}]":
+                    depth -= 1
+
+                    if not depth:
+                        return
+        else:
+            while True:
+                if self.pos >= len(self.buffer) and not self.fill():
+                    return
+
+                if self.buffer[self.pos] in SCALAR_END:
+                    return
+
+                self.pos += 1
+
+    def skip_string(self):
+        # opening quote
+        self.pos += 1
+
+        while True:
+            if self.pos >= len(self.buffer) and not self.fill():
+                raise ValueError("Неожиданный конец JSON")
+
+            char = self.buffer[self.pos]
+            self.pos += 1
+
+            if char == "\\":
+                if self.pos >= len(self.buffer):
+                    self.fill()
+
+                self.pos += 1
+            elif char == '"':
+                return
+
+    def walk(self, values=(), arrays=()):
+        """Yields (path, value) for values at given paths
+        and (path, item) for every item of arrays at given paths
+        in document order
+        """
+
+        values = set(values)
+        arrays = set(arrays)
+        prefixes = {path[:i] for path in values | arrays for i in range(len(path))}
+
+        yield from self.walk_value((), values, arrays, prefixes)
+
+    def walk_value(self, path : tuple, values : set, arrays : set, prefixes : set):
+        if path in values:
+            yield path, self.decode_value()
+        elif path in arrays:
+            self.expect("[")
+
+            if self.peek() == "]":
+                self.pos += 1
+
+                return
+
+            while True:
+                yield path, self.decode_value()
+
+                if self.expect(",]") == "]":
+                    return
+        elif path in prefixes and self.peek() == "{":
+            self.expect("{")
+
+            if self.peek() == "}":
+                self.pos += 1
+
+                return
+
+            while True:
+                key = self.decode_value()
+                self.expect(":")
+
+                yield from self.walk_value(path + (key,), values, arrays, prefixes)
+
+                if self.expect(",}") == "}":
+                    return
+        else:
+            self.skip_value()
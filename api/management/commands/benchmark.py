@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = "Замеряет время и количество запросов операций на синтетических данных. Данные не сохраняются"
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=SCENARIOS.keys())
+        parser.add_argument("--scale", type=int, default=10, help="Размер синтетических данных (количество групп)")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            results = SCENARIOS[options["scenario"]](options["scale"])
+
+            # benchmark never changes database
+            transaction.set_rollback(True)
+
+        for name, seconds, queries in results:
+            self.stdout.write(f"{name:<40} {seconds:>10.3f} с {queries:>10} запросов")
@@ -0,0 +1,48 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+import api.conflicts as conflicts
+from api.models import Schedule, Department, Event
+
+
+class Command(BaseCommand):
+    help = "Ищет накладки преподавателей, групп и аудиторий в запланированных событиях или в событиях за период"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schedule", type=int, help="Проверить только расписание с заданным id")
+        parser.add_argument("--department", help="Проверить только подразделение с заданным кратким названием")
+        parser.add_argument("--date-from", type=date.fromisoformat, help="Проверить события начиная с даты (YYYY-MM-DD)")
+        parser.add_argument("--date-to", type=date.fromisoformat, help="Проверить события по дату включительно (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        schedule = None
+        department = None
+
+        try:
+            if options["schedule"] is not None:
+                schedule = Schedule.objects.get(pk=options["schedule"])
+
+            if options["department"] is not None:
+                department = Department.objects.get(shortname=options["department"])
+        except (Schedule.DoesNotExist, Department.DoesNotExist, Department.MultipleObjectsReturned) as e:
+            raise CommandError(str(e))
+
+        if (options["date_from"] is None) != (options["date_to"] is None):
+            raise CommandError("Необходимо задать обе даты периода")
+
+        if options["date_from"] is None:
+            found_conflicts = conflicts.find_conflicts(conflicts.get_scope(schedule, department))
+        else:
+            events = None
+
+            if schedule or department:
+                events = Event.objects.filter(abstract_event__in=conflicts.get_scope(schedule, department))
+
+            found_conflicts = conflicts.find_event_conflicts(options["date_from"], options["date_to"], events)
+
+        for conflict in found_conflicts:
+            self.stdout.write(repr(conflict))
+
+        if found_conflicts:
+            self.stdout.write(self.style.WARNING(f"Найдено накладок: {len(found_conflicts)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Накладки не найдены"))
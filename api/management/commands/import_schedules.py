@@ -0,0 +1,60 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+import api.schedule_import as schedule_import
+from api.utilities import EventImportAPI
+
+
+class Command(BaseCommand):
+    help = "Импортирует JSON файлы расписаний, файлы разных расписаний импортируются параллельно"
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Файлы, каталоги или шаблоны путей к JSON файлам расписаний")
+        parser.add_argument("--processes", type=int, default=os.cpu_count(), help="Количество процессов для импорта")
+        parser.add_argument("--dry-run", action="store_true", help="Вывести план импорта в JSON без изменения базы данных")
+        parser.add_argument("--profile", action="store_true", help="Вывести время, запросы, записанные строки и пик памяти этапов импорта")
+        parser.add_argument("--profile-dir", help="Каталог для cProfile статистики этапов импорта каждого файла")
+
+    def handle(self, *args, **options):
+        paths = schedule_import.find_files(options["paths"])
+
+        if not paths:
+            raise CommandError("Не найдено файлов для импорта")
+
+        if options["dry_run"]:
+            return self.plan(paths)
+
+        file_imports = schedule_import.import_files(
+            paths, options["processes"], options["profile"] or bool(options["profile_dir"]), options["profile_dir"]
+        )
+        failed = 0
+
+        for file_import in file_imports:
+            if file_import.error:
+                failed += 1
+                self.stdout.write(self.style.ERROR(repr(file_import)))
+            else:
+                self.stdout.write(self.style.SUCCESS(repr(file_import)))
+
+            if file_import.profile:
+                self.stdout.write(json.dumps(file_import.profile, ensure_ascii=False, indent=4))
+
+        if failed:
+            raise CommandError(f"Не удалось импортировать файлов: {failed} из {len(file_imports)}")
+
+    def plan(self, paths : list[str]):
+        plans = {}
+        failed = 0
+
+        for path in paths:
+            try:
+                with open(path, "rb") as file:
+                    plans[path] = EventImportAPI.plan_event_import(file)
+            except Exception as e:
+                failed += 1
+                plans[path] = {"error" : str(e)}
+
+        self.stdout.write(json.dumps(plans, ensure_ascii=False, indent=4))
+
+        if failed:
+            raise CommandError(f"Не удалось проверить файлов: {failed} из {len(paths)}")
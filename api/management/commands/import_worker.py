@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import api.import_jobs as import_jobs
+from api.access_tracking import buffer
+from api.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = "Выполняет задачи импорта из очереди"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1, help="Количество задач, получаемых из очереди за раз")
+        parser.add_argument("--sleep", type=float, default=5, help="Пауза между проверками пустой очереди, с")
+        parser.add_argument("--once", action="store_true", help="Завершить работу, когда очередь пуста")
+
+    def handle(self, *args, **options):
+        while True:
+            # worker is long-running, so broken or expired connections are dropped
+            close_old_connections()
+            jobs = import_jobs.claim_jobs(options["batch_size"])
+
+            if not jobs:
+                if options["once"]:
+                    return
+
+                time.sleep(options["sleep"])
+
+                continue
+
+            for job in jobs:
+                import_jobs.run_job(job)
+
+                if job.status == ImportJob.Status.DONE:
+                    self.stdout.write(self.style.SUCCESS(f"{job!r}, {job.stages}"))
+                else:
+                    self.stdout.write(self.style.ERROR(f"{job!r}: {job.error}"))
+
+            # dateaccessed of records loaded by imports is written between jobs
+            buffer.flush_if_needed()
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+import api.placement as placement
+from api.models import AbstractEvent, Schedule
+
+
+class Command(BaseCommand):
+    help = "Расставляет запланированные события расписания без мест проведения по дням, временным интервалам и аудиториям"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schedule", type=int, required=True, help="ID расписания")
+        parser.add_argument("--all", action="store_true", help="Переставить все запланированные события расписания")
+        parser.add_argument("--building", help="Выбирать аудитории только в заданном корпусе")
+        parser.add_argument("--restarts", type=int, default=1, help="Количество запусков с разным порядком событий")
+        parser.add_argument("--processes", type=int, default=1, help="Количество процессов для запусков")
+        parser.add_argument("--dry-run", action="store_true", help="Не сохранять результат")
+
+    def handle(self, *args, **options):
+        try:
+            schedule = Schedule.objects.get(pk=options["schedule"])
+        except Schedule.DoesNotExist as e:
+            raise CommandError(str(e))
+
+        abstract_events = AbstractEvent.objects.filter(schedule=schedule)
+
+        if not options["all"]:
+            abstract_events = abstract_events.filter(places__isnull=True)
+
+        if not abstract_events.exists():
+            self.stdout.write(self.style.SUCCESS("Нет событий для расстановки"))
+
+            return
+
+        problem = placement.build_problem(abstract_events, building=options["building"])
+        solution = placement.solve(problem, options["restarts"], options["processes"])
+
+        if not options["dry_run"]:
+            placement.apply_solution(solution)
+
+        self.stdout.write(repr(solution))
+
+        for pk in solution.unplaced:
+            self.stdout.write(self.style.WARNING(f"Не удалось расставить: {AbstractEvent.objects.get(pk=pk)!r}"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0040_event_date_time_slot_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='abstractevent',
+            name='import_fingerprint',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, null=True, verbose_name='Отпечаток импортированной записи'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0041_abstractevent_import_fingerprint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idnumber', models.CharField(blank=True, max_length=260, null=True, unique=True, verbose_name='Уникальный строковый идентификатор')),
+                ('datecreated', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания записи')),
+                ('datemodified', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения записи')),
+                ('dateaccessed', models.DateTimeField(blank=True, null=True, verbose_name='Дата доступа к записи')),
+                ('note', models.TextField(blank=True, max_length=1024, null=True, verbose_name='Комментарий для этой записи')),
+                ('kind', models.CharField(choices=[('events', 'Расписание занятий'), ('json', 'Данные в формате JSON'), ('schedules', 'Справочник расписаний'), ('subjects', 'Справочник предметов'), ('teachers', 'Справочник преподавателей'), ('students', 'Справочник групп'), ('places', 'Справочник аудиторий'), ('faculties', 'Справочник факультетов'), ('departments', 'Справочник кафедр')], max_length=32, verbose_name='Тип импорта')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='queued', max_length=16, verbose_name='Состояние')),
+                ('file', models.FileField(upload_to='import_jobs/', verbose_name='Файл')),
+                ('options', models.JSONField(blank=True, default=dict, verbose_name='Параметры импорта')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Обработано записей')),
+                ('total', models.PositiveIntegerField(blank=True, null=True, verbose_name='Всего записей')),
+                ('stages', models.JSONField(blank=True, default=dict, verbose_name='Время этапов импорта, с')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Результат')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Ошибка')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начало выполнения')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Окончание выполнения')),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Автор записи')),
+            ],
+            options={
+                'verbose_name': 'Задача импорта',
+                'verbose_name_plural': 'Задачи импорта',
+                'indexes': [models.Index(fields=['status', 'id'], name='import_job_status_idx')],
+            },
+        ),
+    ]
@@ -2,7 +2,7 @@ from typing import Optional, Self
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models.signals import pre_save, post_save, pre_delete, m2m_changed
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.urls import reverse
 
@@ -34,6 +34,86 @@ class CommonModel(models.Model):
     def last_modified_record(cls) -> Optional[Self]:
         return cls.objects.order_by("-datemodified").first()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+
+        # remembering loaded values to find changed fields without fetching row again
+        instance._loaded_values = dict(zip(field_names, values))
+
+        return instance
+    
+    def save(self, **kwargs):
+        super().save(**kwargs)
+
+        update_fields = kwargs.get("update_fields")
+        current_values = self.get_current_values()
+
+        if update_fields is not None and hasattr(self, "_loaded_values"):
+            attnames = {self._meta.get_field(name).attname for name in update_fields}
+
+            self._loaded_values.update({k : v for k, v in current_values.items() if k in attnames})
+        else:
+            self._loaded_values = current_values
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+        current_values = self.get_current_values()
+
+        # reloaded values are values in database now
+        if fields is None:
+            self._loaded_values = current_values
+        elif hasattr(self, "_loaded_values"):
+            attnames = {self._meta.get_field(name).attname for name in fields}
+
+            self._loaded_values.update({k : v for k, v in current_values.items() if k in attnames})
+
+    def get_current_values(self) -> dict:
+        """Returns loaded values of concrete fields by its attnames
+
+        Deferred fields are not included
+        """
+
+        return {f.attname : self.__dict__[f.attname] for f in self._meta.concrete_fields if f.attname in self.__dict__}
+
+    def get_loaded_values(self) -> dict:
+        """Returns values of concrete fields as they are in database by its attnames
+
+        Fetches them if instance was not loaded from database or saved
+        """
+
+        if not hasattr(self, "_loaded_values"):
+            self._loaded_values = self.__class__.objects.filter(pk=self.pk).values(
+                *[f.attname for f in self._meta.concrete_fields]
+            ).first() or {}
+
+        return self._loaded_values
+
+    def loaded_value(self, field_name : str):
+        """Returns value of field as it is in database
+
+        For relation fields returns related model pk
+        """
+
+        return self.get_loaded_values().get(self._meta.get_field(field_name).attname)
+
+    def changed_fields(self) -> set[str]:
+        """Returns names of concrete fields changed since loading from database or saving
+
+        For not saved instance returns all fields
+        """
+
+        if self.pk is None:
+            return {f.name for f in self._meta.concrete_fields}
+        
+        loaded_values = self.get_loaded_values()
+
+        return {
+            f.name for f in self._meta.concrete_fields
+            if f.attname in loaded_values and f.attname in self.__dict__ and loaded_values[f.attname] != self.__dict__[f.attname]
+        }
+
     def __str__(self):
         return self.__repr__()
 
@@ -437,17 +517,33 @@ class AbstractEvent(CommonModel):
     holds_on_date = models.DateField(null=True, blank=True, verbose_name="Проводится только в заданный день")
     schedule = models.ForeignKey(Schedule, null=True, on_delete=models.CASCADE, related_name="events", verbose_name="Расписание")
     changes = models.ForeignKey(AbstractEventChanges, null=True, blank=True, on_delete=models.SET_NULL, editable=False, verbose_name="Изменения")
+    # hash of imported grid entry AbstractEvent made from
+    import_fingerprint = models.CharField(max_length=64, null=True, blank=True, db_index=True, editable=False, verbose_name="Отпечаток импортированной записи")
 
     def __repr__(self):
         return f"Занятие по {self.subject.name}, {self.time_slot.alt_name}ч."
     
     def save(self, **kwargs):
+        created = self.pk is None
+        is_events_update_needed = not created and \
+            not self.changed_fields().isdisjoint(["kind", "subject", "time_slot"])
+
         super().save(**kwargs)
 
         from api.utilities import WriteAPI
+        import api.bulk_operations as bulk_operations
+
+        if bulk_operations.is_active():
+            if created:
+                bulk_operations.record_created_abstract_event(self)
+            elif is_events_update_needed:
+                bulk_operations.record_refill(self)
+
+            return
 
         # calling here because need updated AbstractEvent reference inside Events
-        WriteAPI.update_events(self, update_m2m=False)
+        if is_events_update_needed:
+            WriteAPI.update_events(self, update_m2m=False)
     
     @property
     def department(self):
@@ -502,22 +598,23 @@ class AbstractEvent(CommonModel):
         Not saving self instance on complete
         """
 
-        previous_ae = AbstractEvent.objects.get(pk=self.pk)
+        changed_fields = self.changed_fields()
 
-        is_date_time_changed = previous_ae.abstract_day != self.abstract_day or previous_ae.time_slot != self.time_slot
-        is_holds_on_date_changed = previous_ae.holds_on_date != self.holds_on_date
-        is_kind_changed = previous_ae.kind != self.kind
+        is_date_time_changed = "abstract_day" in changed_fields or "time_slot" in changed_fields
+        is_holds_on_date_changed = "holds_on_date" in changed_fields
+        is_kind_changed = "kind" in changed_fields
 
         # continue only if something changed
         if not is_date_time_changed and not is_holds_on_date_changed and not is_kind_changed:
             return
         
-        changes = previous_ae.changes
+        changes = self.changes
 
         if not changes:
             changes = AbstractEventChanges()
 
-            changes.initialize(previous_ae)
+            # origin values are needed only for first change
+            changes.initialize(AbstractEvent.objects.get(pk=self.pk))
 
         if is_date_time_changed:
             changes.final_date_time = AbstractEventChanges.str_from_date_time(self)
@@ -535,68 +632,70 @@ class AbstractEvent(CommonModel):
 @receiver(m2m_changed, sender=AbstractEvent.participants.through)
 def participants_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
     """Writes AbstractEvent participants changes and update related Events
-    """
 
-    if action == "pre_add" or action == "pre_remove":
-        if not instance.changes:
-            changes = AbstractEventChanges()
+    Changes are applied once on transaction commit
+    """
 
-            changes.initialize(instance)
+    import api.change_journal as change_journal
+    import api.bulk_operations as bulk_operations
 
-            changes.save()
+    # AbstractEventChanges of AbstractEvents created in bulk operation
+    # are made on its exit
+    if bulk_operations.is_active() and not reverse and bulk_operations.is_created_abstract_event(instance):
+        if action == "post_add" or action == "post_remove":
+            bulk_operations.record_abstract_event_m2m(instance)
 
-            instance.changes = changes
+        return
 
-            instance.save()
+    if action == "pre_add" or action == "pre_remove":
+        change_journal.remember_origin(instance)
     elif action == "post_add" or action == "post_remove":
-        from api.utilities import WriteAPI
-
-        WriteAPI.update_events(instance, update_non_m2m=False)
-
-        instance.changes.group = AbstractEventChanges.str_from_participants(instance.get_groups())
-        instance.changes.final_teachers = AbstractEventChanges.str_from_participants(instance.get_teachers())
-
-        instance.changes.save()
+        change_journal.record(instance, change_journal.PARTICIPANTS)
 
 @receiver(m2m_changed, sender=AbstractEvent.places.through)
 def places_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
     """Writes AbstractEvent places changes and update related Events
-    """
 
-    if action == "pre_add" or action == "pre_remove":
-        if not instance.changes:
-            changes = AbstractEventChanges()
+    Changes are applied once on transaction commit
+    """
 
-            changes.initialize(instance)
+    import api.change_journal as change_journal
+    import api.bulk_operations as bulk_operations
 
-            changes.save()
+    # AbstractEventChanges of AbstractEvents created in bulk operation
+    # are made on its exit
+    if bulk_operations.is_active() and not reverse and bulk_operations.is_created_abstract_event(instance):
+        if action == "post_add" or action == "post_remove":
+            bulk_operations.record_abstract_event_m2m(instance)
 
-            instance.changes = changes
+        return
 
-            instance.save()
+    if action == "pre_add" or action == "pre_remove":
+        change_journal.remember_origin(instance)
     elif action == "post_add" or action == "post_remove":
-        from api.utilities import WriteAPI
-
-        WriteAPI.update_events(instance, update_non_m2m=False)
-        
-        instance.changes.final_places = AbstractEventChanges.str_from_places(instance.places.all())
-
-        instance.changes.save()
+        change_journal.record(instance, change_journal.PLACES)
 
 @receiver(pre_save, sender=AbstractEvent)
 def on_abstract_event_pre_save(sender, instance, **kwargs):
+    import api.bulk_operations as bulk_operations
+
     # AbsEvent created
     if instance.pk is None:
-        instance.generate_changes_on_creating()
+        # changes are made on bulk operation exit
+        if not bulk_operations.is_active():
+            instance.generate_changes_on_creating()
 
         return
 
     instance.update_change_model()
 
-    if AbstractEvent.objects.get(pk=instance.pk).abstract_day != instance.abstract_day:
+    if "abstract_day" in instance.changed_fields():
         from api.utilities import WriteAPI
 
-        WriteAPI.fill_event_table(instance)
+        if bulk_operations.is_active():
+            bulk_operations.record_refill(instance)
+        else:
+            WriteAPI.fill_event_table(instance)
 
 @receiver(pre_delete, sender=AbstractEvent)
 def on_abstract_event_delete(sender, instance, **kwargs): 
@@ -628,16 +727,9 @@ class EventCancel(CommonModel):
     def save(self, **kwargs):
         super().save(**kwargs)
         
-        from api.utilities import WriteAPI, ReadAPI
-        import api.utility_filters as filters
+        from api.utilities import WriteAPI
 
-        reader = ReadAPI(filters.DateFilter.from_singe_date(self.date))
-        reader.add_filter(filters.EventFilter.by_department(self.department))
-        
-        reader.find_models(Event)
-        
-        for e in reader.get_found_models():
-            WriteAPI.apply_event_canceling(self, e)
+        WriteAPI.apply_event_cancel_in_bulk(self)
 
 @receiver(pre_save, sender=EventCancel)
 def on_event_cancel_date_override(sender, instance, **kwargs):
@@ -646,30 +738,22 @@ def on_event_cancel_date_override(sender, instance, **kwargs):
     if created:
         return
     
-    previous_cancel = EventCancel.objects.get(pk=instance.pk)
-
     # if EventCancel moved to other date
     # need to undo Events canceling
-    if previous_cancel.date != instance.date:
-        from api.utilities import WriteAPI, ReadAPI
+    if "date" in instance.changed_fields():
+        from api.utilities import WriteAPI
 
-        reader = ReadAPI({"event_cancel" : previous_cancel})
-        
-        reader.find_models(Event)
-        
-        for e in reader.get_found_models():
-            WriteAPI.apply_event_canceling(None, e)
+        WriteAPI.undo_event_cancel_in_bulk(EventCancel(
+            pk=instance.pk, 
+            date=instance.loaded_value("date"), 
+            department_id=instance.loaded_value("department")
+        ))
 
 @receiver(pre_delete, sender=EventCancel)
 def on_event_cancel_delete(sender, instance, **kwargs):
-    from api.utilities import WriteAPI, ReadAPI
+    from api.utilities import WriteAPI
 
-    reader = ReadAPI({"event_cancel" : instance})
-    
-    reader.find_models(Event)
-    
-    for e in reader.get_found_models():
-        WriteAPI.apply_event_canceling(None, e)
+    WriteAPI.undo_event_cancel_in_bulk(instance)
 
 
 class DayDateOverride(CommonModel):
@@ -687,16 +771,9 @@ class DayDateOverride(CommonModel):
     def save(self, **kwargs):
         super().save(**kwargs)
 
-        from api.utilities import WriteAPI, ReadAPI
-        import api.utility_filters as filters
+        from api.utilities import WriteAPI
 
-        reader = ReadAPI(filters.DateFilter.from_singe_date(self.day_source))
-        reader.add_filter(filters.EventFilter.by_department(self.department))
-        
-        reader.find_models(Event)
-        
-        for e in reader.get_found_models():
-            WriteAPI.apply_date_override(self, e)
+        WriteAPI.apply_date_override_in_bulk(self)
 
 @receiver(pre_save, sender=DayDateOverride)
 def on_date_override_source_override(sender, instance, **kwargs):
@@ -705,36 +782,49 @@ def on_date_override_source_override(sender, instance, **kwargs):
     if created:
         return
     
-    previous_override = DayDateOverride.objects.get(pk=instance.pk)
-
     # if DayDateOverride moved to other date
     # need to detach it from Events
-    if previous_override.day_source != instance.day_source:
-        from api.utilities import WriteAPI, ReadAPI
-
-        reader = ReadAPI({"date_override" : previous_override})
-        
-        reader.find_models(Event)
+    if "day_source" in instance.changed_fields():
+        from api.utilities import WriteAPI
 
-        for e in reader.get_found_models():
-            WriteAPI.apply_date_override(None, e)
+        WriteAPI.undo_date_override_in_bulk(DayDateOverride(
+            pk=instance.pk, 
+            day_source=instance.loaded_value("day_source"), 
+            day_destination=instance.loaded_value("day_destination"), 
+            department_id=instance.loaded_value("department")
+        ))
 
 @receiver(pre_delete, sender=DayDateOverride)
 def on_day_date_override_delete(sender, instance, **kwargs):
-    from api.utilities import WriteAPI, ReadAPI
+    from api.utilities import WriteAPI
+
+    WriteAPI.undo_date_override_in_bulk(instance)
+
+@receiver(post_save, sender=EventCancel)
+@receiver(post_delete, sender=EventCancel)
+@receiver(post_save, sender=DayDateOverride)
+@receiver(post_delete, sender=DayDateOverride)
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+@receiver(post_save, sender=ScheduleTemplate)
+@receiver(post_delete, sender=ScheduleTemplate)
+def on_calendar_changed(sender, instance, **kwargs):
+    """Drops Department calendars loaded in current operation
+    """
 
-    reader = ReadAPI({"date_override" : instance})
-        
-    reader.find_models(Event)
-    
-    for e in reader.get_found_models():
-            WriteAPI.apply_date_override(None, e)
+    import api.calendar_index as calendar_index
+
+    calendar_index.invalidate()
 
 
 class Event(CommonModel):
     class Meta:
         verbose_name = "Событие"
         verbose_name_plural = "События"
+        indexes = [
+            # occupancy lookups by date and time slot
+            models.Index(fields=["date", "time_slot_override"], name="event_date_time_slot_idx"),
+        ]
 
     date = models.DateField(null=True, blank=False, verbose_name="Дата")
     date_override = models.ForeignKey(DayDateOverride, null=True, blank=True, editable=False, on_delete=models.SET_NULL, verbose_name="Перенос дня")
@@ -761,20 +851,21 @@ class Event(CommonModel):
     def __repr__(self):
         return f"Занятие по {self.abstract_event.subject.name}"    
 
+    def get_absolute_url(self):
+        return reverse("admin:api_event_change", args=[self.pk])
+
     def check_date_interactions(self):
         """Checks Event date and attaching/detaching DayDateOverride if needed
         """
 
         if not self.date_override:
-            from api.utilities import WriteAPI, ReadAPI
-
-            reader = ReadAPI({"day_source" : self.date})
-            reader.add_filter({"department" : self.department})
+            from api.utilities import WriteAPI
+            import api.calendar_index as calendar_index
 
-            reader.find_models(DayDateOverride)
+            date_override = calendar_index.get_schedule_calendar(self.abstract_event.schedule_id).get_override(self.date)
 
-            if reader.get_found_models().exists():
-                WriteAPI.apply_date_override(reader.get_found_models().first(), self, call_save_method=False)
+            if date_override:
+                WriteAPI.apply_date_override(date_override, self, call_save_method=False)
 
             return
 
@@ -784,6 +875,43 @@ class Event(CommonModel):
             # need detach DayDateOverride from Event
             self.date_override = None
 
+    def derive_state(self, created : bool, changed_fields : set[str], loaded_date, loaded_event_cancel_id):
+        """Sets overriden flag and attaches DayDateOverride and EventCancel
+        for Event being saved
+
+        Not saving self instance on complete
+        """
+
+        if not created:
+            # check for override by non m2m fields
+            if not self.is_event_overriden and \
+                not changed_fields.isdisjoint(["kind_override", "subject_override", "time_slot_override", "is_event_canceled", "event_cancel"]):
+                abstract_event = self.abstract_event
+
+                if self.kind_override_id != abstract_event.kind_id or \
+                    self.subject_override_id != abstract_event.subject_id or \
+                    self.time_slot_override_id != abstract_event.time_slot_id or \
+                    self.is_event_canceled and not self.event_cancel_id:
+                    self.is_event_overriden = True
+
+        import api.calendar_index as calendar_index
+
+        # calendar is loaded once for both checks
+        with calendar_index.calendar_scope():
+            if created or not changed_fields.isdisjoint(["date", "date_override"]):
+                self.check_date_interactions()
+
+            # if Event was created or date changed
+            # need to check for event canceling
+            if created or loaded_date != self.date:
+                self.check_canceling()
+            
+        # if EventCancel was manualy setted in Event
+        # but is_event_canceled not checked
+        # make Event canceled
+        if not created and not self.is_event_canceled and not loaded_event_cancel_id and self.event_cancel_id:
+            self.is_event_canceled = True
+
     def check_canceling(self):
         """Checks Event date and attaching/detaching EventCancel if needed
         """
@@ -792,16 +920,13 @@ class Event(CommonModel):
         if self.is_event_canceled and not self.event_cancel:
             return
 
-        from api.utilities import WriteAPI, ReadAPI
-        import api.utility_filters as filters
-
-        reader = ReadAPI({"department" : self.department})
-        reader.add_filter(filters.DateFilter.from_singe_date(self.date))
+        from api.utilities import WriteAPI
+        import api.calendar_index as calendar_index
 
-        reader.find_models(EventCancel)
+        event_cancel = calendar_index.get_schedule_calendar(self.abstract_event.schedule_id).get_cancel(self.date)
 
-        if reader.get_found_models().exists():
-            WriteAPI.apply_event_canceling(reader.get_found_models().first(), self, False)
+        if event_cancel:
+            WriteAPI.apply_event_canceling(event_cancel, self, False)
         else:
             self.is_event_canceled = False
             self.event_cancel = None
@@ -809,7 +934,14 @@ class Event(CommonModel):
 
 @receiver(m2m_changed, sender=Event.participants_override.through)
 def participants_override_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    import api.bulk_operations as bulk_operations
+
     if action == "post_add" or action == "post_remove":
+        if bulk_operations.is_active() and not reverse:
+            bulk_operations.record_event_m2m(instance)
+
+            return
+
         if not instance.is_event_overriden and list(instance.participants_override.all()) != list(instance.abstract_event.participants.all()):
             instance.is_event_overriden = True
 
@@ -817,7 +949,14 @@ def participants_override_changed(sender, instance, action, reverse, model, pk_s
 
 @receiver(m2m_changed, sender=Event.places_override.through)
 def places_override_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    import api.bulk_operations as bulk_operations
+
     if action == "post_add" or action == "post_remove":
+        if bulk_operations.is_active() and not reverse:
+            bulk_operations.record_event_m2m(instance)
+
+            return
+
         if not instance.is_event_overriden and list(instance.places_override.all()) != list(instance.abstract_event.places.all()):
             instance.is_event_overriden = True
 
@@ -825,29 +964,66 @@ def places_override_changed(sender, instance, action, reverse, model, pk_set, **
 
 @receiver(pre_save, sender=Event)
 def on_event_save(sender, instance, **kwargs):
+    import api.bulk_operations as bulk_operations
+
+    # derived state is computed on bulk operation exit
+    if bulk_operations.is_active():
+        bulk_operations.record_saved_event(instance)
+
+        return
+
     created = instance.pk is None
-    previous_event = None
 
-    if not created:
-        previous_event = Event.objects.get(pk=instance.pk)
+    instance.derive_state(
+        created,
+        instance.changed_fields(),
+        None if created else instance.loaded_value("date"),
+        None if created else instance.loaded_value("event_cancel")
+    )
 
-        # check for override by non m2m fields
-        if not instance.is_event_overriden:
-            if instance.kind_override != instance.abstract_event.kind or \
-                instance.subject_override != instance.abstract_event.subject or \
-                instance.time_slot_override != instance.abstract_event.time_slot or \
-                instance.is_event_canceled and not instance.event_cancel:
-                instance.is_event_overriden = True
 
-    instance.check_date_interactions()
-            
-    # if Event was created or date changed
-    # need to check for event canceling
-    if created or previous_event.date != instance.date:
-        instance.check_canceling()
-        
-    # if EventCancel was manualy setted in Event
-    # but is_event_canceled not checked
-    # make Event canceled
-    if not created and not instance.is_event_canceled and not previous_event.event_cancel and instance.event_cancel:
-        instance.is_event_canceled = True
+class ImportJob(CommonModel):
+    class Meta:
+        verbose_name = "Задача импорта"
+        verbose_name_plural = "Задачи импорта"
+        indexes = [
+            # queued jobs are taken by worker in order of creation
+            models.Index(fields=["status", "id"], name="import_job_status_idx"),
+        ]
+
+    class Kind(models.TextChoices):
+        EVENTS = "events", "Расписание занятий"
+        JSON = "json", "Данные в формате JSON"
+        SCHEDULES = "schedules", "Справочник расписаний"
+        SUBJECTS = "subjects", "Справочник предметов"
+        TEACHERS = "teachers", "Справочник преподавателей"
+        STUDENTS = "students", "Справочник групп"
+        PLACES = "places", "Справочник аудиторий"
+        FACULTIES = "faculties", "Справочник факультетов"
+        DEPARTMENTS = "departments", "Справочник кафедр"
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "В очереди"
+        RUNNING = "running", "Выполняется"
+        DONE = "done", "Выполнена"
+        FAILED = "failed", "Ошибка"
+
+    kind = models.CharField(choices=Kind, max_length=32, verbose_name="Тип импорта")
+    status = models.CharField(choices=Status, max_length=16, default=Status.QUEUED, verbose_name="Состояние")
+    file = models.FileField(upload_to="import_jobs/", verbose_name="Файл")
+    # parameters of importer, e.g. {"save_archive_schedules" : true}
+    options = models.JSONField(default=dict, blank=True, verbose_name="Параметры импорта")
+    processed = models.PositiveIntegerField(default=0, verbose_name="Обработано записей")
+    total = models.PositiveIntegerField(null=True, blank=True, verbose_name="Всего записей")
+    # {stage : seconds}
+    stages = models.JSONField(default=dict, blank=True, verbose_name="Время этапов импорта, с")
+    result = models.JSONField(null=True, blank=True, verbose_name="Результат")
+    error = models.TextField(null=True, blank=True, verbose_name="Ошибка")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начало выполнения")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Окончание выполнения")
+
+    def __repr__(self):
+        return f"Задача импорта №{self.pk} ({self.get_kind_display()}): {self.get_status_display()}"
+
+    def get_absolute_url(self):
+        return reverse("admin:api_importjob_change", args=[self.pk])
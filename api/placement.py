@@ -0,0 +1,511 @@
+"""Heuristic placement of AbstractEvents into schedule grid
+
+Grid of Schedule is abstract days of its ScheduleTemplate repetition period
+(except Sundays) by TimeSlots. Occupancy of every participant and place
+is single integer bitset: bit (day * TimeSlots count + i) is set
+if it is used at i-th TimeSlot of day.
+
+Movable AbstractEvents are placed greedily, most constrained first.
+Free cells of AbstractEvent are found by OR of its participants and places
+bitsets, and every free cell is scored by preferences only for days
+of its participants, so placement cost does not grow with schedule size.
+AbstractEvents without places get first place free at chosen cell.
+
+Problem holds only primary keys and bitsets, so restarts with shuffled
+order can run in separate processes. Best solution (fewest unplaced,
+then lowest penalty) is written back by bulk queries
+"""
+
+import random
+from collections import defaultdict
+from multiprocessing import Pool
+import django
+from django.db.models import Q
+from django.utils import timezone
+import api.bulk_operations as bulk_operations
+import api.schedule_occupancy as schedule_occupancy
+from api.conflicts import RESOURCE_FIELDS, PARTICIPANT, PLACE
+from api.models import (
+    AbstractEvent,
+    AbstractEventChanges,
+    AbstractDay,
+    Schedule,
+    EventParticipant,
+    EventPlace,
+    TimeSlot
+)
+
+
+class Preferences:
+    """Penalties of placement used for choosing cell
+    """
+
+    def __init__(self,
+                 late_slot : int = 1,
+                 gap : int = 3,
+                 daily_overload : int = 10,
+                 max_daily_lessons : int = 4,
+                 same_subject_day : int = 5):
+        # for every TimeSlot after first one
+        self.late_slot = late_slot
+        # for every free TimeSlot between lessons of participant day
+        self.gap = gap
+        # for every lesson of participant day over max_daily_lessons
+        self.daily_overload = daily_overload
+        self.max_daily_lessons = max_daily_lessons
+        # for lesson of subject participant already has at this day
+        self.same_subject_day = same_subject_day
+
+
+class Item:
+    """Movable AbstractEvent
+    """
+
+    def __init__(self, pk : int, subject_pk : int, participant_pks : tuple, place_pks : tuple):
+        self.pk = pk
+        self.subject_pk = subject_pk
+        self.participant_pks = participant_pks
+        # place is chosen by solver if empty
+        self.place_pks = place_pks
+
+
+class Problem:
+    """Placement problem of single Schedule
+    """
+
+    def __init__(self,
+                 days : list[int],
+                 time_slots : list[int],
+                 items : list[Item],
+                 participants : dict[int, int],
+                 places : dict[int, int],
+                 subject_days : set[tuple],
+                 candidate_places : list[int],
+                 preferences : Preferences):
+        # AbstractDay pks
+        self.days = days
+        # TimeSlot pks ordered by start time
+        self.time_slots = time_slots
+        self.items = items
+        # {EventParticipant pk : occupancy bitset} of not movable AbstractEvents
+        self.participants = participants
+        # {EventPlace pk : occupancy bitset} of not movable AbstractEvents
+        self.places = places
+        # {(EventParticipant pk, day index, Subject pk)} of not movable AbstractEvents
+        self.subject_days = subject_days
+        # EventPlace pks for items without places
+        self.candidate_places = candidate_places
+        self.preferences = preferences
+
+    @property
+    def cells_count(self):
+        return len(self.days) * len(self.time_slots)
+
+
+class Solution:
+    def __init__(self, assignments : dict[int, tuple], unplaced : list[int], penalty : int):
+        # {AbstractEvent pk : (AbstractDay pk, TimeSlot pk, EventPlace pk|None)}
+        # place is None if AbstractEvent keeps its places
+        self.assignments = assignments
+        # pks of AbstractEvents without free cell
+        self.unplaced = unplaced
+        self.penalty = penalty
+
+    def is_better(self, other) -> bool:
+        return (len(self.unplaced), self.penalty) < (len(other.unplaced), other.penalty)
+
+    def __repr__(self):
+        return f"Размещено: {len(self.assignments)}, не размещено: {len(self.unplaced)}, штраф: {self.penalty}"
+
+
+def get_grid(schedule : Schedule) -> tuple[list[int], list[int]]:
+    """Returns AbstractDay pks of Schedule repetition period except Sundays
+    and TimeSlot pks ordered by start time
+    """
+
+    days = list(AbstractDay.objects.filter(
+        day_number__lt=schedule.schedule_template.repetition_period
+    ).order_by("day_number").values_list("pk", "day_number"))
+
+    return (
+        [pk for pk, day_number in days if day_number % 7 != 6],
+        list(TimeSlot.objects.order_by("start_time", "pk").values_list("pk", flat=True))
+    )
+
+
+def build_problem(abstract_events, preferences : Preferences|None = None, building : str|None = None) -> Problem:
+    """Builds placement problem for given AbstractEvents of single Schedule
+
+    Other AbstractEvents of Schedules with overlapping semesters
+    are considered fixed. Candidate places of AbstractEvents without places
+    may be limited by building
+    """
+
+    abstract_events = list(abstract_events)
+    schedules = {ae.schedule_id for ae in abstract_events}
+
+    if len(schedules) != 1 or None in schedules:
+        raise ValueError("Запланированные события должны принадлежать одному расписанию")
+
+    schedule = Schedule.objects.select_related("schedule_template").get(pk=schedules.pop())
+    days, time_slots = get_grid(schedule)
+    movable_pks = {ae.pk for ae in abstract_events}
+    # {kind : {AbstractEvent pk : [resource pk]}}
+    resources = {PARTICIPANT : {pk : [] for pk in movable_pks}, PLACE : {pk : [] for pk in movable_pks}}
+
+    for kind, ae_field, related_field in RESOURCE_FIELDS:
+        for ae_pk, resource_pk in getattr(AbstractEvent, ae_field).through.objects.filter(
+            abstractevent__in=movable_pks
+        ).values_list("abstractevent", related_field):
+            resources[kind][ae_pk].append(resource_pk)
+
+    items = [
+        Item(ae.pk, ae.subject_id, tuple(sorted(resources[PARTICIPANT][ae.pk])), tuple(sorted(resources[PLACE][ae.pk])))
+        for ae in sorted(abstract_events, key=lambda ae: ae.pk)
+    ]
+
+    candidate_places = EventPlace.objects.order_by("building", "room")
+
+    if building:
+        candidate_places = candidate_places.filter(building=building)
+
+    candidate_places = list(candidate_places.values_list("pk", flat=True))
+
+    # AbstractEvents of Schedules with overlapping semesters
+    overlapping = Q()
+
+    if schedule.end_date:
+        overlapping &= Q(abstractevent__schedule__start_date__lte=schedule.end_date) | Q(abstractevent__schedule__start_date__isnull=True)
+
+    if schedule.start_date:
+        overlapping &= Q(abstractevent__schedule__end_date__gte=schedule.start_date) | Q(abstractevent__schedule__end_date__isnull=True)
+
+    day_indexes = {pk : i for i, pk in enumerate(days)}
+    slot_indexes = {pk : i for i, pk in enumerate(time_slots)}
+    used = {
+        PARTICIPANT : {pk for item in items for pk in item.participant_pks},
+        PLACE : {pk for item in items for pk in item.place_pks} | set(candidate_places)
+    }
+    occupancy = {PARTICIPANT : {pk : 0 for pk in used[PARTICIPANT]}, PLACE : {pk : 0 for pk in used[PLACE]}}
+    subject_days = set()
+
+    for kind, ae_field, related_field in RESOURCE_FIELDS:
+        for resource_pk, abstract_day_pk, time_slot_pk, subject_pk in getattr(AbstractEvent, ae_field).through.objects.filter(
+            overlapping,
+            **{f"{related_field}__in" : used[kind]}
+        ).exclude(abstractevent__in=movable_pks).values_list(
+            related_field, "abstractevent__abstract_day", "abstractevent__time_slot", "abstractevent__subject"
+        ):
+            if abstract_day_pk in day_indexes and time_slot_pk in slot_indexes:
+                occupancy[kind][resource_pk] |= 1 << (day_indexes[abstract_day_pk] * len(time_slots) + slot_indexes[time_slot_pk])
+
+                if kind == PARTICIPANT:
+                    subject_days.add((resource_pk, day_indexes[abstract_day_pk], subject_pk))
+
+    return Problem(
+        days,
+        time_slots,
+        items,
+        occupancy[PARTICIPANT],
+        occupancy[PLACE],
+        subject_days,
+        candidate_places,
+        preferences or Preferences()
+    )
+
+
+class State:
+    """Occupancy of participants and places while solving
+    """
+
+    def __init__(self, problem : Problem):
+        self.problem = problem
+        self.slots_count = len(problem.time_slots)
+        self.slots_mask = (1 << self.slots_count) - 1
+        self.participants = dict(problem.participants)
+        self.places = dict(problem.places)
+        self.candidate_places = set(problem.candidate_places)
+        # {(EventParticipant pk, day index, Subject pk)}
+        self.subject_days = set(problem.subject_days)
+        # cells where all candidate places are busy
+        self.full_cells = 0
+        self.free_places_count = [0] * problem.cells_count
+
+        for cell in range(problem.cells_count):
+            self.free_places_count[cell] = sum(1 for pk in problem.candidate_places if not self.places[pk] >> cell & 1)
+
+            if not self.free_places_count[cell]:
+                self.full_cells |= 1 << cell
+
+    def get_free_cells(self, item : Item) -> int:
+        busy = 0
+
+        for pk in item.participant_pks:
+            busy |= self.participants[pk]
+
+        if item.place_pks:
+            for pk in item.place_pks:
+                busy |= self.places[pk]
+        else:
+            busy |= self.full_cells
+
+        return ~busy & ((1 << self.problem.cells_count) - 1)
+
+    def get_day_penalty(self, day_bits : int) -> int:
+        preferences = self.problem.preferences
+
+        if not day_bits:
+            return 0
+
+        lessons = day_bits.bit_count()
+        gaps = day_bits.bit_length() - (day_bits & -day_bits).bit_length() + 1 - lessons
+
+        return gaps * preferences.gap + max(0, lessons - preferences.max_daily_lessons) * preferences.daily_overload
+
+    def get_penalty(self, item : Item, cell : int) -> int:
+        """Returns penalty increase of placing item into cell
+        """
+
+        preferences = self.problem.preferences
+        day, slot = divmod(cell, self.slots_count)
+        shift = day * self.slots_count
+        penalty = slot * preferences.late_slot
+
+        for pk in item.participant_pks:
+            day_bits = self.participants[pk] >> shift & self.slots_mask
+            penalty += self.get_day_penalty(day_bits | 1 << slot) - self.get_day_penalty(day_bits)
+
+            if (pk, day, item.subject_pk) in self.subject_days:
+                penalty += preferences.same_subject_day
+
+        return penalty
+
+    def place(self, item : Item, cell : int) -> int|None:
+        """Occupies cell by item
+
+        Returns chosen EventPlace pk if item has no places
+        """
+
+        bit = 1 << cell
+        chosen_place = None
+
+        for pk in item.participant_pks:
+            self.participants[pk] |= bit
+            self.subject_days.add((pk, cell // self.slots_count, item.subject_pk))
+
+        place_pks = item.place_pks
+
+        if not place_pks:
+            chosen_place = next(pk for pk in self.problem.candidate_places if not self.places[pk] & bit)
+            place_pks = (chosen_place,)
+
+        for pk in place_pks:
+            if pk in self.candidate_places and not self.places[pk] & bit:
+                self.free_places_count[cell] -= 1
+
+                if not self.free_places_count[cell]:
+                    self.full_cells |= bit
+
+            self.places[pk] |= bit
+
+        return chosen_place
+
+
+def solve_once(problem : Problem, seed : int|None = None) -> Solution:
+    """Places items greedily, most constrained first
+
+    Items with equal constraints are shuffled if seed given
+    """
+
+    state = State(problem)
+    rng = random.Random(seed)
+    tie_breakers = {item.pk : rng.random() if seed is not None else 0 for item in problem.items}
+    items = sorted(
+        problem.items,
+        key=lambda item: (state.get_free_cells(item).bit_count(), -len(item.participant_pks), tie_breakers[item.pk], item.pk)
+    )
+    assignments = {}
+    unplaced = []
+    penalty = 0
+
+    for item in items:
+        free = state.get_free_cells(item)
+
+        if not free:
+            unplaced.append(item.pk)
+
+            continue
+
+        best_cell = None
+        best_penalty = None
+
+        while free:
+            low_bit = free & -free
+            cell = low_bit.bit_length() - 1
+            free ^= low_bit
+            cell_penalty = state.get_penalty(item, cell)
+
+            if best_penalty is None or cell_penalty < best_penalty:
+                best_cell, best_penalty = cell, cell_penalty
+
+        penalty += best_penalty
+        day, slot = divmod(best_cell, state.slots_count)
+        assignments[item.pk] = (problem.days[day], problem.time_slots[slot], state.place(item, best_cell))
+
+    return Solution(assignments, sorted(unplaced), penalty)
+
+
+def solve(problem : Problem, restarts : int = 1, processes : int = 1, seed : int = 0) -> Solution:
+    """Returns best solution of several restarts
+
+    First restart keeps items order, others shuffle items with equal constraints.
+    Restarts run in given number of processes
+    """
+
+    seeds = [None] + [seed + i for i in range(1, restarts)]
+
+    if processes > 1 and restarts > 1:
+        # workers started by spawn import models, so Django must be set up
+        with Pool(min(processes, restarts), initializer=django.setup) as pool:
+            solutions = pool.starmap(solve_once, [(problem, s) for s in seeds])
+    else:
+        solutions = [solve_once(problem, s) for s in seeds]
+
+    best = solutions[0]
+
+    for solution in solutions[1:]:
+        if solution.is_better(best):
+            best = solution
+
+    return best
+
+
+def create_origin_changes(abstract_events : list[AbstractEvent]):
+    """Makes not saved AbstractEventChanges with origin values of AbstractEvents
+
+    Same as AbstractEventChanges.initialize with participants
+    and places loaded in two queries
+    """
+
+    if not abstract_events:
+        return
+
+    participants = defaultdict(list)
+    places = defaultdict(list)
+
+    for link in AbstractEvent.participants.through.objects.filter(
+        abstractevent__in=abstract_events
+    ).select_related("eventparticipant").order_by("eventparticipant"):
+        participants[link.abstractevent_id].append(link.eventparticipant)
+
+    for link in AbstractEvent.places.through.objects.filter(
+        abstractevent__in=abstract_events
+    ).select_related("eventplace").order_by("eventplace"):
+        places[link.abstractevent_id].append(link.eventplace)
+
+    teacher_roles = [EventParticipant.Role.TEACHER, EventParticipant.Role.ASSISTANT]
+
+    for ae in abstract_events:
+        ae.changes = AbstractEventChanges(
+            group=AbstractEventChanges.str_from_participants(p for p in participants[ae.pk] if p.is_group),
+            date_time=AbstractEventChanges.str_from_date_time(ae),
+            subject=ae.subject.name,
+            origin_teachers=AbstractEventChanges.str_from_participants(p for p in participants[ae.pk] if p.role in teacher_roles),
+            origin_places=AbstractEventChanges.str_from_places(places[ae.pk]),
+            origin_holds_on_date=ae.holds_on_date,
+            origin_kind=ae.kind.name if ae.kind else ""
+        )
+
+
+def apply_solution(solution : Solution):
+    """Writes placement into AbstractEvents in bulk
+
+    AbstractEvents, its places and AbstractEventChanges are written
+    by few bulk queries, related Events are reconciled once for all moved
+    AbstractEvents. AbstractEvent signals are not called
+    """
+
+    from api.utilities import WriteAPI
+
+    with bulk_operations.bulk_operation():
+        abstract_events = AbstractEvent.objects.select_related(
+            "changes", "subject", "kind", "abstract_day", "time_slot", "schedule__starting_day_number", "schedule__schedule_template"
+        ).in_bulk(solution.assignments.keys())
+        abstract_days = AbstractDay.objects.in_bulk({day_pk for day_pk, _, _ in solution.assignments.values()})
+        time_slots = TimeSlot.objects.in_bulk({slot_pk for _, slot_pk, _ in solution.assignments.values()})
+        places = EventPlace.objects.in_bulk({place_pk for _, _, place_pk in solution.assignments.values() if place_pk is not None})
+        changed = [
+            abstract_events[pk] for pk, (abstract_day_pk, time_slot_pk, place_pk) in sorted(solution.assignments.items())
+            if place_pk is not None
+            or abstract_events[pk].abstract_day_id != abstract_day_pk
+            or abstract_events[pk].time_slot_id != time_slot_pk
+        ]
+
+        if not changed:
+            return
+
+        # origin values are needed only for first change
+        created_changes = [ae for ae in changed if not ae.changes]
+        create_origin_changes(created_changes)
+
+        now = timezone.now()
+        places_links = []
+
+        for ae in changed:
+            abstract_day_pk, time_slot_pk, place_pk = solution.assignments[ae.pk]
+
+            if ae.abstract_day_id != abstract_day_pk or ae.time_slot_id != time_slot_pk:
+                ae.abstract_day = abstract_days[abstract_day_pk]
+                ae.time_slot = time_slots[time_slot_pk]
+                ae.changes.final_date_time = AbstractEventChanges.str_from_date_time(ae)
+
+            if place_pk is not None:
+                ae.changes.final_places = AbstractEventChanges.str_from_places([places[place_pk]])
+                places_links.append(AbstractEvent.places.through(abstractevent_id=ae.pk, eventplace_id=place_pk))
+
+            ae.datemodified = now
+            ae.changes.datemodified = now
+
+        created_pks = {ae.pk for ae in created_changes}
+
+        AbstractEventChanges.objects.bulk_create([ae.changes for ae in created_changes], batch_size=WriteAPI.BULK_BATCH_SIZE)
+        AbstractEventChanges.objects.bulk_update(
+            [ae.changes for ae in changed if ae.pk not in created_pks],
+            ["final_date_time", "final_places", "datemodified"],
+            batch_size=WriteAPI.BULK_BATCH_SIZE
+        )
+
+        # pks of created AbstractEventChanges are known only after insert
+        for ae in created_changes:
+            ae.changes_id = ae.changes.pk
+
+        AbstractEvent.objects.bulk_update(
+            changed,
+            ["abstract_day", "time_slot", "changes", "datemodified"],
+            batch_size=WriteAPI.BULK_BATCH_SIZE
+        )
+        AbstractEvent.places.through.objects.bulk_create(places_links, ignore_conflicts=True)
+
+        WriteAPI.fill_event_table(changed)
+
+        schedule_occupancy.update_on_commit(changed)
+        schedule_occupancy.update_resources_on_commit([
+            (link.abstractevent_id, PLACE, "post_add", {link.eventplace_id}) for link in places_links
+        ])
+
+
+def place_abstract_events(abstract_events,
+                          preferences : Preferences|None = None,
+                          building : str|None = None,
+                          restarts : int = 1,
+                          processes : int = 1) -> Solution:
+    """Places given AbstractEvents of single Schedule and writes result
+
+    Returns applied solution
+    """
+
+    solution = solve(build_problem(abstract_events, preferences, building), restarts, processes)
+
+    apply_solution(solution)
+
+    return solution
@@ -0,0 +1,217 @@
+"""Occupancy bitmaps of EventPlaces
+
+For every date every EventPlace has bitmap of occupied TimeSlots:
+bit i is set if not canceled Event takes place in it at i-th TimeSlot
+(TimeSlots are ordered by start time).
+
+Bitmaps of date are loaded from Events in single query on first request
+and dropped when Events of this date change, so next request reloads
+only changed dates. Bitmaps and TimeSlots older than ROOM_OCCUPANCY_TTL
+seconds are reloaded too, as changes made by other processes are not tracked.
+TimeSlots are also reloaded when Event with unknown TimeSlot is loaded,
+and all bitmaps are dropped when order of TimeSlots changes
+"""
+
+import threading
+import time
+from datetime import date
+from django.conf import settings
+from django.db import transaction
+from api.models import (
+    Event,
+    EventPlace,
+    TimeSlot
+)
+
+
+class FreeRoom:
+    def __init__(self, place : EventPlace, free_time_slots : dict[date, list[int]]):
+        self.id = place.pk
+        self.building = place.building
+        self.room = place.room
+        # {date : [TimeSlot pk]}
+        self.free_time_slots = free_time_slots
+
+
+class OccupancyIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # TimeSlot pks ordered by start time
+        self.time_slots = None
+        self.time_slots_loaded_at = 0
+        # {date : (loading time, {EventPlace pk : bitmap})}
+        self.bitmaps = {}
+
+    def get_time_slots(self, required_pks=()) -> list[int]:
+        """Returns TimeSlot pks ordered by start time
+
+        Reloads expired TimeSlots or if any of required pks is unknown
+        """
+
+        now = time.monotonic()
+
+        with self.lock:
+            time_slots = self.time_slots
+
+            if (
+                time_slots is not None
+                and now - self.time_slots_loaded_at < settings.ROOM_OCCUPANCY_TTL
+                and set(required_pks) <= set(time_slots)
+            ):
+                return time_slots
+
+        loaded = list(TimeSlot.objects.order_by("start_time", "pk").values_list("pk", flat=True))
+
+        with self.lock:
+            if loaded != self.time_slots:
+                # bits of bitmaps follow order of TimeSlots
+                self.bitmaps = {}
+                self.time_slots = loaded
+
+            self.time_slots_loaded_at = now
+
+            return self.time_slots
+
+    def get_occupancy(self, dates) -> tuple[list[int], dict[date, dict[int, int]]]:
+        """Returns TimeSlot pks and {date : {EventPlace pk : bitmap}} for given dates
+
+        Loads missing and expired dates in single query
+        """
+
+        dates = set(dates)
+        unknown = set()
+
+        for _ in range(2):
+            time_slots = self.get_time_slots(unknown)
+            now = time.monotonic()
+
+            with self.lock:
+                loaded = {
+                    d : self.bitmaps[d][1] for d in dates
+                    if self.time_slots is time_slots
+                    and d in self.bitmaps and now - self.bitmaps[d][0] < settings.ROOM_OCCUPANCY_TTL
+                }
+
+            missing = dates - loaded.keys()
+
+            if not missing:
+                return time_slots, loaded
+
+            rows = list(Event.places_override.through.objects.filter(
+                event__date__in=missing,
+                event__is_event_canceled=False,
+                event__time_slot_override__isnull=False
+            ).values_list("event__date", "eventplace", "event__time_slot_override"))
+
+            # TimeSlot is created by other process
+            unknown = {time_slot_pk for _, _, time_slot_pk in rows} - set(time_slots)
+
+            if not unknown:
+                break
+
+        bits = {pk : 1 << i for i, pk in enumerate(time_slots)}
+        loading = {d : {} for d in missing}
+
+        for date_, place_pk, time_slot_pk in rows:
+            bitmaps = loading[date_]
+            bitmaps[place_pk] = bitmaps.get(place_pk, 0) | bits.get(time_slot_pk, 0)
+
+        with self.lock:
+            if self.time_slots is time_slots:
+                for d, bitmaps in loading.items():
+                    self.bitmaps[d] = (now, bitmaps)
+
+        loaded.update(loading)
+
+        return time_slots, loaded
+
+    def get_bitmaps(self, dates) -> dict[date, dict[int, int]]:
+        """Returns {date : {EventPlace pk : bitmap}} for given dates
+        """
+
+        return self.get_occupancy(dates)[1]
+
+    def invalidate(self, dates=None):
+        """Drops bitmaps of given dates
+
+        Drops all bitmaps and TimeSlots if no dates given
+        """
+
+        with self.lock:
+            if dates is None:
+                self.bitmaps = {}
+                self.time_slots = None
+
+                return
+
+            for d in dates:
+                self.bitmaps.pop(d, None)
+
+    def find_free_rooms(self,
+                        dates : list[date],
+                        time_slot_pks : list[int]|None = None,
+                        building : str|None = None,
+                        min_window : int = 1) -> list[FreeRoom]:
+        """Finds EventPlaces free on every given date
+
+        On every date EventPlace must be free at all given TimeSlots
+        and have at least min_window consecutive free TimeSlots
+
+        Returns EventPlaces with its free TimeSlots ordered by building and room
+        """
+
+        self.get_time_slots(time_slot_pks or ())
+        time_slots, bitmaps = self.get_occupancy(dates)
+        all_bits = (1 << len(time_slots)) - 1
+        required = 0
+
+        for pk in time_slot_pks or []:
+            required |= 1 << time_slots.index(pk)
+
+        places = EventPlace.objects.order_by("building", "room")
+
+        if building:
+            places = places.filter(building=building)
+
+        free_rooms = []
+
+        for place in places:
+            free_time_slots = {}
+
+            for d in sorted(bitmaps):
+                free = ~bitmaps[d].get(place.pk, 0) & all_bits
+
+                if free & required != required or not has_window(free, min_window):
+                    break
+
+                free_time_slots[d] = [pk for i, pk in enumerate(time_slots) if free >> i & 1]
+            else:
+                free_rooms.append(FreeRoom(place, free_time_slots))
+
+        return free_rooms
+
+
+def has_window(bitmap : int, length : int) -> bool:
+    """Checks bitmap for run of at least given length of set bits
+    """
+
+    window = bitmap
+
+    for shift in range(1, length):
+        window &= bitmap >> shift
+
+    return window != 0
+
+
+def invalidate_on_commit(dates=None):
+    """Drops bitmaps of given dates after current transaction commits
+
+    Drops all bitmaps if no dates given
+    """
+
+    dates = None if dates is None else set(dates)
+
+    transaction.on_commit(lambda: index.invalidate(dates))
+
+
+index = OccupancyIndex()
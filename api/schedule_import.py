@@ -0,0 +1,164 @@
+"""Import of many schedule JSON files in process pool
+
+Every file is read once in main process to find its Schedule and collect
+reference data. Reference data of all files is created there at once, as
+Subjects, EventParticipants and others are shared between schedules and
+concurrent creating would duplicate them. Files of different Schedules
+are imported in parallel, every worker has its own database connection
+"""
+
+import glob
+import os
+import time
+from contextlib import nullcontext
+from multiprocessing import Pool
+import django
+from django.db import connection, connections
+import api.instrumentation as instrumentation
+from api.utilities import EventImportAPI
+
+
+class FileImport:
+    """Result of single schedule file import
+    """
+
+    def __init__(self, path : str):
+        self.path = path
+        self.schedule_pk = None
+        self.seconds = 0
+        # counts of created and unchanged entries and deleted AbstractEvents
+        self.result = None
+        self.error = None
+        self.is_profiled = False
+        # directory for cProfile dumps of stages or None
+        self.profile_dir = None
+        # report of import stages if import is profiled
+        self.profile = None
+
+    def __repr__(self):
+        if self.error:
+            return f"{self.path}: ошибка: {self.error}"
+
+        return f"{self.path}: {self.seconds:.2f} с, новых записей: {self.result['created']}, " \
+            f"без изменений: {self.result['unchanged']}, удалено запланированных событий: {self.result['deleted']}"
+
+
+def find_files(patterns : list[str]) -> list[str]:
+    """Returns sorted JSON files of given directories, glob patterns or file paths
+    """
+
+    paths = set()
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(glob.glob(os.path.join(pattern, "*.json")))
+        elif glob.has_magic(pattern):
+            paths.update(glob.glob(pattern))
+        else:
+            paths.add(pattern)
+
+    return sorted(paths)
+
+
+def read_file(path : str) -> tuple[FileImport, dict|None]:
+    """Finds Schedule of file and collects its reference data
+
+    Returns file import with error and None if file cannot be imported
+    """
+
+    file_import = FileImport(path)
+
+    try:
+        header = {}
+
+        with open(path, "rb") as file:
+            reference_data = EventImportAPI._collect_reference_data(EventImportAPI._read_event_data(file, header))
+
+        file_import.schedule_pk = EventImportAPI.find_schedule(header.get("title", "")).pk
+    except Exception as e:
+        file_import.error = str(e)
+
+        return file_import, None
+
+    return file_import, reference_data
+
+
+def import_file(file_import : FileImport) -> FileImport:
+    """Imports file, intended for running in worker process
+    """
+
+    started = time.perf_counter()
+    profiling = instrumentation.profiling(profile_dir=file_import.profile_dir) if file_import.is_profiled else nullcontext()
+    # stays None if profiling block fails on entering
+    profiler = None
+
+    try:
+        with profiling as profiler, open(file_import.path, "rb") as file:
+            file_import.result = EventImportAPI.import_event_data(file)
+    except Exception as e:
+        file_import.error = str(e)
+
+    file_import.seconds = time.perf_counter() - started
+
+    if profiler is not None:
+        file_import.profile = profiler.report()
+
+    return file_import
+
+
+def import_files(paths : list[str], processes : int = 1, profile : bool = False, profile_dir : str|None = None) -> list[FileImport]:
+    """Imports schedule files in given number of processes
+
+    Files resolved to same Schedule are not imported, except first of them.
+    SQLite allows single writer, so files are imported in one process for it.
+    If profile is set, report of import stages is stored into every file import
+    and cProfile stats of stages are dumped into profile_dir/<file name>/
+
+    Returns file imports in order of paths
+    """
+
+    file_imports = []
+    importable = []
+    reference_data = {}
+    schedule_paths = {}
+
+    for path in paths:
+        file_import, file_reference_data = read_file(path)
+        file_imports.append(file_import)
+
+        if file_import.error:
+            continue
+
+        if file_import.schedule_pk in schedule_paths:
+            file_import.error = f"Расписание уже импортируется из файла {schedule_paths[file_import.schedule_pk]}"
+
+            continue
+
+        schedule_paths[file_import.schedule_pk] = path
+        importable.append(file_import)
+
+        if profile:
+            file_import.is_profiled = True
+
+            if profile_dir:
+                file_import.profile_dir = os.path.join(profile_dir, os.path.splitext(os.path.basename(path))[0])
+
+        for key, values in file_reference_data.items():
+            reference_data.setdefault(key, set()).update(values)
+
+    # shared reference data is created once before parallel import
+    EventImportAPI._ensure_reference_data(reference_data)
+
+    if processes > 1 and len(importable) > 1 and connection.vendor != "sqlite":
+        # forked workers must not share connection of main process
+        connections.close_all()
+
+        # workers started by spawn import models, so Django must be set up
+        with Pool(min(processes, len(importable)), initializer=django.setup) as pool:
+            imported = pool.map(import_file, importable)
+    else:
+        imported = [import_file(file_import) for file_import in importable]
+
+    imported = {file_import.path : file_import for file_import in imported}
+
+    return [imported.get(file_import.path, file_import) for file_import in file_imports]
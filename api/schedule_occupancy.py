@@ -0,0 +1,412 @@
+"""Occupancy of EventParticipants and EventPlaces by AbstractEvents
+
+AbstractEvents are indexed by (schedule window, abstract_day, time_slot),
+where schedule window is semester bounds of its Schedule, so AbstractEvent
+is compared only with AbstractEvents of Schedules with overlapping semesters.
+
+Index is loaded on first check and kept current by AbstractEvent,
+its m2m fields and Schedule signals, so checking of saved AbstractEvent
+needs at most one query for its own participants and places. Changes are
+applied after commit, so rolled back transactions do not change index.
+Until commit changes are kept on top of index for own transaction,
+if they cannot be applied to it (e.g. Schedule is changed), AbstractEvents
+of checked abstract day and time slot are queried.
+Index older than SCHEDULE_OCCUPANCY_TTL seconds is reloaded,
+as changes made by other processes are not tracked
+"""
+
+import threading
+import time
+import weakref
+from collections import ChainMap
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, Value
+from api.conflicts import PARTICIPANT, PLACE, RESOURCE_FIELDS, UNBOUNDED_WINDOW, get_window, windows_overlap
+from api.models import (
+    AbstractEvent,
+    Schedule
+)
+
+
+class OccupancyIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded_at = None
+        # {Schedule pk : (start date, end date)}
+        self.windows = {}
+        # {AbstractEvent pk : (key, {kind : {resource pk}})}
+        self.entries = {}
+        # {(window, AbstractDay pk, TimeSlot pk) : {AbstractEvent pk}}
+        self.cells = {}
+
+    def load(self):
+        """Loads all AbstractEvents with its participants and places in three queries
+        """
+
+        windows = {
+            pk : get_window(start_date, end_date)
+            for pk, start_date, end_date in Schedule.objects.values_list("pk", "start_date", "end_date")
+        }
+        entries = {}
+        cells = {}
+
+        for pk, abstract_day_pk, time_slot_pk, schedule_pk in AbstractEvent.objects.values_list(
+            "pk", "abstract_day", "time_slot", "schedule"
+        ):
+            key = (windows.get(schedule_pk, UNBOUNDED_WINDOW), abstract_day_pk, time_slot_pk)
+            entries[pk] = (key, {PARTICIPANT : set(), PLACE : set()})
+            cells.setdefault(key, set()).add(pk)
+
+        for kind, ae_field, related_field in RESOURCE_FIELDS:
+            for ae_pk, resource_pk in getattr(AbstractEvent, ae_field).through.objects.values_list("abstractevent", related_field):
+                # AbstractEvent could be created between queries
+                if ae_pk in entries:
+                    entries[ae_pk][1][kind].add(resource_pk)
+
+        with self.lock:
+            self.windows = windows
+            self.entries = entries
+            self.cells = cells
+            self.loaded_at = time.monotonic()
+
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None and time.monotonic() - self.loaded_at < settings.SCHEDULE_OCCUPANCY_TTL
+
+    def find(self, abstract_event : AbstractEvent, resources : dict[str, set[int]],
+             changes : "TransactionChanges|None" = None) -> list[tuple[str, int, int]]|None:
+        """Finds AbstractEvents using given resources at same abstract day and time slot
+        as given AbstractEvent, not committed changes of transaction are applied on top of index
+
+        Returns list of (kind, resource pk, other AbstractEvent pk) or None if index
+        is not loaded and cannot be loaded with not committed changes
+        """
+
+        if not self.is_loaded():
+            if changes is not None:
+                return None
+
+            self.load()
+
+        found = []
+        cell = (abstract_event.abstract_day_id, abstract_event.time_slot_id)
+
+        with self.lock:
+            window = self.windows.get(abstract_event.schedule_id, UNBOUNDED_WINDOW)
+            others = set()
+
+            for other_window in set(self.windows.values()) | {UNBOUNDED_WINDOW}:
+                if windows_overlap(window, other_window):
+                    others.update(self.cells.get((other_window, *cell), ()))
+
+            entries = self.entries
+
+            if changes is not None:
+                entries = ChainMap(changes.entries, self.entries)
+
+                for pk, entry in changes.entries.items():
+                    if entry is not None and entry[0][1:] == cell and windows_overlap(window, entry[0][0]):
+                        others.add(pk)
+                    else:
+                        others.discard(pk)
+
+            for other_pk in others:
+                if other_pk == abstract_event.pk:
+                    continue
+
+                for kind, other_resources in entries[other_pk][1].items():
+                    for resource_pk in sorted(resources[kind] & other_resources):
+                        found.append((kind, resource_pk, other_pk))
+
+        return found
+
+    def update(self, positions : list[tuple[int, int, int, int]]):
+        """Moves saved AbstractEvents to its current abstract day, time slot and schedule window
+
+        Positions are (AbstractEvent pk, Schedule pk, AbstractDay pk, TimeSlot pk)
+        """
+
+        with self.lock:
+            if self.loaded_at is None:
+                return
+
+            for pk, schedule_pk, abstract_day_pk, time_slot_pk in positions:
+                key = (self.windows.get(schedule_pk, UNBOUNDED_WINDOW), abstract_day_pk, time_slot_pk)
+                old_key, resources = self.entries.get(pk, (None, {PARTICIPANT : set(), PLACE : set()}))
+
+                if old_key is not None:
+                    self.cells[old_key].discard(pk)
+
+                self.entries[pk] = (key, resources)
+                self.cells.setdefault(key, set()).add(pk)
+
+    def update_resources(self, changes : list[tuple[int, str, str, set]]):
+        """Applies m2m_changed actions of AbstractEvents participants or places
+
+        Changes are (AbstractEvent pk, kind, action, pk_set)
+        """
+
+        with self.lock:
+            if self.loaded_at is None:
+                return
+
+            for abstract_event_pk, kind, action, pk_set in changes:
+                if abstract_event_pk not in self.entries:
+                    continue
+
+                resources = self.entries[abstract_event_pk][1][kind]
+
+                if action == "post_add":
+                    resources.update(pk_set)
+                elif action == "post_remove":
+                    resources.difference_update(pk_set)
+                elif action == "post_clear":
+                    resources.clear()
+
+    def remove(self, abstract_event_pks):
+        with self.lock:
+            if self.loaded_at is None:
+                return
+
+            for pk in abstract_event_pks:
+                if pk in self.entries:
+                    key, _ = self.entries.pop(pk)
+                    self.cells[key].discard(pk)
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = None
+            self.windows = {}
+            self.entries = {}
+            self.cells = {}
+
+
+class TransactionChanges:
+    """Not committed changes of transaction kept on top of index of process
+    """
+
+    def __init__(self, base : OccupancyIndex):
+        self.base = base
+        # (weak reference to on_commit callback, method, args) in order of changes
+        self.changes = []
+        # {AbstractEvent pk : (key, {kind : {resource pk}}) or None if removed}
+        self.entries = {}
+        # changes cannot be applied on top of index, e.g. schedule windows changed
+        self.is_invalidated = False
+
+    def apply(self, callback : weakref.ref, method : str, args : tuple):
+        self.changes.append((callback, method, args))
+
+        if not self.base.is_loaded():
+            self.is_invalidated = True
+
+        if not self.is_invalidated:
+            getattr(self, method)(*args)
+
+    def get_entry(self, pk : int) -> tuple|None:
+        if pk in self.entries:
+            return self.entries[pk]
+
+        with self.base.lock:
+            entry = self.base.entries.get(pk)
+
+        if entry is None:
+            return None
+
+        return entry[0], {kind : set(resource_pks) for kind, resource_pks in entry[1].items()}
+
+    def update(self, positions : list[tuple[int, int, int, int]]):
+        for pk, schedule_pk, abstract_day_pk, time_slot_pk in positions:
+            key = (self.base.windows.get(schedule_pk, UNBOUNDED_WINDOW), abstract_day_pk, time_slot_pk)
+            entry = self.get_entry(pk)
+
+            self.entries[pk] = (key, entry[1] if entry is not None else {PARTICIPANT : set(), PLACE : set()})
+
+    def update_resources(self, changes : list[tuple[int, str, str, set]]):
+        for abstract_event_pk, kind, action, pk_set in changes:
+            entry = self.get_entry(abstract_event_pk)
+
+            if entry is None:
+                continue
+
+            self.entries[abstract_event_pk] = entry
+            resources = entry[1][kind]
+
+            if action == "post_add":
+                resources.update(pk_set)
+            elif action == "post_remove":
+                resources.difference_update(pk_set)
+            elif action == "post_clear":
+                resources.clear()
+
+    def remove(self, abstract_event_pks):
+        for pk in abstract_event_pks:
+            self.entries[pk] = None
+
+    def invalidate(self):
+        self.is_invalidated = True
+
+
+_local = threading.local()
+
+
+def get_changes() -> TransactionChanges|None:
+    """Returns not committed changes of current transaction
+
+    Django drops on_commit callbacks of rolled back transactions and savepoints,
+    so changes are rebuilt without ones whose callbacks are not alive
+    """
+
+    changes = getattr(_local, "changes", None)
+
+    if changes is None:
+        return None
+
+    alive = [change for change in changes.changes if change[0]() is not None]
+
+    if len(alive) < len(changes.changes):
+        changes = _local.changes = TransactionChanges(index) if alive else None
+
+        for change in alive:
+            changes.apply(*change)
+
+    return changes
+
+
+def has_pending_changes() -> bool:
+    """Checks if current transaction changed occupancy and is not committed yet
+    """
+
+    return get_changes() is not None
+
+
+def find(abstract_event : AbstractEvent, participant_pks=None, place_pks=None) -> list[tuple[str, int, int]]:
+    """Finds AbstractEvents using participants or places of given AbstractEvent
+    at same abstract day and time slot as seen by current transaction
+
+    Participants and places are loaded in single query if not given.
+    If index of process cannot be used with not committed changes,
+    AbstractEvents of abstract day and time slot are queried
+
+    Returns list of (kind, resource pk, other AbstractEvent pk)
+    """
+
+    if participant_pks is None or place_pks is None:
+        resources = get_resources(abstract_event)
+    else:
+        resources = {PARTICIPANT : set(participant_pks), PLACE : set(place_pks)}
+
+    changes = get_changes()
+    found = None
+
+    if changes is None or not changes.is_invalidated:
+        found = index.find(abstract_event, resources, changes)
+
+    if found is None:
+        found = find_in_cell(abstract_event, resources)
+
+    return found
+
+
+def find_in_cell(abstract_event : AbstractEvent, resources : dict[str, set[int]]) -> list[tuple[str, int, int]]:
+    """Finds AbstractEvents using given resources at same abstract day and time slot
+    as given AbstractEvent in database
+    """
+
+    schedule = abstract_event.schedule
+    window = get_window(schedule.start_date, schedule.end_date)
+    other_pks = [
+        pk
+        for pk, start_date, end_date in AbstractEvent.objects.filter(
+            abstract_day=abstract_event.abstract_day_id,
+            time_slot=abstract_event.time_slot_id
+        ).exclude(pk=abstract_event.pk).values_list("pk", "schedule__start_date", "schedule__end_date")
+        if windows_overlap(window, get_window(start_date, end_date))
+    ]
+    found = []
+
+    if not other_pks:
+        return found
+
+    for other_pk, other_resources in query_resources(abstractevent__in=other_pks).items():
+        for kind, resource_pks in other_resources.items():
+            for resource_pk in sorted(resources[kind] & resource_pks):
+                found.append((kind, resource_pk, other_pk))
+
+    return found
+
+
+def on_commit(method : str, *args):
+    """Applies change to index of process after current transaction commits,
+    changes of rolled back transaction are dropped by Django with it.
+    Until commit change is kept in changes of transaction
+
+    Callback of transaction is kept by weak reference to know
+    whether its change is pending
+    """
+
+    def apply():
+        _local.changes = None
+        getattr(index, method)(*args)
+
+    transaction.on_commit(apply)
+
+    # callback is called at once out of transaction
+    if transaction.get_connection().in_atomic_block:
+        changes = get_changes()
+
+        if changes is None:
+            changes = _local.changes = TransactionChanges(index)
+
+        changes.apply(weakref.ref(apply), method, args)
+
+
+def update_on_commit(abstract_events):
+    """Moves AbstractEvents in index after current transaction commits
+    """
+
+    on_commit("update", [(ae.pk, ae.schedule_id, ae.abstract_day_id, ae.time_slot_id) for ae in abstract_events])
+
+
+def update_resources_on_commit(changes : list[tuple[int, str, str, set]]):
+    on_commit("update_resources", [(pk, kind, action, set(pk_set or ())) for pk, kind, action, pk_set in changes])
+
+
+def remove_on_commit(abstract_event_pks):
+    on_commit("remove", list(abstract_event_pks))
+
+
+def invalidate_on_commit():
+    on_commit("invalidate")
+
+
+def query_resources(**filters) -> dict[int, dict[str, set[int]]]:
+    """Returns {AbstractEvent pk : {kind : {resource pk}}} of AbstractEvents
+    matched by filters of through tables in single query
+    """
+
+    queries = [
+        getattr(AbstractEvent, ae_field).through.objects.filter(**filters).values_list(
+            "abstractevent", Value(kind, output_field=CharField()), related_field
+        )
+        for kind, ae_field, related_field in RESOURCE_FIELDS
+    ]
+    resources = {}
+
+    for abstract_event_pk, kind, resource_pk in queries[0].union(*queries[1:], all=True):
+        resources.setdefault(abstract_event_pk, {PARTICIPANT : set(), PLACE : set()})[kind].add(resource_pk)
+
+    return resources
+
+
+def get_resources(abstract_event : AbstractEvent) -> dict[str, set[int]]:
+    """Returns {kind : {resource pk}} of AbstractEvent in single query
+    """
+
+    if abstract_event.pk is None:
+        return {PARTICIPANT : set(), PLACE : set()}
+
+    return query_resources(abstractevent=abstract_event).get(abstract_event.pk, {PARTICIPANT : set(), PLACE : set()})
+
+
+index = OccupancyIndex()
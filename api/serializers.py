@@ -6,6 +6,7 @@ from api.models import (
     EventKind,
     EventParticipant,
     EventPlace,
+    ImportJob,
     Schedule,
     Subject,
     TimeSlot,
@@ -151,6 +152,44 @@ class EventPlaceSerializer(CommonModelSerializer):
         list_serializer_class = CommonModelListSerializer
 
 
+class FreeRoomSerializer(serializers.Serializer):
+    """Только для чтения свободных мест проведения
+    """
+
+    id = serializers.IntegerField(label="ID места проведения")
+    building = serializers.CharField(label="Корпус")
+    room = serializers.CharField(label="Аудитория")
+    free_time_slots = serializers.DictField(
+        child=serializers.ListField(child=serializers.IntegerField()),
+        label="ID свободных временных интервалов по датам"
+    )
+
+
+class FreeTimeSerializer(serializers.Serializer):
+    """Только для чтения общего свободного времени участников
+    """
+
+    date = serializers.DateField(label="Дата")
+    time_slot_id = serializers.IntegerField(source="time_slot.pk", label="ID временного интервала")
+    time_slot = TimeSlotSerializer(label="Временной интервал")
+    place = EventPlaceSerializer(label="Место проведения")
+
+
+class VirtualEventSerializer(serializers.Serializer):
+    """Только для чтения занятий, развернутых из запланированных событий
+    """
+
+    id = serializers.IntegerField(allow_null=True, label="ID измененного занятия")
+    abstract_event_id = serializers.IntegerField(source="abstract_event.pk", label="ID запланированного события")
+    date = serializers.DateField(label="Дата")
+    subject = SubjectSerializer(source="subject_override", label="Предмет")
+    kind = serializers.CharField(source="kind_override.name", allow_null=True, label="Тип события")
+    time_slot = TimeSlotSerializer(source="time_slot_override", label="Временной интервал")
+    participants = EventParticipantSerializer(source="participants_override.all", many=True, label="Участники")
+    places = EventPlaceSerializer(source="places_override.all", many=True, label="Места")
+    is_event_canceled = serializers.BooleanField(label="Событие отменено")
+
+
 class EventSerializer(CommonModelSerializer):
     participants = EventParticipantSerializer(many=True, label="Участники")
     subject = SubjectSerializer(label="Предмет")
@@ -257,4 +296,38 @@ class ScheduleSerializer(CommonModelSerializer):
 class FileUploadSerializer(serializers.Serializer):
     """Необходимый для работы импорта сериализатор"""
 
-    file = serializers.FileField(required=False)
\ No newline at end of file
+    file = serializers.FileField(required=False)
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    """Задача импорта файла, файл принимается, но не выводится"""
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "file",
+            "options",
+            "processed",
+            "total",
+            "stages",
+            "result",
+            "error",
+            "datecreated",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = [
+            "status",
+            "processed",
+            "total",
+            "stages",
+            "result",
+            "error",
+            "datecreated",
+            "started_at",
+            "finished_at",
+        ]
+        extra_kwargs = {"file": {"write_only": True}}
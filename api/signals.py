@@ -1,28 +1,122 @@
-from django.db.models.signals import pre_save, pre_init
+from django.core.signals import request_finished, setting_changed
+from django.db.models.signals import pre_save, post_init, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.utils import timezone
 
-from api.models import CommonModel
+from api.access_tracking import buffer
+from api.models import CommonModel, AbstractEvent, Event, Schedule, TimeSlot
+from api.conflicts import PARTICIPANT, PLACE
+import api.room_occupancy as room_occupancy
+import api.schedule_occupancy as schedule_occupancy
 
 
-@receiver(pre_save, sender=CommonModel)
-def update_datemodified(sender, instance, **kwargs):
-    if instance.pk:
-        original = sender.objects.get(pk=instance.pk)
-        has_changes = any(
-            getattr(original, field) != getattr(instance, field)
-            for field in instance._meta.get_fields()
-            if field.name != 'datemodified'
-        )
-        if has_changes:
-            instance.datemodified = timezone.now()
-    else:
+@receiver(pre_save)
+def update_datemodified(sender, instance, update_fields=None, **kwargs):
+    if not isinstance(instance, CommonModel):
+        return
+    
+    if update_fields is not None and "datemodified" not in update_fields:
+        return
+
+    if instance.pk is None or instance.changed_fields() - {"datemodified", "dateaccessed"}:
         instance.datemodified = timezone.now()
 
 
-@receiver(pre_init, sender=CommonModel)
-def update_dateaccessed(sender, *args, **kwargs):
-    instance = kwargs.get('instance', None)
-    if instance and instance.pk:
-        instance.dateaccessed = timezone.now()
-        instance.save(update_fields=['dateaccessed'])
\ No newline at end of file
+def update_dateaccessed(sender, instance, **kwargs):
+    """Remembers access to loaded CommonModel record
+
+    Connected to post_init of all models when ACCESS_TRACKING is enabled
+    """
+
+    if instance.pk and isinstance(instance, CommonModel):
+        buffer.touch(sender, instance.pk)
+
+
+def flush_dateaccessed(sender, **kwargs):
+    buffer.flush()
+
+
+def connect_access_tracking(is_enabled : bool):
+    """Connects or disconnects receivers of dateaccessed tracking
+    """
+
+    if is_enabled:
+        post_init.connect(update_dateaccessed, dispatch_uid="api_update_dateaccessed")
+        request_finished.connect(flush_dateaccessed, dispatch_uid="api_flush_dateaccessed")
+    else:
+        post_init.disconnect(dispatch_uid="api_update_dateaccessed")
+        request_finished.disconnect(dispatch_uid="api_flush_dateaccessed")
+        buffer.clear()
+
+
+@receiver(setting_changed)
+def update_access_tracking(sender, setting, value, **kwargs):
+    if setting == "ACCESS_TRACKING":
+        connect_access_tracking(value)
+
+
+@receiver(pre_save, sender=Event)
+def update_room_occupancy_on_save(sender, instance, **kwargs):
+    """Drops occupancy bitmaps of Event old and new dates
+    """
+
+    dates = {instance.date}
+
+    if instance.pk is not None:
+        dates.add(instance.loaded_value("date"))
+
+    room_occupancy.invalidate_on_commit(dates)
+
+
+@receiver(post_delete, sender=Event)
+def update_room_occupancy_on_delete(sender, instance, **kwargs):
+    room_occupancy.invalidate_on_commit([instance.date])
+
+
+@receiver(m2m_changed, sender=Event.places_override.through)
+def update_room_occupancy_on_places_change(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    # EventPlace changed from its side
+    if reverse:
+        room_occupancy.invalidate_on_commit()
+    else:
+        room_occupancy.invalidate_on_commit([instance.date])
+
+
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+def update_room_occupancy_on_time_slot_change(sender, instance, **kwargs):
+    room_occupancy.invalidate_on_commit()
+
+
+@receiver(post_save, sender=AbstractEvent)
+def update_schedule_occupancy_on_save(sender, instance, **kwargs):
+    schedule_occupancy.update_on_commit([instance])
+
+
+@receiver(post_delete, sender=AbstractEvent)
+def update_schedule_occupancy_on_delete(sender, instance, **kwargs):
+    schedule_occupancy.remove_on_commit([instance.pk])
+
+
+@receiver(m2m_changed, sender=AbstractEvent.participants.through)
+@receiver(m2m_changed, sender=AbstractEvent.places.through)
+def update_schedule_occupancy_on_resources_change(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    # participant or place changed from its side
+    if reverse:
+        schedule_occupancy.invalidate_on_commit()
+    else:
+        kind = PARTICIPANT if sender is AbstractEvent.participants.through else PLACE
+
+        schedule_occupancy.update_resources_on_commit([(instance.pk, kind, action, pk_set)])
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+def update_schedule_occupancy_on_schedule_change(sender, instance, **kwargs):
+    schedule_occupancy.invalidate_on_commit()
@@ -0,0 +1,56 @@
+from django.test import TestCase, override_settings
+from api.access_tracking import buffer
+from api.models import Subject, EventPlace
+
+"""py manage.py test api.tests.test_access_tracking
+"""
+
+@override_settings(ACCESS_TRACKING=True)
+class TestAccessTracking(TestCase):
+    def setUp(self):
+        Subject.objects.bulk_create([Subject(name=f"Предмет {i}") for i in range(5)])
+        EventPlace.objects.create(building="В", room="902")
+
+        buffer.clear()
+
+    def test_reading_not_writes(self):
+        # only reading queries
+        with self.assertNumQueries(3):
+            list(Subject.objects.all())
+            list(Subject.objects.all())
+            EventPlace.objects.get(room="902")
+
+        self.assertFalse(Subject.objects.filter(dateaccessed__isnull=False).exists())
+
+    def test_flush_writes_single_update_per_model(self):
+        list(Subject.objects.all())
+        EventPlace.objects.get(room="902")
+
+        with self.assertNumQueries(2):
+            self.assertEqual(buffer.flush(), 6)
+
+        self.assertFalse(Subject.objects.filter(dateaccessed__isnull=True).exists())
+        self.assertIsNotNone(EventPlace.objects.get(room="902").dateaccessed)
+
+    @override_settings(ACCESS_TRACKING_BUFFER_SIZE=3)
+    def test_flush_on_full_buffer(self):
+        # buffer is not flushed while records are loaded
+        with self.assertNumQueries(1):
+            list(Subject.objects.all()[:3])
+
+        self.assertEqual(buffer.flush_if_needed(), 3)
+        self.assertEqual(buffer.flush_if_needed(), 0)
+        self.assertEqual(Subject.objects.filter(dateaccessed__isnull=False).count(), 3)
+
+    @override_settings(ACCESS_TRACKING=False)
+    def test_disabled(self):
+        list(Subject.objects.all())
+
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_flush_on_request_finished(self):
+        list(Subject.objects.all())
+
+        self.client.get("/api/subjects/")
+
+        self.assertFalse(Subject.objects.filter(dateaccessed__isnull=True).exists())
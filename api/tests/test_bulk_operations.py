@@ -0,0 +1,183 @@
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from api.importers import ReferenceImporter
+from api.utilities import WriteAPI
+from api.bulk_operations import bulk_operation
+from api.models import (
+    Schedule,
+    EventParticipant,
+    Department,
+    Organization,
+    AbstractDay,
+    TimeSlot,
+    AbstractEvent,
+    AbstractEventChanges,
+    Event,
+    EventPlace,
+    Subject,
+    EventKind,
+    DayDateOverride,
+    EventCancel
+)
+
+"""py manage.py test api.tests.test_bulk_operations
+"""
+
+class TestBulkOperation(TestCase):
+    def setUp(self):
+        FACULTY_REFERENCE_DATA = """
+        [
+            {
+                "faculty_id" : "111",
+                "faculty_fullname" : "Факультет электроники и вычислительной техники",
+                "faculty_code" : "000000111",
+                "faculty_shortname" : "ФЭВТ"
+            }
+        ]
+        """
+        SCHEDULE_REFERENCE_DATA = """
+            [
+                {
+                    "course": "4",
+                    "schedule_template_metadata_faculty_shortname": "ФЭВТ",
+                    "semester": "1",
+                    "years": "2024-2025",
+                    "start_date": "02.09.2024",
+                    "end_date": "29.12.2024",
+                    "scope": "Бакалавриат",
+                    "department_shortname": "ФЭВТ"
+                }
+            ]
+        """
+
+        WriteAPI.create_common_abstract_days()
+        WriteAPI.create_common_time_slots()
+        Organization.objects.create(name="ВолгГТУ")
+        ReferenceImporter.import_faculty_reference(FACULTY_REFERENCE_DATA)
+        ReferenceImporter.import_schedule(SCHEDULE_REFERENCE_DATA, True)
+
+        department = Department.objects.get(shortname="ФЭВТ")
+        self.SCHEDULE = Schedule.objects.get(status=Schedule.Status.ACTIVE)
+        self.KIND = EventKind.objects.get_or_create(name="Лекция")[0]
+        self.TIME_SLOT = TimeSlot.objects.get(alt_name="1-2")
+        self.SUBJECTS = [Subject.objects.get_or_create(name=name)[0] for name in ("ВКР", "ОС", "БД")]
+        self.GROUP = EventParticipant.objects.create(name="ПрИн-466", role=EventParticipant.Role.STUDENT, is_group=True, department=department)
+        self.TEACHER = EventParticipant.objects.create(name="Гилка В.В.", role=EventParticipant.Role.TEACHER, department=department)
+        self.PLACE = EventPlace.objects.create(building="В", room="902")
+        self.OTHER_PLACE = EventPlace.objects.create(building="В", room="903")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.EXISTING = WriteAPI.create_abstract_event(
+                self.KIND, self.SUBJECTS[2], [self.GROUP], [self.PLACE],
+                AbstractDay.objects.get(day_number=2), self.TIME_SLOT, None, self.SCHEDULE
+            )
+            WriteAPI.fill_event_table(self.EXISTING)
+
+        # calendar on dates of AbstractEvent created per Event
+        dates = WriteAPI.get_semester_dates(
+            AbstractEvent(abstract_day=AbstractDay.objects.get(day_number=1), schedule=self.SCHEDULE)
+        )
+
+        DayDateOverride.objects.create(day_source=dates[3], day_destination=dates[3].replace(day=dates[3].day - 1), department=department)
+        EventCancel.objects.create(date=dates[5], department=department)
+
+    def make_changes(self):
+        """Imports two AbstractEvents and moves existing one
+        """
+
+        first = WriteAPI.create_abstract_event(
+            self.KIND, self.SUBJECTS[0], [self.GROUP, self.TEACHER], [self.PLACE],
+            AbstractDay.objects.get(day_number=0), self.TIME_SLOT, None, self.SCHEDULE
+        )
+        WriteAPI.fill_semester_by_repeating(first)
+
+        # Events saved one by one
+        second = WriteAPI.create_abstract_event(
+            self.KIND, self.SUBJECTS[1], [self.GROUP], [self.PLACE],
+            AbstractDay.objects.get(day_number=1), self.TIME_SLOT, None, self.SCHEDULE
+        )
+
+        for date_ in WriteAPI.get_semester_dates(second):
+            WriteAPI.create_event(date_, second)
+
+        Event.objects.filter(abstract_event=second).order_by("date").first().places_override.add(self.OTHER_PLACE)
+
+        existing = AbstractEvent.objects.get(pk=self.EXISTING.pk)
+        existing.abstract_day = AbstractDay.objects.get(day_number=3)
+        existing.save()
+
+    def snapshot(self) -> tuple:
+        """Returns state of Events and AbstractEventChanges independent of created rows pks
+        """
+
+        events = sorted(
+            (
+                e.abstract_event.subject.name,
+                e.date,
+                e.date_override_id,
+                e.time_slot_override_id,
+                e.is_event_canceled,
+                e.event_cancel_id,
+                e.is_event_overriden,
+                tuple(sorted(p.pk for p in e.participants_override.all())),
+                tuple(sorted(p.pk for p in e.places_override.all()))
+            )
+            for e in Event.objects.select_related("abstract_event__subject").prefetch_related("participants_override", "places_override")
+        )
+        changes = sorted(
+            (ae.subject.name, ) + tuple(AbstractEventChanges.objects.filter(pk=ae.changes_id).values_list(
+                "group", "date_time", "subject", "is_created", "origin_teachers", "origin_places",
+                "final_teachers", "final_places", "final_date_time", "final_holds_on_date", "final_kind"
+            ).get())
+            for ae in AbstractEvent.objects.select_related("subject")
+        )
+
+        return events, changes
+
+    def run_and_rollback(self, is_bulk : bool) -> tuple:
+        """Makes changes with or without bulk operation
+
+        Returns state after changes and count of queries
+        """
+
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                if is_bulk:
+                    with bulk_operation():
+                        self.make_changes()
+                else:
+                    self.make_changes()
+
+            snapshot = self.snapshot()
+
+            transaction.set_rollback(True)
+
+        return snapshot, len(queries)
+
+    def test_bulk_operation_matches_signals(self):
+        signals_snapshot, signals_queries = self.run_and_rollback(False)
+        bulk_snapshot, bulk_queries = self.run_and_rollback(True)
+
+        events, changes = bulk_snapshot
+
+        # scenario covers calendar and overrides
+        self.assertTrue(any(e[2] for e in events))
+        self.assertTrue(any(e[5] for e in events))
+        self.assertEqual(sum(e[6] for e in events), 1)
+        self.assertEqual(len(changes), 3)
+
+        self.assertEqual(bulk_snapshot, signals_snapshot)
+        self.assertLess(bulk_queries, signals_queries)
+
+    def test_handlers_are_restored_after_block(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with bulk_operation():
+                pass
+
+            abstract_event = WriteAPI.create_abstract_event(
+                self.KIND, self.SUBJECTS[0], [self.GROUP], [self.PLACE],
+                AbstractDay.objects.get(day_number=0), self.TIME_SLOT, None, self.SCHEDULE
+            )
+
+        self.assertTrue(AbstractEvent.objects.get(pk=abstract_event.pk).changes.is_created)
@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.test import TestCase
+from api.importers import ReferenceImporter
+from api.utilities import WriteAPI
+import api.change_journal as change_journal
+from api.models import (
+    Schedule,
+    EventParticipant,
+    Department,
+    Organization,
+    AbstractDay,
+    TimeSlot,
+    AbstractEvent,
+    AbstractEventChanges,
+    Event,
+    EventPlace,
+    Subject,
+    EventKind
+)
+
+"""py manage.py test api.tests.test_change_journal
+"""
+
+class TestChangeJournal(TestCase):
+    def setUp(self):
+        FACULTY_REFERENCE_DATA = """
+        [
+            {
+                "faculty_id" : "111",
+                "faculty_fullname" : "Факультет электроники и вычислительной техники",
+                "faculty_code" : "000000111",
+                "faculty_shortname" : "ФЭВТ"
+            }
+        ]
+        """
+        SCHEDULE_REFERENCE_DATA = """
+            [
+                {
+                    "course": "4",
+                    "schedule_template_metadata_faculty_shortname": "ФЭВТ",
+                    "semester": "1",
+                    "years": "2024-2025",
+                    "start_date": "02.09.2024",
+                    "end_date": "29.12.2024",
+                    "scope": "Бакалавриат",
+                    "department_shortname": "ФЭВТ"
+                }
+            ]
+        """
+
+        WriteAPI.create_common_abstract_days()
+        WriteAPI.create_common_time_slots()
+        Organization.objects.create(name="ВолгГТУ")
+        ReferenceImporter.import_faculty_reference(FACULTY_REFERENCE_DATA)
+        ReferenceImporter.import_schedule(SCHEDULE_REFERENCE_DATA, True)
+
+        department = Department.objects.get(shortname="ФЭВТ")
+        self.GROUP = EventParticipant.objects.create(name="ПрИн-466", role=EventParticipant.Role.STUDENT, is_group=True, department=department)
+        self.TEACHER = EventParticipant.objects.create(name="Гилка В.В.", role=EventParticipant.Role.TEACHER, department=department)
+        self.OTHER_TEACHER = EventParticipant.objects.create(name="Иванов И.И.", role=EventParticipant.Role.TEACHER, department=department)
+        self.PLACE = EventPlace.objects.create(building="В", room="902")
+        self.OTHER_PLACE = EventPlace.objects.create(building="В", room="903")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            abstract_event = WriteAPI.create_abstract_event(
+                EventKind.objects.get_or_create(name="Лекция")[0],
+                Subject.objects.get_or_create(name="ВКР")[0],
+                [self.GROUP, self.TEACHER],
+                [self.PLACE],
+                AbstractDay.objects.get(day_number=0),
+                TimeSlot.objects.get(alt_name="1-2"),
+                None,
+                Schedule.objects.get(status=Schedule.Status.ACTIVE)
+            )
+            WriteAPI.fill_event_table(abstract_event)
+
+        # as already exported AbstractEvent
+        AbstractEvent.objects.filter(pk=abstract_event.pk).update(changes=None)
+        AbstractEventChanges.objects.all().delete()
+
+        self.ABSTRACT_EVENT = AbstractEvent.objects.get(pk=abstract_event.pk)
+
+    def test_changes_applied_once_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.ABSTRACT_EVENT.participants.set([self.GROUP, self.OTHER_TEACHER])
+            self.ABSTRACT_EVENT.places.set([self.OTHER_PLACE])
+
+            # nothing propagated before commit
+            self.assertFalse(Event.objects.filter(participants_override=self.OTHER_TEACHER).exists())
+
+        flushes = [c for c in callbacks if isinstance(c, change_journal.Flush)]
+
+        self.assertEqual(len(flushes), 1)
+
+        flushes[0]()
+
+        for e in Event.objects.filter(abstract_event=self.ABSTRACT_EVENT):
+            self.assertSetEqual(set(e.participants_override.all()), {self.GROUP, self.OTHER_TEACHER})
+            self.assertSequenceEqual(list(e.places_override.all()), [self.OTHER_PLACE])
+
+        changes = AbstractEventChanges.objects.get()
+
+        self.assertEqual(AbstractEvent.objects.get(pk=self.ABSTRACT_EVENT.pk).changes, changes)
+        self.assertEqual(changes.origin_teachers, self.TEACHER.name)
+        self.assertEqual(changes.final_teachers, self.OTHER_TEACHER.name)
+        self.assertEqual(changes.origin_places, str(self.PLACE))
+        self.assertEqual(changes.final_places, str(self.OTHER_PLACE))
+
+    def test_rolled_back_changes_not_applied(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.ABSTRACT_EVENT.participants.add(self.OTHER_TEACHER)
+                transaction.set_rollback(True)
+
+            self.ABSTRACT_EVENT.places.set([self.OTHER_PLACE])
+
+        for e in Event.objects.filter(abstract_event=self.ABSTRACT_EVENT):
+            self.assertSetEqual(set(e.participants_override.all()), {self.GROUP, self.TEACHER})
+            self.assertSequenceEqual(list(e.places_override.all()), [self.OTHER_PLACE])
+
+        changes = AbstractEventChanges.objects.get()
+
+        self.assertNotIn(self.OTHER_TEACHER.name, changes.final_teachers or "")
+        self.assertEqual(changes.final_places, str(self.OTHER_PLACE))
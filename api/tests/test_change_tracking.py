@@ -0,0 +1,63 @@
+from datetime import date
+from django.test import TestCase
+from api.models import Subject, Organization, Department, EventCancel
+
+"""py manage.py test api.tests.test_change_tracking
+"""
+
+class TestChangeTracking(TestCase):
+    def setUp(self):
+        self.SUBJECT = Subject.objects.create(name="ВКР")
+        self.DEPARTMENT = Department.objects.create(name="ФЭВТ", organization=Organization.objects.create(name="ВолгГТУ"))
+
+    def test_changed_fields(self):
+        subject = Subject.objects.get(pk=self.SUBJECT.pk)
+
+        self.assertSetEqual(subject.changed_fields(), set())
+
+        subject.name = "Программирование"
+
+        self.assertSetEqual(subject.changed_fields(), {"name"})
+        self.assertEqual(subject.loaded_value("name"), "ВКР")
+
+        # single UPDATE without fetching previous row
+        with self.assertNumQueries(1):
+            subject.save()
+
+        self.assertSetEqual(subject.changed_fields(), set())
+        self.assertSetEqual(Subject(name="Новый").changed_fields(), {f.name for f in Subject._meta.concrete_fields})
+
+    def test_datemodified_changes_only_with_fields(self):
+        subject = Subject.objects.get(pk=self.SUBJECT.pk)
+        datemodified = subject.datemodified
+
+        subject.save()
+        self.assertEqual(Subject.objects.get(pk=subject.pk).datemodified, datemodified)
+
+        subject.name = "Программирование"
+        subject.save()
+        self.assertGreater(Subject.objects.get(pk=subject.pk).datemodified, datemodified)
+
+    def test_not_loaded_instance_fetches_row(self):
+        event_cancel = EventCancel.objects.create(date=date(2024, 9, 16), department=self.DEPARTMENT)
+        not_loaded = EventCancel(pk=event_cancel.pk, date=date(2024, 9, 17), department=self.DEPARTMENT)
+
+        with self.assertNumQueries(1):
+            self.assertSetEqual(not_loaded.changed_fields() & {"date", "department"}, {"date"})
+
+    def test_refresh_from_db_updates_loaded_values(self):
+        subject = Subject.objects.get(pk=self.SUBJECT.pk)
+
+        Subject.objects.filter(pk=subject.pk).update(name="Программирование", note="Изменено")
+        subject.refresh_from_db(fields=["name"])
+
+        self.assertEqual(subject.loaded_value("name"), "Программирование")
+        self.assertSetEqual(subject.changed_fields(), set())
+
+        subject.refresh_from_db()
+
+        self.assertEqual(subject.loaded_value("note"), "Изменено")
+
+        subject.name = "ВКР"
+
+        self.assertSetEqual(subject.changed_fields(), {"name"})
@@ -0,0 +1,214 @@
+from datetime import date
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from api.importers import ReferenceImporter
+from api.utilities import Utilities, WriteAPI
+import api.conflicts as conflicts
+from api.models import (
+    Schedule,
+    EventParticipant,
+    Department,
+    Organization,
+    AbstractDay,
+    TimeSlot,
+    AbstractEvent,
+    Event,
+    EventPlace,
+    Subject,
+    EventKind,
+    DayDateOverride,
+    EventCancel
+)
+
+"""py manage.py test api.tests.test_conflicts
+"""
+
+class TestConflicts(TestCase):
+    def setUp(self):
+        FACULTY_REFERENCE_DATA = """
+        [
+            {
+                "faculty_id" : "111",
+                "faculty_fullname" : "Факультет электроники и вычислительной техники",
+                "faculty_code" : "000000111",
+                "faculty_shortname" : "ФЭВТ"
+            }
+        ]
+        """
+        SCHEDULE_REFERENCE_DATA = """
+            [
+                {
+                    "course": "4",
+                    "schedule_template_metadata_faculty_shortname": "ФЭВТ",
+                    "semester": "1",
+                    "years": "2024-2025",
+                    "start_date": "02.09.2024",
+                    "end_date": "29.12.2024",
+                    "scope": "Бакалавриат",
+                    "department_shortname": "ФЭВТ"
+                }
+            ]
+        """
+
+        WriteAPI.create_common_abstract_days()
+        WriteAPI.create_common_time_slots()
+        Organization.objects.create(name="ВолгГТУ")
+        ReferenceImporter.import_faculty_reference(FACULTY_REFERENCE_DATA)
+        ReferenceImporter.import_schedule(SCHEDULE_REFERENCE_DATA, True)
+
+        department = Department.objects.get(shortname="ФЭВТ")
+        groups = [
+            EventParticipant.objects.create(name=f"ПрИн-46{i}", role=EventParticipant.Role.STUDENT, is_group=True, department=department)
+            for i in range(3)
+        ]
+        teachers = [
+            EventParticipant.objects.create(name=f"Преподаватель {i}", role=EventParticipant.Role.TEACHER, department=department)
+            for i in range(2)
+        ]
+        places = [EventPlace.objects.create(building="В", room=str(900 + i)) for i in range(2)]
+        kind = EventKind.objects.get_or_create(name="Лекция")[0]
+        subject = Subject.objects.get_or_create(name="ВКР")[0]
+        schedule = Schedule.objects.get(status=Schedule.Status.ACTIVE)
+        monday = AbstractDay.objects.get(day_number=0)
+        tuesday = AbstractDay.objects.get(day_number=1)
+        first_slot = TimeSlot.objects.get(alt_name="1-2")
+        second_slot = TimeSlot.objects.get(alt_name="3-4")
+
+        def create(participants, places_, abstract_day, time_slot, holds_on_date=None, schedule=schedule):
+            return WriteAPI.create_abstract_event(kind, subject, participants, places_, abstract_day, time_slot, holds_on_date, schedule)
+
+        self.create = create
+        self.DEPARTMENT = department
+        self.SEMESTER = (schedule.start_date, schedule.end_date)
+
+        # teacher and room double usage
+        create([groups[0], teachers[0]], [places[0]], monday, first_slot)
+        create([groups[1], teachers[0]], [places[0]], monday, first_slot)
+        # room double usage
+        create([groups[2], teachers[1]], [places[0]], monday, first_slot)
+        # same resources at other time
+        create([groups[0], teachers[0]], [places[0]], monday, second_slot)
+        create([groups[1], teachers[1]], [places[1]], tuesday, first_slot)
+
+        self.GROUPS = groups
+        self.TEACHER = teachers[0]
+        self.OTHER_TEACHER = teachers[1]
+        self.PLACE = places[0]
+
+    def test_sweep_matches_per_event_check(self):
+        expected = []
+
+        for ae in AbstractEvent.objects.order_by("pk"):
+            is_double_usage_found, message = Utilities.check_abstract_event(ae)
+
+            if is_double_usage_found:
+                expected.append((ae, message))
+
+        self.assertEqual(len(expected), 3)
+        self.assertEqual(Utilities.check_abstract_events(AbstractEvent.objects.all()), expected)
+
+    def test_sweep_checks_selected_against_all(self):
+        selected = AbstractEvent.objects.order_by("pk")[:1]
+
+        with self.assertNumQueries(6):
+            found_conflicts = conflicts.find_conflicts(selected)
+
+        self.assertListEqual(
+            [(c.kind, c.resource, len(c.abstract_events)) for c in found_conflicts],
+            [(conflicts.PARTICIPANT, self.TEACHER, 2), (conflicts.PLACE, self.PLACE, 3)]
+        )
+
+    def test_sweep_skips_not_overlapping_semesters(self):
+        spring_schedule = Schedule.objects.get(status=Schedule.Status.ACTIVE)
+        spring_schedule.pk = None
+        spring_schedule.start_date = date(2025, 2, 3)
+        spring_schedule.end_date = date(2025, 6, 29)
+        spring_schedule.save()
+
+        abstract_event = self.create(
+            [self.TEACHER], [], AbstractDay.objects.get(day_number=0), TimeSlot.objects.get(alt_name="1-2"), schedule=spring_schedule
+        )
+
+        self.assertEqual(conflicts.find_conflicts([abstract_event]), [])
+        self.assertFalse(Utilities.check_abstract_event(abstract_event)[0])
+
+        spring_schedule.start_date = date(2024, 12, 23)
+        spring_schedule.save()
+
+        self.assertListEqual(
+            [(c.kind, c.resource, len(c.abstract_events)) for c in conflicts.find_conflicts([abstract_event])],
+            [(conflicts.PARTICIPANT, self.TEACHER, 3)]
+        )
+        self.assertTrue(Utilities.check_abstract_event(abstract_event)[0])
+
+    def test_command(self):
+        out = StringIO()
+
+        call_command("check_conflicts", department="ФЭВТ", stdout=out)
+
+        self.assertIn("Найдено накладок: 2", out.getvalue())
+
+    def test_event_conflicts_follow_calendar(self):
+        WriteAPI.fill_event_table(AbstractEvent.objects.all())
+
+        first, second, third, _, fifth = AbstractEvent.objects.order_by("pk")
+        dates = sorted(Event.objects.filter(abstract_event=first).values_list("date", flat=True))
+
+        # both teacher and room on every date of first AbstractEvent
+        found_conflicts = conflicts.find_event_conflicts(*self.SEMESTER)
+        self.assertEqual(len(found_conflicts), len(dates) * 2)
+
+        EventCancel.objects.create(date=dates[0], department=self.DEPARTMENT)
+
+        found_conflicts = conflicts.find_event_conflicts(*self.SEMESTER)
+        self.assertEqual(len(found_conflicts), (len(dates) - 1) * 2)
+        self.assertNotIn(dates[0], {c.date for c in found_conflicts})
+
+        # moved Tuesday collides with other teacher Monday lesson
+        DayDateOverride.objects.create(
+            day_source=Event.objects.filter(abstract_event=fifth).earliest("date").date,
+            day_destination=dates[1],
+            department=self.DEPARTMENT
+        )
+
+        # no places double usage, so five queries
+        with self.assertNumQueries(5):
+            found_conflicts = conflicts.find_event_conflicts(*self.SEMESTER, Event.objects.filter(abstract_event=fifth))
+
+        self.assertSetEqual(
+            {(c.resource, c.date, tuple(e.abstract_event for e in c.events)) for c in found_conflicts},
+            {
+                (self.OTHER_TEACHER, dates[1], (third, fifth)),
+                (self.GROUPS[1], dates[1], (second, fifth))
+            }
+        )
+
+    def test_event_conflicts_respect_holds_on_date(self):
+        AbstractEvent.objects.all().delete()
+
+        monday = AbstractDay.objects.get(day_number=0)
+        time_slot = TimeSlot.objects.get(alt_name="5-6")
+
+        self.create([self.TEACHER], [], monday, time_slot, date(2024, 9, 2))
+        self.create([self.TEACHER], [], monday, time_slot, date(2024, 9, 16))
+        WriteAPI.fill_event_table(AbstractEvent.objects.all())
+
+        # same abstract day and time slot
+        self.assertEqual(len(conflicts.find_conflicts(AbstractEvent.objects.all())), 1)
+        # but different dates
+        self.assertListEqual(conflicts.find_event_conflicts(*self.SEMESTER), [])
+        self.assertListEqual(Utilities.check_events(Event.objects.all()), [])
+
+    def test_check_events_messages(self):
+        WriteAPI.fill_event_table(AbstractEvent.objects.all())
+
+        first = AbstractEvent.objects.earliest("pk")
+        event = Event.objects.filter(abstract_event=first).earliest("date")
+
+        [(checked_event, message)] = Utilities.check_events([event])
+
+        self.assertEqual(checked_event, event)
+        self.assertIn(self.TEACHER.name, message)
+        self.assertIn(str(self.PLACE), message)
+        self.assertIn(event.date.strftime("%d.%m.%Y"), message)
@@ -0,0 +1,126 @@
+from datetime import date
+from api.free_time import find_free_time
+from django.test import TestCase
+from api.importers import ReferenceImporter
+from api.utilities import WriteAPI
+import api.room_occupancy as room_occupancy
+from api.models import (
+    Schedule,
+    EventParticipant,
+    Department,
+    Organization,
+    AbstractDay,
+    TimeSlot,
+    EventPlace,
+    Subject,
+    EventKind
+)
+
+"""py manage.py test api.tests.test_free_time
+"""
+
+class TestFreeTime(TestCase):
+    def setUp(self):
+        FACULTY_REFERENCE_DATA = """
+        [
+            {
+                "faculty_id" : "111",
+                "faculty_fullname" : "Факультет электроники и вычислительной техники",
+                "faculty_code" : "000000111",
+                "faculty_shortname" : "ФЭВТ"
+            }
+        ]
+        """
+        SCHEDULE_REFERENCE_DATA = """
+            [
+                {
+                    "course": "4",
+                    "schedule_template_metadata_faculty_shortname": "ФЭВТ",
+                    "semester": "1",
+                    "years": "2024-2025",
+                    "start_date": "02.09.2024",
+                    "end_date": "29.12.2024",
+                    "scope": "Бакалавриат",
+                    "department_shortname": "ФЭВТ"
+                }
+            ]
+        """
+
+        WriteAPI.create_common_abstract_days()
+        WriteAPI.create_common_time_slots()
+        Organization.objects.create(name="ВолгГТУ")
+        ReferenceImporter.import_faculty_reference(FACULTY_REFERENCE_DATA)
+        ReferenceImporter.import_schedule(SCHEDULE_REFERENCE_DATA, True)
+
+        # bitmaps of previous tests
+        room_occupancy.index.invalidate()
+
+        self.DEPARTMENT = Department.objects.get(shortname="ФЭВТ")
+        self.GROUP = EventParticipant.objects.create(name="ПрИн-466", role=EventParticipant.Role.STUDENT, is_group=True, department=self.DEPARTMENT)
+        self.TEACHER = EventParticipant.objects.create(name="Иванов И.И.", role=EventParticipant.Role.TEACHER)
+        self.BUSY_PLACE = EventPlace.objects.create(building="В", room="902")
+        self.FREE_PLACE = EventPlace.objects.create(building="В", room="903")
+        self.TIME_SLOTS = list(TimeSlot.objects.order_by("start_time", "pk"))
+        self.DATE = date(2024, 9, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            abstract_event = WriteAPI.create_abstract_event(
+                EventKind.objects.get_or_create(name="Лекция")[0],
+                Subject.objects.get_or_create(name="ВКР")[0],
+                [self.GROUP],
+                [self.BUSY_PLACE],
+                AbstractDay.objects.get(day_number=0),
+                self.TIME_SLOTS[1],
+                self.DATE,
+                Schedule.objects.get(status=Schedule.Status.ACTIVE)
+            )
+            WriteAPI.fill_event_table(abstract_event)
+
+    def test_busy_participant_time_excluded(self):
+        free_time = find_free_time([self.GROUP.pk, self.TEACHER.pk], self.DATE, self.DATE)
+
+        self.assertTrue(free_time)
+        self.assertNotIn(self.TIME_SLOTS[1], [candidate.time_slot for candidate in free_time])
+
+        # teacher alone is free at this time, but only in free place
+        free_time = find_free_time([self.TEACHER.pk], self.DATE, self.DATE, [self.TIME_SLOTS[1].pk])
+
+        self.assertListEqual([candidate.place for candidate in free_time], [self.FREE_PLACE])
+
+    def test_ranking(self):
+        # 08.09.2024 is Sunday
+        free_time = find_free_time([self.GROUP.pk], self.DATE, date(2024, 9, 9), near=date(2024, 9, 4), places_per_slot=1)
+
+        self.assertEqual((free_time[0].date, free_time[0].time_slot), (date(2024, 9, 4), self.TIME_SLOTS[0]))
+        self.assertEqual((free_time[1].date, free_time[1].time_slot), (date(2024, 9, 4), self.TIME_SLOTS[1]))
+        self.assertNotIn(date(2024, 9, 8), [candidate.date for candidate in free_time])
+
+        distances = [abs((candidate.date - date(2024, 9, 4)).days) for candidate in free_time]
+
+        self.assertListEqual(distances, sorted(distances))
+        self.assertEqual(len(find_free_time([self.GROUP.pk], self.DATE, date(2024, 9, 9), limit=5)), 5)
+
+    def test_endpoint(self):
+        response = self.client.get("/api/events/free_time/", {
+            "participants" : [self.GROUP.pk, self.TEACHER.pk],
+            "date_from" : self.DATE.isoformat(),
+            "date_to" : self.DATE.isoformat(),
+            "time_slot" : [self.TIME_SLOTS[1].pk, self.TIME_SLOTS[2].pk],
+            "building" : "В"
+        })
+
+        self.assertEqual(response.status_code, 200)
+
+        items = response.json()["items"]
+
+        self.assertTrue(items)
+        self.assertTrue(all(item["time_slot_id"] == self.TIME_SLOTS[2].pk for item in items))
+        self.assertTrue(all(item["date"] == self.DATE.isoformat() for item in items))
+        self.assertSetEqual({item["place"]["room"] for item in items}, {self.BUSY_PLACE.room, self.FREE_PLACE.room})
+
+    def test_bad_request(self):
+        self.assertEqual(self.client.get("/api/events/free_time/", {"date_from" : "2024-09-02", "date_to" : "2024-09-02"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/events/free_time/", {"participants" : self.GROUP.pk, "date_from" : "2024-09-02"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/events/free_time/", {
+            "participants" : self.GROUP.pk, "date_from" : "2024-09-02", "date_to" : "2024-09-02", "limit" : 0
+        }).status_code, 400)
@@ -1,8 +1,19 @@
 from datetime import datetime
+from io import StringIO
+import json
+import math
+import os
+import shutil
+import tempfile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import AutoField
 from django.test import TestCase
 from api.importers import EventImporter, ReferenceImporter
 from api.utilities import WriteAPI, EventImportAPI
 from api.utility_filters import TimeSlotFilter, PlaceFilter
+import api.schedule_occupancy as schedule_occupancy
 from api.models import (
     Schedule,
     ScheduleTemplate,
@@ -917,6 +928,209 @@ class TestEventImporter(TestCase):
 
     """
 
+    def test_import_data_from_file(self):
+        TimeSlot.objects.create(alt_name="11-12", start_time=datetime.strptime("17:00:00", "%H:%M:%S"), end_time=datetime.strptime("18:30:00", "%H:%M:%S"))
+
+        def get_imported():
+            return sorted(AbstractEvent.objects.values_list("subject__name", "abstract_day", "time_slot", "holds_on_date")), \
+                sorted(Event.objects.values_list("subject_override__name", "date", "time_slot_override"))
+
+        with open("testdata/test_import_1.json", "r", encoding="utf8") as data_file:
+            EventImportAPI.import_event_data(data_file.read())
+
+        expected = get_imported()
+        AbstractEvent.objects.all().delete()
+
+        # binary file imported by batches of single entry
+        batch_size = EventImportAPI.IMPORT_BATCH_SIZE
+        EventImportAPI.IMPORT_BATCH_SIZE = 1
+
+        try:
+            with open("testdata/test_import_1.json", "rb") as data_file:
+                EventImportAPI.import_event_data(data_file)
+        finally:
+            EventImportAPI.IMPORT_BATCH_SIZE = batch_size
+
+        self.assertNotEqual(expected[0], [])
+        self.assertEqual(get_imported(), expected)
+
+    def test_import_data_in_bulk(self):
+        TimeSlot.objects.create(alt_name="11-12", start_time=datetime.strptime("17:00:00", "%H:%M:%S"), end_time=datetime.strptime("18:30:00", "%H:%M:%S"))
+
+        with open("testdata/test_import_1.json", "r", encoding="utf8") as data_file:
+            data = data_file.read()
+
+        EventImportAPI.import_event_data(data)
+
+        for ae in AbstractEvent.objects.all():
+            self.assertIsNotNone(ae.changes)
+            self.assertTrue(ae.changes.is_created)
+            self.assertNotEqual(ae.participants.count(), 0)
+            self.assertEqual(
+                set(Event.objects.filter(abstract_event=ae).values_list("participants_override", flat=True)),
+                set(ae.participants.values_list("pk", flat=True))
+            )
+
+        AbstractEvent.objects.all().delete()
+
+        # second entry has unknown TimeSlot
+        data = data.replace('"11.50 - 13:20"', '"15-17"')
+        batch_size = EventImportAPI.IMPORT_BATCH_SIZE
+        EventImportAPI.IMPORT_BATCH_SIZE = 1
+
+        try:
+            with self.assertRaises(TimeSlot.DoesNotExist):
+                EventImportAPI.import_event_data(data)
+        finally:
+            EventImportAPI.IMPORT_BATCH_SIZE = batch_size
+
+        self.assertEqual(AbstractEvent.objects.count(), 0)
+        self.assertEqual(Event.objects.count(), 0)
+
+    def test_reimport_data(self):
+        TimeSlot.objects.create(alt_name="11-12", start_time=datetime.strptime("17:00:00", "%H:%M:%S"), end_time=datetime.strptime("18:30:00", "%H:%M:%S"))
+
+        with open("testdata/test_import_1.json", "r", encoding="utf8") as data_file:
+            data = json.load(data_file)
+
+        self.assertEqual(EventImportAPI.import_event_data(json.dumps(data)), {"created" : 2, "unchanged" : 0, "deleted" : 0})
+
+        abstract_event_pks = set(AbstractEvent.objects.values_list("pk", flat=True))
+        event_pks = set(Event.objects.values_list("pk", flat=True))
+
+        # same data with other formatting
+        data["table"]["grid"][0]["subject"] = " ВКР "
+        self.assertEqual(EventImportAPI.import_event_data(json.dumps(data, indent=4)), {"created" : 0, "unchanged" : 2, "deleted" : 0})
+        self.assertEqual(set(AbstractEvent.objects.values_list("pk", flat=True)), abstract_event_pks)
+        self.assertEqual(set(Event.objects.values_list("pk", flat=True)), event_pks)
+
+        # second entry changed, duplicate of first entry added
+        second_entry_pks = set(AbstractEvent.objects.filter(subject__name="МИКРОПРОЦЕССОРЫ").values_list("pk", flat=True))
+        data["table"]["grid"][1]["places"] = ["В 903"]
+        data["table"]["grid"].append(data["table"]["grid"][0])
+
+        self.assertEqual(
+            EventImportAPI.import_event_data(json.dumps(data)),
+            {"created" : 2, "unchanged" : 1, "deleted" : len(second_entry_pks)}
+        )
+        self.assertTrue(abstract_event_pks - second_entry_pks < set(AbstractEvent.objects.values_list("pk", flat=True)))
+        self.assertEqual(AbstractEvent.objects.filter(subject__name="МИКРОПРОЦЕССОРЫ", places__room="908").count(), 0)
+        self.assertEqual(AbstractEvent.objects.filter(subject__name="ВКР").count(), 2 * (len(abstract_event_pks) - len(second_entry_pks)))
+
+        # changed calendar makes all entries new
+        count = AbstractEvent.objects.count()
+        data["table"]["datetime"]["months"][0] = "март"
+
+        self.assertEqual(EventImportAPI.import_event_data(json.dumps(data)), {"created" : 3, "unchanged" : 0, "deleted" : count})
+        self.assertEqual(AbstractEvent.objects.count(), count)
+        self.assertTrue(set(AbstractEvent.objects.values_list("pk", flat=True)).isdisjoint(abstract_event_pks))
+
+    def test_import_schedules_command(self):
+        TimeSlot.objects.create(alt_name="11-12", start_time=datetime.strptime("17:00:00", "%H:%M:%S"), end_time=datetime.strptime("18:30:00", "%H:%M:%S"))
+
+        with tempfile.TemporaryDirectory() as directory:
+            shutil.copy("testdata/test_import_1.json", os.path.join(directory, "1.json"))
+            # same Schedule
+            shutil.copy("testdata/test_import_1.json", os.path.join(directory, "2.json"))
+
+            with open(os.path.join(directory, "3.json"), "w", encoding="utf8") as data_file:
+                data_file.write('{"title" : "Учебные занятия 1 курса ХТФ на 1 семестр 2030-2031 учебного года", "table" : {"grid" : []}}')
+
+            out = StringIO()
+            call_command("import_schedules", os.path.join(directory, "1.json"), dry_run=True, stdout=out)
+
+            self.assertEqual(json.loads(out.getvalue())[os.path.join(directory, "1.json")]["entries"]["created"], 2)
+            self.assertEqual(AbstractEvent.objects.count(), 0)
+
+            out = StringIO()
+
+            with self.assertRaises(CommandError):
+                call_command("import_schedules", directory, processes=1, stdout=out)
+
+        lines = out.getvalue().splitlines()
+
+        self.assertEqual(len(lines), 3)
+        self.assertIn("новых записей: 2", lines[0])
+        self.assertIn("уже импортируется", lines[1])
+        self.assertIn("ошибка", lines[2])
+        self.assertNotEqual(AbstractEvent.objects.count(), 0)
+
+    def test_plan_event_import(self):
+        with open("testdata/test_import_1.json", "r", encoding="utf8") as data_file:
+            data = json.load(data_file)
+
+        counts = [model.objects.count() for model in (Subject, EventParticipant, EventPlace, TimeSlot, AbstractEvent)]
+        plan = EventImportAPI.plan_event_import(json.dumps(data))
+
+        # nothing is written
+        self.assertEqual([model.objects.count() for model in (Subject, EventParticipant, EventPlace, TimeSlot, AbstractEvent)], counts)
+        self.assertEqual(plan["entries"], {"total" : 2, "created" : 2, "unchanged" : 0})
+        self.assertEqual(plan["missing"]["subjects"], ["ВКР", "МИКРОПРОЦЕССОРЫ"])
+        self.assertIn("В 902а", plan["missing"]["places"])
+        self.assertEqual(plan["errors"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EventImportAPI.import_event_data(json.dumps(data))
+
+        self.assertEqual(plan["abstract_events"]["created"], AbstractEvent.objects.count())
+        self.assertEqual(plan["events"]["created"], Event.objects.count())
+
+        # second entry changed, first one is duplicated for other subject and unknown TimeSlot added
+        data["table"]["grid"][1]["places"] = ["В 903"]
+        data["table"]["grid"].append(dict(data["table"]["grid"][0], subject="ИНФОРМАТИКА"))
+        data["table"]["grid"].append(dict(data["table"]["grid"][0], hours=["15-17"]))
+
+        schedule_occupancy.index.invalidate()
+
+        # read-only queries, their count does not depend on size of file
+        with self.assertNumQueries(19):
+            plan = EventImportAPI.plan_event_import(json.dumps(data))
+
+        self.assertEqual(plan["entries"], {"total" : 4, "created" : 2, "unchanged" : 1})
+        self.assertEqual(plan["abstract_events"]["deleted"], AbstractEvent.objects.filter(subject__name="МИКРОПРОЦЕССОРЫ").count())
+        self.assertEqual(plan["missing"]["subjects"], ["ИНФОРМАТИКА"])
+        self.assertEqual([error["entry"] for error in plan["errors"]], [3])
+        self.assertEqual({conflict["subject"] for conflict in plan["conflicts"]}, {"ИНФОРМАТИКА"})
+        self.assertEqual(
+            {conflict["abstract_event_id"] for conflict in plan["conflicts"]},
+            set(AbstractEvent.objects.filter(subject__name="ВКР").values_list("pk", flat=True))
+        )
+
+    def test_parse_data_without_queries(self):
+        # TimeSlot without alt_name at same start time as "1-2"
+        TimeSlot.objects.create(start_time=datetime.strptime("08:30:00", "%H:%M:%S"))
+
+        with open("testdata/test_import_1.json", "r", encoding="utf8") as data_file:
+            data = json.load(data_file)
+
+        entries = data["table"]["grid"]
+        reference_data = EventImportAPI._collect_reference_data(entries)
+        EventImportAPI._ensure_reference_data(reference_data)
+        reference_lookup = EventImportAPI._build_reference_lookup(reference_data)
+        calendar = EventImportAPI.make_calendar(
+            data["table"]["datetime"]["weeks"],
+            data["table"]["datetime"]["months"],
+            EventImportAPI.find_schedule(data["title"])
+        )
+
+        parsed = []
+
+        with self.assertNumQueries(0):
+            for entry in entries:
+                parsed.append(EventImportAPI.parse_data(entry, calendar, data["table"]["datetime"]["week_days"], reference_lookup))
+
+        # "11-12", "8.30", "10.10"
+        _, _, _, _, abstract_day, time_slots, _, _ = parsed[0]
+
+        self.assertEqual(abstract_day, AbstractDay.objects.get(day_number=0))
+        self.assertEqual([time_slot.alt_name for time_slot in time_slots], ["11-12", "1-2", "3-4"])
+
+        # "11.50 - 13:20" on tuesday of second week
+        _, _, _, _, abstract_day, time_slots, _, _ = parsed[1]
+
+        self.assertEqual(abstract_day, AbstractDay.objects.get(day_number=8))
+        self.assertEqual([time_slot.alt_name for time_slot in time_slots], ["5-6"])
+
 
 class TestReferenceImporter(TestCase):
     def test_place_import_reference(self):
@@ -1461,6 +1675,41 @@ class TestReferenceImporter(TestCase):
         except EventParticipant.DoesNotExist:
             self.fail()
 
+    def test_bundled_reference_import_queries(self):
+        Organization.objects.create(name="ВолгГТУ")
+
+        def read(file_name : str) -> str:
+            with open(f"testdata/{file_name}", "r", encoding="utf8") as data_file:
+                return data_file.read()
+
+        ReferenceImporter.import_faculty_reference(read("vstu-faculties.json"))
+        ReferenceImporter.import_department_reference(read("vstu-departments.json"))
+
+        groups = read("vstu-groups.json")
+        group_names = {entry["group_name"] for entry in json.loads(groups)}
+
+        # batch size of bulk_create is limited by query parameters of backend
+        fields = [f for f in EventParticipant._meta.concrete_fields if not isinstance(f, AutoField)]
+        batch_size = min(WriteAPI.BULK_BATCH_SIZE, connection.ops.bulk_batch_size(fields, list(group_names)))
+
+        # Departments, existing groups and inserts of 1072 groups by batches
+        with self.assertNumQueries(2 + math.ceil(len(group_names) / batch_size)):
+            ReferenceImporter.import_student_reference(groups)
+
+        with self.assertNumQueries(2):
+            ReferenceImporter.import_student_reference(groups)
+
+        self.assertEqual(EventParticipant.objects.filter(is_group=True).count(), len(group_names))
+        self.assertEqual(EventParticipant.objects.filter(is_group=True, department=None).count(), 0)
+
+        disciplines = read("vstu-disciplines.json")
+        ReferenceImporter.import_subject_reference(disciplines)
+
+        with self.assertNumQueries(1):
+            ReferenceImporter.import_subject_reference(disciplines)
+
+        self.assertEqual(Subject.objects.count(), len({entry["discipline_name"] for entry in json.loads(disciplines)}))
+
     def test_schedule_import_saving_archive(self):
         FACULTY_REFERENCE_DATA = """
             [
@@ -0,0 +1,159 @@
+from datetime import timedelta
+from io import StringIO
+import os
+import shutil
+import tempfile
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from api.importers import ReferenceImporter
+from api.utilities import WriteAPI
+import api.import_jobs as import_jobs
+from api.models import AbstractEvent, ImportJob, Organization, Subject
+from api.tests import test_import
+
+"""py manage.py test api.tests.test_import_jobs
+"""
+
+class TestImportJobs(TestCase):
+    # progress is written in own connection if it is configured
+    databases = "__all__"
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        WriteAPI.create_common_abstract_days()
+        WriteAPI.create_common_time_slots()
+        Organization.objects.create(name="ВолгГТУ")
+        ReferenceImporter.import_faculty_reference(test_import.TestEventImporter.FACULTY_REFERENCE_DATA)
+        ReferenceImporter.import_schedule(test_import.TestEventImporter.SCHEDULE_REFERENCE_DATA, True)
+
+        with open("testdata/test_import_1.json", "rb") as data_file:
+            self.event_data = data_file.read()
+
+    def test_worker_imports_queued_jobs(self):
+        events_job = import_jobs.enqueue(ImportJob.Kind.EVENTS, self.event_data)
+        failed_job = import_jobs.enqueue(ImportJob.Kind.EVENTS, b'{"title" : ')
+        subjects_job = import_jobs.enqueue(ImportJob.Kind.SUBJECTS, '[{"discipline_name" : "Физика"}]'.encode("utf-8"))
+
+        # nothing is imported until worker runs
+        self.assertEqual(AbstractEvent.objects.count(), 0)
+        self.assertEqual(events_job.status, ImportJob.Status.QUEUED)
+
+        out = StringIO()
+
+        with self.assertLogs("api.import_jobs", "ERROR"):
+            call_command("import_worker", once=True, batch_size=2, stdout=out)
+
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+        events_job.refresh_from_db()
+        self.assertEqual(events_job.status, ImportJob.Status.DONE)
+        self.assertEqual(events_job.result, {"created" : 2, "unchanged" : 0, "deleted" : 0})
+        self.assertEqual((events_job.processed, events_job.total), (2, 2))
+        self.assertEqual(list(events_job.stages), ["read", "reference_data", "entries"])
+        self.assertIsNotNone(events_job.finished_at)
+        self.assertNotEqual(AbstractEvent.objects.count(), 0)
+
+        failed_job.refresh_from_db()
+        self.assertEqual(failed_job.status, ImportJob.Status.FAILED)
+        self.assertTrue(failed_job.error)
+
+        subjects_job.refresh_from_db()
+        self.assertEqual(subjects_job.status, ImportJob.Status.DONE)
+        self.assertEqual(list(subjects_job.stages), ["import"])
+        self.assertTrue(Subject.objects.filter(name="Физика").exists())
+
+        # files of finished jobs are deleted
+        self.assertFalse(events_job.file)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "import_jobs")), [])
+
+    def test_claim_jobs(self):
+        first_job = import_jobs.enqueue(ImportJob.Kind.EVENTS, self.event_data)
+        second_job = import_jobs.enqueue(ImportJob.Kind.EVENTS, self.event_data)
+
+        self.assertEqual(import_jobs.claim_jobs(1), [first_job])
+        self.assertEqual(ImportJob.objects.get(pk=first_job.pk).status, ImportJob.Status.RUNNING)
+        self.assertEqual(ImportJob.objects.get(pk=second_job.pk).status, ImportJob.Status.QUEUED)
+        self.assertEqual(import_jobs.claim_jobs(2), [second_job])
+        self.assertEqual(import_jobs.claim_jobs(2), [])
+
+    def test_stale_jobs_failed(self):
+        stale_job = import_jobs.enqueue(ImportJob.Kind.EVENTS, self.event_data)
+        running_job = import_jobs.enqueue(ImportJob.Kind.EVENTS, self.event_data)
+
+        import_jobs.claim_jobs(2)
+        # worker of job was killed long ago
+        ImportJob.objects.filter(pk=stale_job.pk).update(datemodified=timezone.now() - timedelta(seconds=settings.IMPORT_JOB_TIMEOUT + 1))
+
+        with self.assertLogs("api.import_jobs", "WARNING"):
+            self.assertEqual(import_jobs.claim_jobs(1), [])
+
+        stale_job.refresh_from_db()
+        self.assertEqual(stale_job.status, ImportJob.Status.FAILED)
+        self.assertTrue(stale_job.error)
+        self.assertFalse(stale_job.file)
+        self.assertEqual(ImportJob.objects.get(pk=running_job.pk).status, ImportJob.Status.RUNNING)
+
+    def test_api_enqueues_and_shows_job(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+
+        with open("testdata/test_import_1.json", "rb") as data_file:
+            response = self.client.post("/api/import/jobs/", {"kind" : ImportJob.Kind.EVENTS, "file" : data_file})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AbstractEvent.objects.count(), 0)
+
+        job_id = response.json()["items"][0]["id"]
+        call_command("import_worker", once=True, stdout=StringIO())
+
+        response = self.client.get(f"/api/import/jobs/{job_id}/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["items"][0]["status"], ImportJob.Status.DONE)
+        self.assertEqual(response.json()["items"][0]["processed"], 2)
+
+        response = self.client.post("/api/import/json/", b'{"subjects" : []}', content_type="application/json")
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(ImportJob.objects.get(pk=response.json()["items"][0]["job_id"]).kind, ImportJob.Kind.JSON)
+
+    def test_import_preview_files_deleted(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+        previews_dir = os.path.join(self.media_root, import_jobs.PREVIEW_DIR)
+
+        def preview():
+            with open("testdata/test_import_1.json", "rb") as data_file:
+                response = self.client.post("/admin/api/abstractevent/preview_import_data/", {"selected_file" : data_file})
+
+            self.assertEqual(response.status_code, 200)
+
+            return os.listdir(previews_dir)
+
+        self.assertEqual(len(preview()), 1)
+        # previous preview of session is replaced
+        self.assertEqual(len(preview()), 1)
+
+        self.client.post("/admin/api/abstractevent/cancel_import_preview/")
+
+        self.assertEqual(os.listdir(previews_dir), [])
+
+        preview()
+        self.client.post("/admin/api/abstractevent/import_data/")
+
+        self.assertEqual(os.listdir(previews_dir), [])
+        self.assertEqual(ImportJob.objects.filter(status=ImportJob.Status.QUEUED).count(), 1)
+
+        # preview left without confirming is deleted after timeout
+        preview()
+
+        with override_settings(IMPORT_PREVIEW_TIMEOUT=-1):
+            self.assertEqual(import_jobs.delete_stale_previews(), 1)
+
+        self.assertEqual(os.listdir(previews_dir), [])
@@ -0,0 +1,81 @@
+import os
+import pstats
+import tempfile
+from django.test import TestCase
+from api.importers import ReferenceImporter
+from api.utilities import WriteAPI, EventImportAPI
+import api.instrumentation as instrumentation
+from api.models import AbstractEvent, Event, Organization
+from api.tests import test_import
+
+"""py manage.py test api.tests.test_instrumentation
+"""
+
+class TestInstrumentation(TestCase):
+    def setUp(self):
+        WriteAPI.create_common_abstract_days()
+        WriteAPI.create_common_time_slots()
+        Organization.objects.create(name="ВолгГТУ")
+        ReferenceImporter.import_faculty_reference(test_import.TestEventImporter.FACULTY_REFERENCE_DATA)
+        ReferenceImporter.import_schedule(test_import.TestEventImporter.SCHEDULE_REFERENCE_DATA, True)
+
+    def test_import_stages(self):
+        with open("testdata/test_import_1.json", "rb") as data_file:
+            with self.assertLogs("api.instrumentation", "INFO"), instrumentation.profiling() as profiler:
+                EventImportAPI.import_event_data(data_file)
+
+        report = profiler.report()
+        stages = {stage["name"] : stage for stage in report["stages"]}
+
+        self.assertEqual(list(stages)[:6], [
+            "collect_reference_data",
+            "find_schedule",
+            "make_calendar",
+            "ensure_reference_data",
+            "build_reference_lookup",
+            "load_fingerprints"
+        ])
+        self.assertEqual(stages["parse_data"]["queries"], 0)
+        # empty batch ends reading
+        self.assertEqual(stages["read_entries"]["calls"], 2)
+        self.assertGreater(stages["ensure_reference_data"]["rows_written"], 0)
+        # nested stages are included in outer one
+        self.assertGreaterEqual(stages["create_abstract_events"]["rows_written"], AbstractEvent.objects.count() + Event.objects.count())
+        self.assertGreaterEqual(stages["create_abstract_events"]["queries"], stages["create_events"]["queries"] + stages["create_changes"]["queries"])
+        self.assertGreaterEqual(report["queries"], stages["create_abstract_events"]["queries"] + stages["find_schedule"]["queries"])
+        self.assertTrue(all(stage["peak_memory"] is not None for stage in stages.values()))
+
+    def test_nested_stage_memory(self):
+        with self.assertLogs("api.instrumentation", "INFO"), instrumentation.profiling() as profiler:
+            with instrumentation.stage("outer"):
+                with instrumentation.stage("inner"):
+                    data = [str(i) for i in range(10 ** 5)]
+
+                del data
+
+        stages = {stage["name"] : stage for stage in profiler.report()["stages"]}
+
+        self.assertGreater(stages["inner"]["peak_memory"], 10 ** 6)
+        self.assertGreaterEqual(stages["outer"]["peak_memory"], stages["inner"]["peak_memory"])
+
+    def test_profile_dumps(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            with self.assertLogs("api.instrumentation", "INFO"), \
+                instrumentation.profiling(trace_memory=False, profile_dir=profile_dir) as profiler:
+                with instrumentation.stage("outer"):
+                    with instrumentation.stage("inner"):
+                        sorted(range(1000), reverse=True)
+
+            self.assertEqual(sorted(os.listdir(profile_dir)), ["inner.prof", "outer.prof"])
+            self.assertIn(
+                ("~", 0, "<built-in method builtins.sorted>"),
+                pstats.Stats(os.path.join(profile_dir, "inner.prof")).stats
+            )
+            self.assertEqual(profiler.report()["stages"][0]["profile"], os.path.join(profile_dir, "outer.prof"))
+
+    def test_stage_without_profiling(self):
+        with self.assertNumQueries(1):
+            with instrumentation.stage("subjects"):
+                list(AbstractEvent.objects.all())
+
+        self.assertIsNone(instrumentation.get_profiler())
@@ -0,0 +1,60 @@
+import io
+import json
+from django.test import TestCase
+from api.json_stream import JSONStream
+
+"""py manage.py test api.tests.test_json_stream
+"""
+
+class TestJSONStream(TestCase):
+    DOCUMENT = {
+        "title" : "Расписание \"ФЭВТ\" \\ 1 курс",
+        "skipped" : {"nested" : [1, {"a" : "]}"}, [2.5e3, None, True]], "b" : False},
+        "table" : {
+            "grid" : [
+                {"subject" : "Математика", "hours" : ["1-2"], "number" : 123456789},
+                {"subject" : "Физика", "places" : []},
+                12345,
+                "строка"
+            ],
+            "datetime" : {"weeks" : [], "months" : ["январь"]},
+            "empty" : []
+        },
+        "tail" : -1.5
+    }
+
+    def walk(self, document : str, chunk_size : int, binary : bool = False):
+        file = io.BytesIO(document.encode("utf-8")) if binary else io.StringIO(document)
+
+        return list(JSONStream(file, chunk_size).walk(
+            values=[("title",), ("table", "datetime"), ("tail",)],
+            arrays=[("table", "grid")]
+        ))
+
+    def test_walk(self):
+        expected = [
+            (("title",), self.DOCUMENT["title"]),
+            *((("table", "grid"), item) for item in self.DOCUMENT["table"]["grid"]),
+            (("table", "datetime"), self.DOCUMENT["table"]["datetime"]),
+            (("tail",), -1.5)
+        ]
+
+        for indent in (None, 4):
+            document = json.dumps(self.DOCUMENT, ensure_ascii=False, indent=indent)
+
+            # values cut by chunk ends at every position
+            for chunk_size in (1, 2, 3, 7, 64, 10 ** 6):
+                self.assertEqual(self.walk(document, chunk_size), expected)
+                self.assertEqual(self.walk(document, chunk_size, binary=True), expected)
+
+    def test_missing_paths(self):
+        document = json.dumps({"title" : "x", "table" : []})
+
+        self.assertEqual(self.walk(document, 4), [(("title",), "x")])
+
+    def test_invalid_document(self):
+        with self.assertRaises(ValueError):
+            self.walk('{"title" : "x", "table" : {"grid" : [1, 2', 4)
+
+        with self.assertRaises(ValueError):
+            self.walk('{"table" : {"grid" : [1 2]}}', 4)
@@ -0,0 +1,136 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from api.importers import ReferenceImporter
+from api.utilities import WriteAPI
+import api.conflicts as conflicts
+import api.placement as placement
+from api.models import (
+    Schedule,
+    EventParticipant,
+    Department,
+    Organization,
+    AbstractDay,
+    TimeSlot,
+    AbstractEvent,
+    Event,
+    EventPlace,
+    Subject,
+    EventKind
+)
+
+"""py manage.py test api.tests.test_placement
+"""
+
+class TestPlacement(TestCase):
+    def setUp(self):
+        FACULTY_REFERENCE_DATA = """
+        [
+            {
+                "faculty_id" : "111",
+                "faculty_fullname" : "Факультет электроники и вычислительной техники",
+                "faculty_code" : "000000111",
+                "faculty_shortname" : "ФЭВТ"
+            }
+        ]
+        """
+        SCHEDULE_REFERENCE_DATA = """
+            [
+                {
+                    "course": "4",
+                    "schedule_template_metadata_faculty_shortname": "ФЭВТ",
+                    "semester": "1",
+                    "years": "2024-2025",
+                    "start_date": "02.09.2024",
+                    "end_date": "29.12.2024",
+                    "scope": "Бакалавриат",
+                    "department_shortname": "ФЭВТ"
+                }
+            ]
+        """
+
+        WriteAPI.create_common_abstract_days()
+        WriteAPI.create_common_time_slots()
+        Organization.objects.create(name="ВолгГТУ")
+        ReferenceImporter.import_faculty_reference(FACULTY_REFERENCE_DATA)
+        ReferenceImporter.import_schedule(SCHEDULE_REFERENCE_DATA, True)
+
+        department = Department.objects.get(shortname="ФЭВТ")
+        self.GROUPS = [
+            EventParticipant.objects.create(name=f"ПрИн-46{i}", role=EventParticipant.Role.STUDENT, is_group=True, department=department)
+            for i in range(2)
+        ]
+        self.TEACHER = EventParticipant.objects.create(name="Преподаватель", role=EventParticipant.Role.TEACHER, department=department)
+        self.PLACES = [EventPlace.objects.create(building="В", room=str(900 + i)) for i in range(2)]
+        self.SCHEDULE = Schedule.objects.get(status=Schedule.Status.ACTIVE)
+        self.MONDAY = AbstractDay.objects.get(day_number=0)
+        self.TIME_SLOTS = list(TimeSlot.objects.order_by("start_time", "pk"))
+
+        kind = EventKind.objects.get_or_create(name="Лекция")[0]
+        subject = Subject.objects.get_or_create(name="ВКР")[0]
+
+        def create(participants, places):
+            return WriteAPI.create_abstract_event(kind, subject, participants, places, self.MONDAY, self.TIME_SLOTS[1], None, self.SCHEDULE)
+
+        self.create = create
+        self.FIXED = create([self.GROUPS[0], self.TEACHER], [self.PLACES[0]])
+
+    def test_placement_has_no_conflicts(self):
+        movable = [
+            self.create([self.GROUPS[0]], []),
+            self.create([self.GROUPS[1], self.TEACHER], []),
+            self.create([self.GROUPS[1]], [self.PLACES[0]])
+        ]
+
+        solution = placement.place_abstract_events(AbstractEvent.objects.filter(pk__in=[ae.pk for ae in movable]))
+
+        self.assertListEqual(solution.unplaced, [])
+        self.assertListEqual(conflicts.find_conflicts(AbstractEvent.objects.all()), [])
+
+        for ae in AbstractEvent.objects.filter(pk__in=[ae.pk for ae in movable]).select_related("abstract_day"):
+            self.assertEqual(ae.places.count(), 1)
+            self.assertLess(ae.abstract_day.day_number, self.SCHEDULE.schedule_template.repetition_period)
+            self.assertNotEqual(ae.abstract_day.day_number % 7, 6)
+
+        self.assertEqual(AbstractEvent.objects.get(pk=movable[2].pk).places.get(), self.PLACES[0])
+
+    def test_preferences(self):
+        ae = self.create([self.GROUPS[0]], [])
+
+        placement.place_abstract_events([ae])
+        ae = AbstractEvent.objects.get(pk=ae.pk)
+
+        # monday has lesson of same subject
+        self.assertEqual((ae.abstract_day.day_number, ae.time_slot), (1, self.TIME_SLOTS[0]))
+
+        solution = placement.solve(placement.build_problem([ae], placement.Preferences(same_subject_day=0)))
+
+        self.assertEqual(solution.assignments[ae.pk][:2], (self.MONDAY.pk, self.TIME_SLOTS[0].pk))
+
+    def test_unplaced(self):
+        ae = self.create([self.GROUPS[1]], [])
+        problem = placement.build_problem([ae], building="Нет такого корпуса")
+
+        self.assertListEqual(placement.solve(problem, restarts=3).unplaced, [ae.pk])
+
+    def test_write_back(self):
+        ae = self.create([self.GROUPS[0]], [])
+        WriteAPI.fill_event_table(ae)
+
+        placement.place_abstract_events([ae])
+        ae = AbstractEvent.objects.select_related("changes").get(pk=ae.pk)
+        events = Event.objects.filter(abstract_event=ae)
+
+        self.assertTrue(events.exists())
+        self.assertFalse(events.exclude(time_slot_override=ae.time_slot).exists())
+        self.assertFalse(events.exclude(places_override=self.PLACES[0]).exists())
+        self.assertEqual(ae.changes.final_date_time, str(ae.abstract_day) + " / " + ae.time_slot.alt_name + "ч.")
+
+    def test_command(self):
+        ae = self.create([self.GROUPS[1]], [])
+        out = StringIO()
+
+        call_command("place_abstract_events", schedule=self.SCHEDULE.pk, dry_run=True, stdout=out)
+
+        self.assertIn("не размещено: 0", out.getvalue())
+        self.assertEqual(AbstractEvent.objects.get(pk=ae.pk).time_slot, self.TIME_SLOTS[1])
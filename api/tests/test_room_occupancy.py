@@ -0,0 +1,149 @@
+from datetime import date
+from django.test import TestCase
+from api.importers import ReferenceImporter
+from api.utilities import WriteAPI
+import api.room_occupancy as room_occupancy
+from api.models import (
+    Schedule,
+    EventParticipant,
+    Department,
+    Organization,
+    AbstractDay,
+    TimeSlot,
+    Event,
+    EventPlace,
+    Subject,
+    EventKind,
+    EventCancel
+)
+
+"""py manage.py test api.tests.test_room_occupancy
+"""
+
+class TestRoomOccupancy(TestCase):
+    def setUp(self):
+        FACULTY_REFERENCE_DATA = """
+        [
+            {
+                "faculty_id" : "111",
+                "faculty_fullname" : "Факультет электроники и вычислительной техники",
+                "faculty_code" : "000000111",
+                "faculty_shortname" : "ФЭВТ"
+            }
+        ]
+        """
+        SCHEDULE_REFERENCE_DATA = """
+            [
+                {
+                    "course": "4",
+                    "schedule_template_metadata_faculty_shortname": "ФЭВТ",
+                    "semester": "1",
+                    "years": "2024-2025",
+                    "start_date": "02.09.2024",
+                    "end_date": "29.12.2024",
+                    "scope": "Бакалавриат",
+                    "department_shortname": "ФЭВТ"
+                }
+            ]
+        """
+
+        WriteAPI.create_common_abstract_days()
+        WriteAPI.create_common_time_slots()
+        Organization.objects.create(name="ВолгГТУ")
+        ReferenceImporter.import_faculty_reference(FACULTY_REFERENCE_DATA)
+        ReferenceImporter.import_schedule(SCHEDULE_REFERENCE_DATA, True)
+
+        # bitmaps of previous tests
+        room_occupancy.index.invalidate()
+
+        self.DEPARTMENT = Department.objects.get(shortname="ФЭВТ")
+        group = EventParticipant.objects.create(name="ПрИн-466", role=EventParticipant.Role.STUDENT, is_group=True, department=self.DEPARTMENT)
+        self.BUSY_PLACE = EventPlace.objects.create(building="В", room="902")
+        self.FREE_PLACE = EventPlace.objects.create(building="В", room="903")
+        self.OTHER_BUILDING_PLACE = EventPlace.objects.create(building="А", room="101")
+        self.TIME_SLOTS = list(TimeSlot.objects.order_by("start_time", "pk"))
+        self.DATE = date(2024, 9, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            abstract_event = WriteAPI.create_abstract_event(
+                EventKind.objects.get_or_create(name="Лекция")[0],
+                Subject.objects.get_or_create(name="ВКР")[0],
+                [group],
+                [self.BUSY_PLACE],
+                AbstractDay.objects.get(day_number=0),
+                self.TIME_SLOTS[1],
+                self.DATE,
+                Schedule.objects.get(status=Schedule.Status.ACTIVE)
+            )
+            WriteAPI.fill_event_table(abstract_event)
+
+    def get_free(self, **params):
+        response = self.client.get("/api/lessonrooms/free/", {"date" : self.DATE.isoformat(), **params})
+
+        self.assertEqual(response.status_code, 200)
+
+        return {item["room"] : item["free_time_slots"] for item in response.json()["items"]}
+
+    def test_free_rooms(self):
+        free = self.get_free(time_slot=self.TIME_SLOTS[1].pk, building="В")
+
+        self.assertSetEqual(set(free), {self.FREE_PLACE.room})
+
+        free = self.get_free()
+
+        self.assertSetEqual(set(free), {self.BUSY_PLACE.room, self.FREE_PLACE.room, self.OTHER_BUILDING_PLACE.room})
+        self.assertNotIn(self.TIME_SLOTS[1].pk, free[self.BUSY_PLACE.room][self.DATE.isoformat()])
+        self.assertEqual(len(free[self.FREE_PLACE.room][self.DATE.isoformat()]), len(self.TIME_SLOTS))
+
+    def test_min_window(self):
+        # only first time slot is free before busy one
+        self.assertIn(self.BUSY_PLACE.room, self.get_free(min_window=len(self.TIME_SLOTS) - 2))
+        self.assertNotIn(self.BUSY_PLACE.room, self.get_free(min_window=len(self.TIME_SLOTS) - 1))
+
+        self.assertTrue(room_occupancy.has_window(0b01110, 3))
+        self.assertFalse(room_occupancy.has_window(0b01101, 3))
+
+    def test_bitmaps_are_cached_and_updated_on_writes(self):
+        self.get_free()
+
+        with self.assertNumQueries(1):
+            room_occupancy.index.find_free_rooms([self.DATE], [self.TIME_SLOTS[1].pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EventCancel.objects.create(date=self.DATE, department=self.DEPARTMENT)
+
+        self.assertIn(self.BUSY_PLACE.room, self.get_free(time_slot=self.TIME_SLOTS[1].pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            event = Event.objects.get()
+            event.is_event_canceled = False
+            event.event_cancel = None
+            event.save()
+
+            event.places_override.set([self.FREE_PLACE])
+
+        free = self.get_free(time_slot=self.TIME_SLOTS[1].pk)
+
+        self.assertIn(self.BUSY_PLACE.room, free)
+        self.assertNotIn(self.FREE_PLACE.room, free)
+
+    def test_time_slot_created_by_other_process(self):
+        room_occupancy.index.get_time_slots()
+
+        # changes are not seen by index, as if they were made by other process
+        time_slot = TimeSlot.objects.create(start_time="21:00", end_time="22:30")
+        Event.objects.update(time_slot_override=time_slot)
+
+        free = self.get_free()
+
+        self.assertNotIn(time_slot.pk, free[self.BUSY_PLACE.room][self.DATE.isoformat()])
+        self.assertIn(self.TIME_SLOTS[1].pk, free[self.BUSY_PLACE.room][self.DATE.isoformat()])
+
+        free = self.get_free(time_slot=time_slot.pk)
+
+        self.assertNotIn(self.BUSY_PLACE.room, free)
+        self.assertIn(time_slot.pk, free[self.FREE_PLACE.room][self.DATE.isoformat()])
+
+    def test_bad_request(self):
+        self.assertEqual(self.client.get("/api/lessonrooms/free/").status_code, 400)
+        self.assertEqual(self.client.get("/api/lessonrooms/free/", {"date" : "2024-09-02", "time_slot" : 0}).status_code, 400)
@@ -0,0 +1,216 @@
+from datetime import date
+from django.db import transaction
+from django.test import TestCase
+from api.importers import ReferenceImporter
+from api.utilities import Utilities, WriteAPI
+import api.schedule_occupancy as schedule_occupancy
+from api.models import (
+    Schedule,
+    EventParticipant,
+    Department,
+    Organization,
+    AbstractDay,
+    TimeSlot,
+    EventPlace,
+    Subject,
+    EventKind
+)
+
+"""py manage.py test api.tests.test_schedule_occupancy
+"""
+
+class TestScheduleOccupancy(TestCase):
+    def setUp(self):
+        FACULTY_REFERENCE_DATA = """
+        [
+            {
+                "faculty_id" : "111",
+                "faculty_fullname" : "Факультет электроники и вычислительной техники",
+                "faculty_code" : "000000111",
+                "faculty_shortname" : "ФЭВТ"
+            }
+        ]
+        """
+        SCHEDULE_REFERENCE_DATA = """
+            [
+                {
+                    "course": "4",
+                    "schedule_template_metadata_faculty_shortname": "ФЭВТ",
+                    "semester": "1",
+                    "years": "2024-2025",
+                    "start_date": "02.09.2024",
+                    "end_date": "29.12.2024",
+                    "scope": "Бакалавриат",
+                    "department_shortname": "ФЭВТ"
+                }
+            ]
+        """
+
+        WriteAPI.create_common_abstract_days()
+        WriteAPI.create_common_time_slots()
+        Organization.objects.create(name="ВолгГТУ")
+        ReferenceImporter.import_faculty_reference(FACULTY_REFERENCE_DATA)
+
+        # index is changed on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            ReferenceImporter.import_schedule(SCHEDULE_REFERENCE_DATA, True)
+
+        department = Department.objects.get(shortname="ФЭВТ")
+        self.GROUPS = [
+            EventParticipant.objects.create(name=f"ПрИн-46{i}", role=EventParticipant.Role.STUDENT, is_group=True, department=department)
+            for i in range(2)
+        ]
+        self.TEACHER = EventParticipant.objects.create(name="Преподаватель", role=EventParticipant.Role.TEACHER, department=department)
+        self.PLACES = [EventPlace.objects.create(building="В", room=str(900 + i)) for i in range(2)]
+        self.SCHEDULE = Schedule.objects.get(status=Schedule.Status.ACTIVE)
+        self.MONDAY = AbstractDay.objects.get(day_number=0)
+        self.FIRST_SLOT = TimeSlot.objects.get(alt_name="1-2")
+        self.SECOND_SLOT = TimeSlot.objects.get(alt_name="3-4")
+
+        kind = EventKind.objects.get_or_create(name="Лекция")[0]
+        subject = Subject.objects.get_or_create(name="ВКР")[0]
+
+        def create(participants, places, time_slot=self.FIRST_SLOT, schedule=self.SCHEDULE):
+            with self.captureOnCommitCallbacks(execute=True):
+                return WriteAPI.create_abstract_event(kind, subject, participants, places, self.MONDAY, time_slot, None, schedule)
+
+        self.create = create
+        self.ABSTRACT_EVENT = create([self.GROUPS[0], self.TEACHER], [self.PLACES[0]])
+
+    def test_warning_on_create(self):
+        with self.assertLogs("api.utilities", "WARNING") as logs:
+            self.create([self.GROUPS[1], self.TEACHER], [self.PLACES[1]])
+
+        self.assertIn(self.TEACHER.name, logs.output[0])
+
+        with self.assertNoLogs("api.utilities", "WARNING"):
+            self.create([self.GROUPS[1]], [self.PLACES[1]], self.SECOND_SLOT)
+
+    def test_check_queries(self):
+        other = self.create([self.GROUPS[1]], [self.PLACES[1]])
+
+        # index is loaded by first check out of transaction changing it
+        with self.assertNumQueries(4):
+            self.assertFalse(Utilities.check_abstract_event(other, self.GROUPS[1:], self.PLACES[1:])[0])
+
+        with self.assertNumQueries(0):
+            self.assertFalse(Utilities.check_abstract_event(other, self.GROUPS[1:], self.PLACES[1:])[0])
+
+        with self.assertNumQueries(1):
+            self.assertFalse(Utilities.check_abstract_event(other)[0])
+
+        schedule_occupancy.index.invalidate()
+
+        is_double_usage_found, message = Utilities.check_abstract_event(other, [self.GROUPS[1]], self.PLACES)
+
+        self.assertTrue(is_double_usage_found)
+        self.assertIn(str(self.PLACES[0]), message)
+        self.assertIn(self.ABSTRACT_EVENT.get_absolute_url(), message)
+
+    def test_index_follows_changes(self):
+        other = self.create([self.GROUPS[1]], [self.PLACES[1]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.participants.add(self.TEACHER)
+
+        self.assertTrue(Utilities.check_abstract_event(other)[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ABSTRACT_EVENT.participants.remove(self.TEACHER)
+
+        self.assertFalse(Utilities.check_abstract_event(other)[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ABSTRACT_EVENT.participants.add(self.TEACHER)
+            self.ABSTRACT_EVENT.time_slot = self.SECOND_SLOT
+            self.ABSTRACT_EVENT.save()
+
+        self.assertFalse(Utilities.check_abstract_event(other)[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.time_slot = self.SECOND_SLOT
+            other.save()
+
+        self.assertTrue(Utilities.check_abstract_event(other)[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ABSTRACT_EVENT.delete()
+
+        self.assertFalse(Utilities.check_abstract_event(other)[0])
+
+    def test_rolled_back_changes_not_indexed(self):
+        other = self.create([self.GROUPS[1]], [self.PLACES[1]])
+
+        self.assertFalse(Utilities.check_abstract_event(other)[0])
+
+        loaded_at = schedule_occupancy.index.loaded_at
+
+        with transaction.atomic():
+            other.participants.add(self.TEACHER)
+            self.ABSTRACT_EVENT.delete()
+
+            # not committed changes are seen by own transaction
+            self.assertFalse(Utilities.check_abstract_event(other, [self.TEACHER], [])[0])
+
+            transaction.set_rollback(True)
+
+        self.assertEqual(schedule_occupancy.index.loaded_at, loaded_at)
+        self.assertFalse(Utilities.check_abstract_event(self.ABSTRACT_EVENT)[0])
+        self.assertTrue(Utilities.check_abstract_event(other, [self.TEACHER], [])[0])
+
+    def test_schedule_window(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.SCHEDULE.start_date = date(2025, 2, 3)
+            self.SCHEDULE.end_date = date(2025, 6, 29)
+            self.SCHEDULE.save()
+
+        self.assertIsNone(schedule_occupancy.index.loaded_at)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other_schedule = Schedule.objects.get(pk=self.SCHEDULE.pk)
+            other_schedule.pk = None
+            other_schedule.start_date = date(2024, 9, 2)
+            other_schedule.end_date = date(2024, 12, 29)
+            other_schedule.save()
+
+        other = self.create([self.TEACHER], [self.PLACES[0]], schedule=other_schedule)
+
+        self.assertFalse(Utilities.check_abstract_event(other)[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other_schedule.end_date = date(2025, 2, 10)
+            other_schedule.save()
+
+        self.assertTrue(Utilities.check_abstract_event(other)[0])
+
+    def test_check_after_save_queries(self):
+        other = self.create([self.GROUPS[1]], [self.PLACES[1]], self.SECOND_SLOT)
+
+        self.assertFalse(Utilities.check_abstract_event(other)[0])
+
+        with transaction.atomic():
+            other.time_slot = self.FIRST_SLOT
+            other.save()
+
+            # not committed changes are applied on top of index of process
+            with self.assertNumQueries(1):
+                self.assertFalse(Utilities.check_abstract_event(other)[0])
+
+            other.participants.add(self.TEACHER)
+
+            with self.assertNumQueries(1):
+                self.assertEqual(
+                    schedule_occupancy.find(other),
+                    [(schedule_occupancy.PARTICIPANT, self.TEACHER.pk, self.ABSTRACT_EVENT.pk)]
+                )
+
+            # changes of rolled back savepoint are dropped
+            with transaction.atomic():
+                other.participants.remove(self.TEACHER)
+                transaction.set_rollback(True)
+
+            self.assertTrue(Utilities.check_abstract_event(other)[0])
+
+            transaction.set_rollback(True)
+
+        self.assertIsNotNone(schedule_occupancy.index.loaded_at)
@@ -0,0 +1,179 @@
+from datetime import date
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from api.importers import ReferenceImporter
+from visualization.logic import get_table_data
+from api.utilities import ReadAPI, WriteAPI
+from api.utility_filters import DateFilter, ParticipantFilter
+from api.models import (
+    Schedule,
+    EventParticipant,
+    Department,
+    Organization,
+    AbstractDay,
+    AbstractEvent,
+    TimeSlot,
+    Event,
+    EventPlace,
+    Subject,
+    EventKind,
+    DayDateOverride,
+    EventCancel
+)
+
+"""py manage.py test api.tests.test_virtual_events
+"""
+
+class TestVirtualEvents(TestCase):
+    def setUp(self):
+        FACULTY_REFERENCE_DATA = """
+        [
+            {
+                "faculty_id" : "111",
+                "faculty_fullname" : "Факультет электроники и вычислительной техники",
+                "faculty_code" : "000000111",
+                "faculty_shortname" : "ФЭВТ"
+            }
+        ]
+        """
+        SCHEDULE_REFERENCE_DATA = """
+            [
+                {
+                    "course": "4",
+                    "schedule_template_metadata_faculty_shortname": "ФЭВТ",
+                    "semester": "1",
+                    "years": "2024-2025",
+                    "start_date": "02.09.2024",
+                    "end_date": "29.12.2024",
+                    "scope": "Бакалавриат",
+                    "department_shortname": "ФЭВТ"
+                }
+            ]
+        """
+
+        WriteAPI.create_common_abstract_days()
+        WriteAPI.create_common_time_slots()
+        Organization.objects.create(name="ВолгГТУ")
+        ReferenceImporter.import_faculty_reference(FACULTY_REFERENCE_DATA)
+        ReferenceImporter.import_schedule(SCHEDULE_REFERENCE_DATA, True)
+
+        department = Department.objects.get(shortname="ФЭВТ")
+        self.GROUP = EventParticipant.objects.create(name="ПрИн-466", role=EventParticipant.Role.STUDENT, is_group=True, department=department)
+        self.OTHER_GROUP = EventParticipant.objects.create(name="ПрИн-467", role=EventParticipant.Role.STUDENT, is_group=True, department=department)
+
+        for day_number, group in [(0, self.GROUP), (1, self.GROUP), (0, self.OTHER_GROUP)]:
+            WriteAPI.create_abstract_event(
+                EventKind.objects.get_or_create(name="Лекция")[0],
+                Subject.objects.get_or_create(name="ВКР")[0],
+                [group, EventParticipant.objects.get_or_create(name="Гилка В.В.", role=EventParticipant.Role.TEACHER, department=department)[0]],
+                [EventPlace.objects.get_or_create(building="В", room="902")[0]],
+                AbstractDay.objects.get(day_number=day_number),
+                TimeSlot.objects.get(alt_name="1-2"),
+                None,
+                Schedule.objects.get(status=Schedule.Status.ACTIVE)
+            )
+
+        DayDateOverride.objects.create(day_source=date(2024, 11, 11), day_destination=date(2024, 11, 9), department=department)
+        EventCancel.objects.create(date=date(2024, 9, 16), department=department)
+
+    @staticmethod
+    def describe(events) -> list[tuple]:
+        return sorted(
+            (e.abstract_event.pk, e.date, e.is_event_canceled, e.time_slot_override.pk, tuple(sorted(p.pk for p in e.participants_override.all())))
+            for e in events
+        )
+
+    def test_virtual_events_same_as_materialized(self):
+        reader = ReadAPI(DateFilter.from_date("2024-09-01", "2024-11-30"))
+        reader.add_filter(ParticipantFilter.by_name(self.GROUP.name))
+
+        reader.find_virtual_events()
+        virtual_events = reader.get_found_models()
+
+        self.assertFalse(Event.objects.exists())
+
+        WriteAPI.fill_event_table(AbstractEvent.objects.all())
+        reader.find_models(Event)
+
+        self.assertEqual(self.describe(virtual_events), self.describe(reader.get_found_models().distinct()))
+        self.assertEqual(len([e for e in virtual_events if e.is_event_canceled]), 1)
+        self.assertTrue([e for e in virtual_events if e.date == date(2024, 11, 9)])
+
+    def test_overriden_event_replaces_occurrence(self):
+        WriteAPI.fill_event_table(AbstractEvent.objects.all())
+
+        event = Event.objects.get(date=date(2024, 9, 2), participants_override=self.GROUP)
+        event.time_slot_override = TimeSlot.objects.get(alt_name="3-4")
+        event.is_event_overriden = True
+        event.save()
+        Event.objects.filter(is_event_overriden=False).delete()
+
+        reader = ReadAPI(DateFilter.from_singe_date(date(2024, 9, 2)))
+        reader.add_filter(ParticipantFilter.by_name(self.GROUP.name))
+        reader.find_virtual_events()
+
+        self.assertSequenceEqual([e.pk for e in reader.get_found_models()], [event.pk])
+
+    def test_virtual_events_api(self):
+        response = self.client.get("/api/events/virtual/", {
+            "date_from" : "2024-09-02",
+            "date_to" : "2024-09-08",
+            "participants" : [self.OTHER_GROUP.pk]
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["items"]), 1)
+        self.assertEqual(self.client.get("/api/events/virtual/").status_code, 400)
+        self.assertEqual(self.client.get("/api/events/virtual/", {
+            "date_from" : "2024-09-02",
+            "date_to" : "2024-09-08",
+            "schedule" : "first"
+        }).status_code, 400)
+
+    def test_unsupported_filter(self):
+        reader = ReadAPI(DateFilter.from_date("2024-09-01", "2024-11-30"))
+        reader.add_filter({"is_event_canceled" : False})
+
+        with self.assertRaises(ValidationError):
+            reader.find_virtual_events()
+
+    def test_date_moved_into_range(self):
+        reader = ReadAPI(DateFilter.from_singe_date(date(2024, 11, 9)))
+        reader.add_filter(ParticipantFilter.by_name(self.GROUP.name))
+        reader.find_virtual_events()
+
+        self.assertEqual([(e.date, e.date_override.day_source) for e in reader.get_found_models()], [(date(2024, 11, 9), date(2024, 11, 11))])
+
+    def test_overriden_event_without_time_slot(self):
+        WriteAPI.fill_event_table(AbstractEvent.objects.all())
+
+        event = Event.objects.get(date=date(2024, 9, 2), participants_override=self.GROUP)
+        Event.objects.filter(pk=event.pk).update(time_slot_override=None, is_event_overriden=True)
+        Event.objects.filter(is_event_overriden=False).delete()
+
+        reader = ReadAPI(DateFilter.from_singe_date(date(2024, 9, 2)))
+        reader.find_virtual_events()
+
+        self.assertEqual([e.pk for e in reader.get_found_models()], [None, event.pk])
+
+    def test_table_data_from_virtual_events(self):
+        filters = {
+            "date" : "range_date",
+            "left_date" : "2024-09-02",
+            "right_date" : "2024-09-08",
+            "group" : self.GROUP.name,
+            "teacher" : "Гилка В.В.",
+            "place" : "",
+            "subject" : "",
+            "kind" : "",
+            "time_slot" : ""
+        }
+
+        with override_settings(VIRTUAL_EVENTS=True):
+            virtual_data = get_table_data(filters)
+
+        WriteAPI.fill_event_table(AbstractEvent.objects.all())
+        data = get_table_data(filters)
+
+        self.assertEqual([[e.date for e in entry] for entry, _, _ in virtual_data], [[e.date for e in entry] for entry, _, _ in data])
+        self.assertEqual([calendar for _, _, calendar in virtual_data], [calendar for _, _, calendar in data])
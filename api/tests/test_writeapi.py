@@ -0,0 +1,281 @@
+from datetime import date
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from api.importers import ReferenceImporter
+from api.utilities import WriteAPI
+from api.benchmarks import events_snapshot, legacy_fill
+import api.calendar_index as calendar_index
+from api.models import (
+    Schedule,
+    EventParticipant,
+    Department,
+    Organization,
+    AbstractDay,
+    TimeSlot,
+    AbstractEvent,
+    Event,
+    EventPlace,
+    Subject,
+    EventKind,
+    DayDateOverride,
+    EventCancel
+)
+
+"""py manage.py test api.tests.test_writeapi
+"""
+
+class TestWriteAPI(TestCase):
+    def setUp(self):
+        FACULTY_REFERENCE_DATA = """
+        [
+            {
+                "faculty_id" : "111",
+                "faculty_fullname" : "Факультет электроники и вычислительной техники",
+                "faculty_code" : "000000111",
+                "faculty_shortname" : "ФЭВТ"
+            }
+        ]
+        """
+        SCHEDULE_REFERENCE_DATA = """
+            [
+                {
+                    "course": "4",
+                    "schedule_template_metadata_faculty_shortname": "ФЭВТ",
+                    "semester": "1",
+                    "years": "2024-2025",
+                    "start_date": "02.09.2024",
+                    "end_date": "29.12.2024",
+                    "scope": "Бакалавриат",
+                    "department_shortname": "ФЭВТ"
+                }
+            ]
+        """
+
+        WriteAPI.create_common_abstract_days()
+        WriteAPI.create_common_time_slots()
+        Organization.objects.create(name="ВолгГТУ")
+        ReferenceImporter.import_faculty_reference(FACULTY_REFERENCE_DATA)
+        ReferenceImporter.import_schedule(SCHEDULE_REFERENCE_DATA, True)
+
+        self.DEPARTMENT = Department.objects.get(shortname="ФЭВТ")
+        self.SCHEDULE = Schedule.objects.get(status=Schedule.Status.ACTIVE)
+        self.PARTICIPANTS = [
+            EventParticipant.objects.create(name="Гилка В.В.", role=EventParticipant.Role.TEACHER, department=self.DEPARTMENT),
+            EventParticipant.objects.create(name="ПрИн-466", role=EventParticipant.Role.STUDENT, is_group=True, department=self.DEPARTMENT)
+        ]
+        self.PLACES = [EventPlace.objects.create(building="В", room="902")]
+
+    def create_abstract_event(self, day_number : int, holds_on_date : date|None = None) -> AbstractEvent:
+        return WriteAPI.create_abstract_event(
+            EventKind.objects.get_or_create(name="Лекция")[0],
+            Subject.objects.get_or_create(name="ВКР")[0],
+            self.PARTICIPANTS,
+            self.PLACES,
+            AbstractDay.objects.get(day_number=day_number),
+            TimeSlot.objects.get(alt_name="1-2"),
+            holds_on_date,
+            self.SCHEDULE
+        )
+
+    def test_get_semester_dates(self):
+        dates = WriteAPI.get_semester_dates(self.create_abstract_event(0))
+
+        self.assertEqual(dates[0], date(2024, 9, 2))
+        self.assertEqual(dates[-1], date(2024, 12, 23))
+        self.assertEqual(len(dates), 9)
+
+        self.assertSequenceEqual(
+            WriteAPI.get_semester_dates(self.create_abstract_event(0, date(2024, 10, 1))),
+            [date(2024, 10, 1)]
+        )
+
+    def test_bulk_fill_same_as_per_event_fill(self):
+        DayDateOverride.objects.create(day_source=date(2024, 11, 11), day_destination=date(2024, 11, 9), department=self.DEPARTMENT)
+        EventCancel.objects.create(date=date(2024, 11, 9), department=self.DEPARTMENT)
+        EventCancel.objects.create(date=date(2024, 12, 9), department=self.DEPARTMENT)
+
+        abstract_event = self.create_abstract_event(0)
+        events = Event.objects.filter(abstract_event=abstract_event)
+
+        legacy_fill(abstract_event)
+        legacy_snapshot = events_snapshot(events)
+        events.delete()
+
+        WriteAPI.fill_semester_by_repeating(abstract_event)
+
+        self.assertEqual(events_snapshot(events), legacy_snapshot)
+        self.assertEqual(events.filter(is_event_canceled=True).count(), 2)
+        self.assertTrue(events.filter(date=date(2024, 11, 9), date_override__isnull=False).exists())
+
+    def test_fill_event_table_queries(self):
+        single_abstract_event = self.create_abstract_event(5)
+        abstract_events = [self.create_abstract_event(day_number) for day_number in range(5)]
+
+        with CaptureQueriesContext(connection) as single_fill_queries:
+            WriteAPI.fill_event_table(AbstractEvent.objects.filter(pk=single_abstract_event.pk))
+
+        # queries count not depends on AbstractEvents and Events count
+        with self.assertNumQueries(len(single_fill_queries)):
+            WriteAPI.fill_event_table(AbstractEvent.objects.filter(pk__in=[ae.pk for ae in abstract_events]))
+
+        self.assertEqual(Event.objects.count(), 6 * 9)
+        self.assertEqual(Event.participants_override.through.objects.count(), 6 * 9 * 2)
+        self.assertEqual(Event.places_override.through.objects.count(), 6 * 9)
+
+    def test_moving_abstract_event_keeps_event_ids(self):
+        abstract_event = self.create_abstract_event(0)
+        WriteAPI.fill_event_table(abstract_event)
+        events = Event.objects.filter(abstract_event=abstract_event)
+        event_pks = set(events.values_list("pk", flat=True))
+
+        abstract_event.abstract_day = AbstractDay.objects.get(day_number=2)
+        abstract_event.save()
+
+        self.assertSetEqual(set(events.values_list("pk", flat=True)), event_pks)
+        self.assertEqual(events.first().date.weekday(), 2)
+        self.assertEqual(Event.participants_override.through.objects.filter(event__in=events).count(), len(event_pks) * 2)
+
+    def test_fill_event_table_writes_only_changes(self):
+        abstract_event = self.create_abstract_event(0)
+        WriteAPI.fill_event_table(abstract_event)
+        events = Event.objects.filter(abstract_event=abstract_event)
+        snapshot = events_snapshot(events)
+
+        with CaptureQueriesContext(connection) as queries:
+            WriteAPI.fill_event_table(abstract_event)
+
+        self.assertFalse([q for q in queries if not q["sql"].startswith("SELECT")])
+        self.assertEqual(events_snapshot(events), snapshot)
+
+        EventCancel.objects.create(date=date(2024, 9, 16), department=self.DEPARTMENT)
+        events.update(is_event_canceled=False, event_cancel=None)
+        abstract_event.participants.remove(self.PARTICIPANTS[0])
+        Event.participants_override.through.objects.filter(event__in=events, eventparticipant=self.PARTICIPANTS[1]).delete()
+        overriden_event = events.get(date=date(2024, 9, 30))
+        overriden_event.is_event_overriden = True
+        overriden_event.save()
+        events.exclude(pk=overriden_event.pk).first().delete()
+
+        WriteAPI.fill_event_table(abstract_event)
+
+        self.assertEqual(events.count(), 9)
+        self.assertTrue(events.get(date=date(2024, 9, 16)).is_event_canceled)
+        self.assertSequenceEqual(
+            [p.pk for p in events.exclude(pk=overriden_event.pk).first().participants_override.all()],
+            [self.PARTICIPANTS[1].pk]
+        )
+
+    def test_update_events_keeps_overriden(self):
+        abstract_event = self.create_abstract_event(0)
+        WriteAPI.fill_event_table(abstract_event)
+        events = Event.objects.filter(abstract_event=abstract_event)
+
+        overriden_event = events.first()
+        overriden_event.is_event_overriden = True
+        overriden_event.save()
+
+        abstract_event.subject = Subject.objects.create(name="Программирование")
+        new_teacher = EventParticipant.objects.create(name="Иванов И.И.", role=EventParticipant.Role.TEACHER, department=self.DEPARTMENT)
+        AbstractEvent.participants.through.objects.filter(abstractevent=abstract_event).delete()
+        AbstractEvent.participants.through.objects.create(abstractevent=abstract_event, eventparticipant=new_teacher)
+
+        # update fields, select Events pks and for every through table: select, delete, insert
+        with self.assertNumQueries(8):
+            WriteAPI.update_events(abstract_event)
+
+        for e in events.exclude(pk=overriden_event.pk):
+            self.assertEqual(e.subject_override, abstract_event.subject)
+            self.assertSequenceEqual(list(e.participants_override.all()), [new_teacher])
+            self.assertSequenceEqual(list(e.places_override.all()), self.PLACES)
+
+        overriden_event.refresh_from_db()
+        self.assertNotEqual(overriden_event.subject_override, abstract_event.subject)
+        self.assertEqual(overriden_event.participants_override.count(), 2)
+
+    def test_calendar_loaded_once_per_scope(self):
+        DayDateOverride.objects.create(day_source=date(2024, 11, 11), day_destination=date(2024, 11, 9), department=self.DEPARTMENT)
+        EventCancel.objects.create(date=date(2024, 12, 9), department=self.DEPARTMENT)
+
+        abstract_event = self.create_abstract_event(0)
+
+        with CaptureQueriesContext(connection) as queries, calendar_index.calendar_scope():
+            for date_ in WriteAPI.get_semester_dates(abstract_event):
+                WriteAPI.create_event(date_, abstract_event)
+
+        calendar_queries = [q for q in queries if "api_daydateoverride" in q["sql"] or "api_eventcancel" in q["sql"]]
+
+        self.assertEqual(len(calendar_queries), 2)
+
+        events = Event.objects.filter(abstract_event=abstract_event)
+
+        self.assertTrue(events.get(date=date(2024, 11, 9)).date_override)
+        self.assertTrue(events.get(date=date(2024, 12, 9)).is_event_canceled)
+
+        # calendar is reloaded after changes
+        with calendar_index.calendar_scope():
+            calendar_index.get_calendar(self.DEPARTMENT.pk)
+            EventCancel.objects.create(date=date(2024, 9, 16), department=self.DEPARTMENT)
+
+            self.assertTrue(calendar_index.get_calendar(self.DEPARTMENT.pk).get_cancel(date(2024, 9, 16)))
+
+    def test_calendar_changes_applies_in_bulk(self):
+        WriteAPI.fill_event_table([self.create_abstract_event(0) for _ in range(3)])
+
+        with CaptureQueriesContext(connection) as queries:
+            event_cancel = EventCancel.objects.create(date=date(2024, 9, 16), department=self.DEPARTMENT)
+
+        self.assertEqual(len([q for q in queries if q["sql"].startswith("UPDATE")]), 1)
+        self.assertEqual(Event.objects.filter(date=date(2024, 9, 16), event_cancel=event_cancel, is_event_canceled=True).count(), 3)
+
+        event_cancel.delete()
+
+        self.assertFalse(Event.objects.filter(is_event_canceled=True).exists())
+
+        EventCancel.objects.create(date=date(2024, 9, 14), department=self.DEPARTMENT)
+        manualy_canceled = Event.objects.filter(date=date(2024, 9, 30)).first()
+        manualy_canceled.is_event_canceled = True
+        manualy_canceled.save()
+        date_override = DayDateOverride.objects.create(day_source=date(2024, 9, 16), day_destination=date(2024, 9, 14), department=self.DEPARTMENT)
+
+        self.assertEqual(Event.objects.filter(date=date(2024, 9, 14), date_override=date_override, is_event_canceled=True).count(), 3)
+
+        date_override.day_source = date(2024, 9, 30)
+        date_override.save()
+
+        self.assertEqual(Event.objects.filter(date=date(2024, 9, 16), date_override=None, is_event_canceled=False).count(), 3)
+        self.assertEqual(Event.objects.filter(date=date(2024, 9, 14), is_event_canceled=True).count(), 3)
+        manualy_canceled.refresh_from_db()
+        self.assertTrue(manualy_canceled.is_event_canceled)
+        self.assertIsNone(manualy_canceled.event_cancel)
+
+        date_override.delete()
+
+        self.assertEqual(Event.objects.filter(date=date(2024, 9, 30), date_override=None).count(), 3)
+
+
+    def test_calendar_kept_by_scope(self):
+        abstract_event = self.create_abstract_event(0)
+
+        def get_calendar_queries(event_date : date) -> list:
+            with CaptureQueriesContext(connection) as queries:
+                WriteAPI.create_event(event_date, abstract_event)
+
+            return [q for q in queries if "api_daydateoverride" in q["sql"] or "api_eventcancel" in q["sql"]]
+
+        with calendar_index.calendar_scope():
+            self.assertEqual(len(get_calendar_queries(date(2024, 9, 2))), 2)
+            self.assertEqual(len(get_calendar_queries(date(2024, 9, 9))), 0)
+
+            # changes inside operation drop its calendars
+            EventCancel.objects.create(date=date(2024, 9, 16), department=self.DEPARTMENT)
+
+            WriteAPI.create_event(date(2024, 9, 16), abstract_event)
+
+            self.assertTrue(Event.objects.get(abstract_event=abstract_event, date=date(2024, 9, 16)).is_event_canceled)
+
+        # calendars are not kept out of scope, so changes of other processes are seen
+        EventCancel.objects.filter(date=date(2024, 9, 16)).delete()
+
+        self.assertEqual(len(get_calendar_queries(date(2024, 9, 23))), 2)
+        self.assertIsNone(calendar_index.get_schedule_calendar(self.SCHEDULE.pk).get_cancel(date(2024, 9, 16)))
@@ -4,6 +4,7 @@ from api.views import (
     EventKindListView,
     EventViewSet,
     GroupViewSet,
+    ImportJobViewSet,
     JSONImportAPIView,
     DBImportAPIView,
     LessonRoomViewSet,
@@ -24,6 +25,7 @@ router.register(r"lessonrooms", LessonRoomViewSet, basename="lessonrooms")
 router.register(r"groups", GroupViewSet, basename="groups")
 router.register(r"teachers", TeacherViewSet, basename="teachers")
 router.register(r"schedules", ScheduleViewSet, basename="schedules")
+router.register(r"import/jobs", ImportJobViewSet, basename="import-jobs")
 
 
 urlpatterns = [
@@ -1,14 +1,27 @@
-from django.db.models import QuerySet
+from django.db import transaction
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import QuerySet, Q
 from django.urls import reverse
-from django.utils.html import format_html
+from django.utils.html import format_html, strip_tags
 from django.http import HttpResponse
-from django.utils.safestring import SafeText
+from django.utils.safestring import SafeText, mark_safe
 from datetime import datetime, date, timedelta
 import api.utility_filters as filters
+import api.calendar_index as calendar_index
+import api.conflicts as conflicts
+import api.room_occupancy as room_occupancy
+import api.schedule_occupancy as schedule_occupancy
+from api.virtual_events import VirtualEvent, split_filter_query, is_date_matched, get_start_time
+import api.bulk_operations as bulk_operations
+import api.instrumentation as instrumentation
+from api.json_stream import JSONStream
 from itertools import islice
+from collections import defaultdict
 import xlsxwriter # TODO: replace with openpyxl
+import hashlib
 import io
 import json
+import logging
 import re
 from api.models import (
     CommonModel,
@@ -32,6 +45,9 @@ from api.models import (
 )
 
 
+logger = logging.getLogger(__name__)
+
+
 class Utilities:
     HEADER_MESSAGE_TEMPLATE = 'В запланированном событии <a href="{}">{}</a><br><br>'
     DUPLICATE_MESSAGE_TEMPLATE = '<a href="{}">{}</a> / {}<br>'
@@ -39,31 +55,170 @@ class Utilities:
     PARTICIPANT_MESSAGE_TEMPLATE = '<a href="{}">{}</a>, '
     PLACES_BASE_MESSAGE = 'АУДИТОРИИ одновременно задействованы в других запланированных событиях:<br>'
     PLACE_MESSAGE_TEMPLATE = '<a href="{}">{}</a>, '
+    EVENT_HEADER_MESSAGE_TEMPLATE = 'В событии <a href="{}">{}</a> {}<br><br>'
+    EVENT_PARTICIPANTS_BASE_MESSAGE = 'УЧАСТНИКИ одновременно участвуют в других событиях:<br>'
+    EVENT_PLACES_BASE_MESSAGE = 'АУДИТОРИИ одновременно задействованы в других событиях:<br>'
 
     @classmethod
-    def check_abstract_event(cls, abstract_event : AbstractEvent) -> tuple[bool, SafeText]:
+    def check_abstract_event(cls, abstract_event : AbstractEvent, participants=None, places=None) -> tuple[bool, SafeText]:
         """Check given AbstractEvent for models double usage
 
+        Uses in-process occupancy index, so at most one query is made
+        if participants or places are not given. Models for message
+        are loaded only if double usage found
+
         Returns:
             a tuple of state of double usage and message for user notification. 
             If no model duplicating found then message will be empty
         """
-        
-        funcs = [Utilities.check_for_participants_duplicate, Utilities.check_for_places_duplicate]
-        message = format_html(cls.HEADER_MESSAGE_TEMPLATE, abstract_event.get_absolute_url(), str(abstract_event))
-        is_anything_found = False
 
-        for f in funcs:
-            is_double_usage_found, m = f(abstract_event)
-            
-            if is_double_usage_found:
-                is_anything_found = True
+        found = schedule_occupancy.find(
+            abstract_event,
+            None if participants is None else [p.pk for p in participants],
+            None if places is None else [p.pk for p in places]
+        )
+
+        if not found:
+            return False, mark_safe("")
+
+        other_abstract_events = AbstractEvent.objects.select_related("subject", "abstract_day", "time_slot").in_bulk(
+            {other_pk for _, _, other_pk in found}
+        )
+        resources = {
+            conflicts.PARTICIPANT : EventParticipant.objects.in_bulk({pk for kind, pk, _ in found if kind == conflicts.PARTICIPANT}),
+            conflicts.PLACE : EventPlace.objects.in_bulk({pk for kind, pk, _ in found if kind == conflicts.PLACE})
+        }
+        found_conflicts = [
+            (kind, resources[kind][resource_pk], [abstract_event, other_abstract_events[other_pk]])
+            for kind, resource_pk, other_pk in found
+            # index could be outdated by changes of other processes
+            if other_pk in other_abstract_events and resource_pk in resources[kind]
+            and other_abstract_events[other_pk].abstract_day_id == abstract_event.abstract_day_id
+            and other_abstract_events[other_pk].time_slot_id == abstract_event.time_slot_id
+        ]
+
+        if not found_conflicts:
+            return False, mark_safe("")
+
+        return True, cls.make_double_usage_message(
+            format_html(cls.HEADER_MESSAGE_TEMPLATE, abstract_event.get_absolute_url(), str(abstract_event)),
+            cls.group_duplicates(found_conflicts, {abstract_event.pk})[0][1],
+            cls.PARTICIPANTS_BASE_MESSAGE,
+            cls.PLACES_BASE_MESSAGE
+        )
+
+    @classmethod
+    def check_abstract_events(cls, abstract_events) -> list[tuple[AbstractEvent, SafeText]]:
+        """Check given AbstractEvents for models double usage in single sweep
+
+        Messages are the same as check_abstract_event makes
+
+        Returns:
+            a list of AbstractEvents with found double usage
+            and messages for user notification
+        """
+
+        found_conflicts = [(c.kind, c.resource, c.abstract_events) for c in conflicts.find_conflicts(abstract_events)]
+        selected_pks = set(
+            abstract_events.values_list("pk", flat=True) if isinstance(abstract_events, QuerySet) else [ae.pk for ae in abstract_events]
+        )
+
+        return [
+            (ae, cls.make_double_usage_message(
+                format_html(cls.HEADER_MESSAGE_TEMPLATE, ae.get_absolute_url(), str(ae)),
+                duplicates,
+                cls.PARTICIPANTS_BASE_MESSAGE,
+                cls.PLACES_BASE_MESSAGE
+            ))
+            for ae, duplicates in cls.group_duplicates(found_conflicts, selected_pks)
+        ]
+
+    @classmethod
+    def check_events(cls, events) -> list[tuple[Event, SafeText]]:
+        """Check given Events for models double usage by other Events
+        on the same date and time slot
+
+        Returns:
+            a list of Events with found double usage
+            and messages for user notification
+        """
+
+        if not isinstance(events, QuerySet):
+            events = Event.objects.filter(pk__in=[e.pk for e in events])
+
+        dates = [d for d in events.values_list("date", flat=True) if d]
+
+        if not dates:
+            return []
+
+        found_conflicts = [(c.kind, c.resource, c.events) for c in conflicts.find_event_conflicts(min(dates), max(dates), events)]
+        selected_pks = set(events.values_list("pk", flat=True))
+
+        return [
+            (e, cls.make_double_usage_message(
+                format_html(cls.EVENT_HEADER_MESSAGE_TEMPLATE, e.get_absolute_url(), str(e), e.date.strftime("%d.%m.%Y")),
+                duplicates,
+                cls.EVENT_PARTICIPANTS_BASE_MESSAGE,
+                cls.EVENT_PLACES_BASE_MESSAGE
+            ))
+            for e, duplicates in cls.group_duplicates(found_conflicts, selected_pks)
+        ]
+
+    @staticmethod
+    def group_duplicates(found_conflicts : list[tuple], selected_pks : set[int]) -> list[tuple]:
+        """Intended for internal usage
+
+        Groups conflicts (kind, resource, models) by selected models
+
+        Returns list of (model, {kind : {other model : [resources]}}) ordered by model pk
+        """
+
+        duplicates = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        models_by_pk = {}
+
+        for kind, resource, models in found_conflicts:
+            for model in models:
+                if model.pk not in selected_pks:
+                    continue
+
+                models_by_pk[model.pk] = model
+
+                for other_model in models:
+                    if other_model.pk != model.pk:
+                        duplicates[model.pk][kind][other_model].append(resource)
+
+        return [(models_by_pk[pk], duplicates[pk]) for pk in sorted(models_by_pk)]
+
+    @classmethod
+    def make_double_usage_message(cls, header : SafeText, duplicates : dict, participants_base_message : str, places_base_message : str) -> SafeText:
+        """Intended for internal usage
 
-                message += m
-                message += format_html("<br>")
-        message = format_html(message[:-4])
+        Makes message for user notification from grouped duplicates
+        """
+
+        message = header
+
+        for kind, base_message, template, label in (
+            (conflicts.PARTICIPANT, participants_base_message, cls.PARTICIPANT_MESSAGE_TEMPLATE, lambda p: str(p.name)),
+            (conflicts.PLACE, places_base_message, cls.PLACE_MESSAGE_TEMPLATE, str)
+        ):
+            if kind not in duplicates:
+                continue
+
+            message += mark_safe(base_message)
+
+            for other_model, resources in sorted(duplicates[kind].items(), key=lambda item: item[0].pk):
+                p_urls = mark_safe("")
+
+                for p in sorted(resources, key=lambda p: p.pk):
+                    p_urls += format_html(template, p.get_absolute_url(), label(p))
+                p_urls = mark_safe(p_urls[:-2])
 
-        return is_anything_found, message
+                message += format_html(cls.DUPLICATE_MESSAGE_TEMPLATE, other_model.get_absolute_url(), str(other_model), p_urls)
+
+            message += mark_safe("<br>")
+
+        return mark_safe(message[:-4])
 
     @classmethod
     def check_for_participants_duplicate(cls, abstract_event : AbstractEvent) -> tuple[bool, SafeText|None]:
@@ -81,14 +236,14 @@ class Utilities:
         if not other_aes.exists():
             return False, None
         
-        return_message = format_html(cls.PARTICIPANTS_BASE_MESSAGE)
+        return_message = mark_safe(cls.PARTICIPANTS_BASE_MESSAGE)
         
         for ae in other_aes:
-            p_urls = format_html("")
+            p_urls = mark_safe("")
             
             for p in abstract_event.participants.filter(pk__in=ae.participants.values_list("pk", flat=True)):
                 p_urls += format_html(cls.PARTICIPANT_MESSAGE_TEMPLATE, p.get_absolute_url(), str(p.name))
-            p_urls = format_html(p_urls[:-2])
+            p_urls = mark_safe(p_urls[:-2])
             
             return_message += format_html(cls.DUPLICATE_MESSAGE_TEMPLATE, ae.get_absolute_url(), str(ae), p_urls)
 
@@ -110,14 +265,14 @@ class Utilities:
         if not other_aes.exists():
             return False, None
         
-        return_message = format_html(cls.PLACES_BASE_MESSAGE)
+        return_message = mark_safe(cls.PLACES_BASE_MESSAGE)
         
         for ae in other_aes:
-            p_urls = format_html("")
+            p_urls = mark_safe("")
             
             for p in abstract_event.places.filter(pk__in=ae.places.values_list("pk", flat=True)):
                 p_urls += format_html(cls.PLACE_MESSAGE_TEMPLATE, p.get_absolute_url(), str(p))
-            p_urls = format_html(p_urls[:-2])
+            p_urls = mark_safe(p_urls[:-2])
             
             return_message += format_html(cls.DUPLICATE_MESSAGE_TEMPLATE, ae.get_absolute_url(), str(ae), p_urls)
 
@@ -318,6 +473,10 @@ class Utilities:
 
 class EventImportAPI:
     SUBJECT_NORMALIZATION_CAPITALIZE = False
+    # grid entries imported in one bulk operation
+    IMPORT_BATCH_SIZE = 500
+    HEADER_PATHS = [("title",), ("table", "datetime")]
+    GRID_PATH = ("table", "grid")
 
     @staticmethod
     def _normalize_subject_name(name : str) -> str:
@@ -509,34 +668,382 @@ class EventImportAPI:
                 TimeSlot.objects.bulk_create(new_time_slots)
 
     @classmethod
-    def import_event_data(cls, event_data : str):
-        """Reads data from given file and fill database with new AbstractEvents and Events
+    def import_event_data(cls, event_data, progress=None):
+        """Reads data from given JSON string, bytes or file and fill database with new AbstractEvents and Events
+
+        File is streamed twice: first pass collects reference data,
+        second one imports grid entries by batches, so whole grid is never kept in memory.
+        Progress is called with name of import stage, counts of processed and all entries
+
+        Returns counts of created and unchanged entries and deleted AbstractEvents
         """
-        
-        json_data = json.loads(event_data)
-        
-        cls.make_event_import(
-            json_data["title"],
-            json_data["table"]["grid"],
-            json_data["table"]["datetime"]["weeks"],
-            json_data["table"]["datetime"]["week_days"],
-            json_data["table"]["datetime"]["months"]
+
+        event_data = cls._open_event_data(event_data)
+        header = {}
+
+        if progress:
+            progress("read", 0, None)
+
+        with instrumentation.stage("collect_reference_data"):
+            reference_data = cls._collect_reference_data(cls._read_event_data(event_data, header))
+
+        if "title" not in header or "datetime" not in header:
+            raise ValueError("В JSON отсутствует название или календарь расписания.")
+
+        return cls.make_event_import(
+            header["title"],
+            cls._read_event_data(event_data, {}),
+            header["datetime"]["weeks"],
+            header["datetime"]["week_days"],
+            header["datetime"]["months"],
+            reference_data,
+            progress,
+            header.get("entries_count")
         )
-    
+
+    @staticmethod
+    def _open_event_data(event_data):
+        """Returns file for JSON string or bytes
+        """
+
+        if isinstance(event_data, str):
+            return io.StringIO(event_data)
+
+        if isinstance(event_data, bytes):
+            return io.BytesIO(event_data)
+
+        return event_data
+
     @classmethod
-    def make_event_import(cls, title : str, entries, weeks, week_days : list[str], months : list[str]):
+    def _read_event_data(cls, file, header : dict):
+        """Yields grid entries of JSON file and stores its title, datetime
+        and count of entries (when file is read to end) into header
+        """
+
+        file.seek(0)
+        entries_count = 0
+
+        for path, value in JSONStream(file).walk(values=cls.HEADER_PATHS, arrays=[cls.GRID_PATH]):
+            if path == cls.GRID_PATH:
+                entries_count += 1
+
+                yield value
+            else:
+                header[path[-1]] = value
+
+        header["entries_count"] = entries_count
+
+    @classmethod
+    def make_event_import(cls, title : str, entries, weeks, week_days : list[str], months : list[str], reference_data : dict|None = None,
+                          progress=None, total : int|None = None) -> dict:
         """Applies data from loaded JSON on database
+
+        Entries are imported by batches of IMPORT_BATCH_SIZE in single transaction,
+        AbstractEvents and Events of every batch are created in bulk.
+        If reference data is not given, entries are iterated twice
+
+        Every entry is fingerprinted, so on re-import AbstractEvents of unchanged entries
+        are kept as is, only new entries are imported and AbstractEvents of vanished ones are deleted
+
+        Progress is called on every stage and batch with stage name, counts of processed and all entries.
+        Stages are recorded by instrumentation when import is profiled
+
+        Returns counts of created and unchanged entries and deleted AbstractEvents
         """
-        
-        schedule = cls.find_schedule(title)
-        reference_data = cls._collect_reference_data(entries)
-        cls._ensure_reference_data(reference_data)
-        reference_lookup = cls._build_reference_lookup(reference_data)
+
+        with instrumentation.stage("find_schedule"):
+            schedule = cls.find_schedule(title)
+
+        if reference_data is None:
+            with instrumentation.stage("collect_reference_data"):
+                reference_data = cls._collect_reference_data(entries)
+
+        with instrumentation.stage("make_calendar"):
+            global_calendar = cls.make_calendar(weeks, months, schedule)
+
+        calendar_fingerprint = cls.get_calendar_fingerprint(weeks, week_days, months)
+        entries = iter(entries)
+        result = {"created" : 0, "unchanged" : 0, "deleted" : 0}
+
+        with transaction.atomic(), calendar_index.calendar_scope():
+            if progress:
+                progress("reference_data", 0, total)
+
+            with instrumentation.stage("ensure_reference_data"):
+                cls._ensure_reference_data(reference_data)
+
+            with instrumentation.stage("build_reference_lookup"):
+                reference_lookup = cls._build_reference_lookup(reference_data)
+
+            with instrumentation.stage("load_fingerprints"):
+                existing_fingerprints = set(AbstractEvent.objects.filter(
+                    schedule=schedule, import_fingerprint__isnull=False
+                ).values_list("import_fingerprint", flat=True))
+
+            found_fingerprints = set()
+            # same entries could be given several times
+            occurrences = defaultdict(int)
+            processed = 0
+
+            if progress:
+                progress("entries", processed, total)
+
+            while True:
+                with instrumentation.stage("read_entries"):
+                    batch = list(islice(entries, cls.IMPORT_BATCH_SIZE))
+
+                if not batch:
+                    break
+
+                parsed = []
+
+                # fingerprinting and parsing of batch entries
+                with instrumentation.stage("parse_data"):
+                    for entry in batch:
+                        fingerprint = cls.get_import_fingerprint(entry, calendar_fingerprint, occurrences)
+                        found_fingerprints.add(fingerprint)
+
+                        if fingerprint in existing_fingerprints:
+                            result["unchanged"] += 1
+
+                            continue
+
+                        for abstract_event, participants, places, dates in cls.build_abstract_events(
+                            *cls.parse_data(entry, global_calendar, week_days, reference_lookup), schedule
+                        ):
+                            abstract_event.import_fingerprint = fingerprint
+                            parsed.append((abstract_event, participants, places, dates))
+
+                        result["created"] += 1
+
+                with instrumentation.stage("create_abstract_events"):
+                    WriteAPI.create_abstract_events(parsed)
+
+                processed += len(batch)
+
+                if progress:
+                    progress("entries", processed, total)
+
+            vanished_fingerprints = existing_fingerprints - found_fingerprints
+
+            if vanished_fingerprints:
+                if progress:
+                    progress("delete", processed, total)
+
+                with instrumentation.stage("delete_vanished"):
+                    _, deleted = AbstractEvent.objects.filter(
+                        schedule=schedule, import_fingerprint__in=vanished_fingerprints
+                    ).delete()
+
+                result["deleted"] = deleted.get(AbstractEvent._meta.label, 0)
+
+        return result
+
+    @classmethod
+    def get_import_fingerprint(cls, entry, calendar_fingerprint : bytes, occurrences : dict) -> str:
+        """Returns fingerprint of entry stored in AbstractEvent.import_fingerprint
+
+        Occurrences counts same entries given before, so they have different fingerprints
+        """
+
+        entry_fingerprint = cls.get_entry_fingerprint(entry)
+        occurrences[entry_fingerprint] += 1
+
+        return hashlib.sha256(
+            b"%b%b%d" % (entry_fingerprint, calendar_fingerprint, occurrences[entry_fingerprint])
+        ).hexdigest()
+
+    @classmethod
+    def get_entry_fingerprint(cls, entry) -> bytes:
+        """Returns hash of grid entry normalized same way as on import
+        """
+
+        participants = entry.get("participants", {})
+        normalized_entry = [
+            cls._normalize_subject_name(entry["subject"]),
+            cls._normalize_kind_name(entry["kind"]),
+            sorted(filter(None, map(cls._normalize_participant_name, participants.get("teachers", [])))),
+            sorted(filter(None, map(cls._normalize_participant_name, participants.get("student_groups", [])))),
+            sorted(filter(None, map(Utilities.normalize_place_repr, entry.get("places", [])))),
+            sorted(filter(None, map(Utilities.normalize_time_slot_repr, entry.get("hours", [])))),
+            entry["week"],
+            entry["week_day_index"],
+            sorted(entry.get("holds_on_date") or [])
+        ]
+
+        return hashlib.sha256(json.dumps(normalized_entry, ensure_ascii=False).encode("utf-8")).digest()
+
+    @staticmethod
+    def get_calendar_fingerprint(weeks, week_days : list[str], months : list[str]) -> bytes:
+        """Returns hash of schedule calendar, so all entries are imported again when it changes
+        """
+
+        return hashlib.sha256(
+            json.dumps([weeks, week_days, months], ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).digest()
+
+    @classmethod
+    def plan_event_import(cls, event_data) -> dict:
+        """Finds out what import of given JSON string, bytes or file would do without writing anything
+
+        Entries are parsed against reference lookup with not saved models for missing reference data,
+        new AbstractEvents are checked for double usage by schedule occupancy index
+
+        Returns JSON serializable plan:
+            schedule, counts of entries, AbstractEvents and Events to create and delete,
+            missing reference data, conflicts with existing AbstractEvents and entries which cannot be imported
+        """
+
+        event_data = cls._open_event_data(event_data)
+        header = {}
+        reference_data = cls._collect_reference_data(cls._read_event_data(event_data, header))
+
+        if "title" not in header or "datetime" not in header:
+            raise ValueError("В JSON отсутствует название или календарь расписания.")
+
+        weeks = header["datetime"]["weeks"]
+        week_days = header["datetime"]["week_days"]
+        months = header["datetime"]["months"]
+
+        schedule = cls.find_schedule(header["title"])
         global_calendar = cls.make_calendar(weeks, months, schedule)
+        calendar_fingerprint = cls.get_calendar_fingerprint(weeks, week_days, months)
+        reference_lookup = cls._build_reference_lookup(reference_data)
+        missing = cls._add_missing_reference_lookup(reference_data, reference_lookup)
+
+        existing_fingerprints = set(AbstractEvent.objects.filter(
+            schedule=schedule, import_fingerprint__isnull=False
+        ).values_list("import_fingerprint", flat=True))
+        found_fingerprints = set()
+        occurrences = defaultdict(int)
+
+        plan = {
+            "title" : header["title"],
+            "schedule" : {"id" : schedule.pk, "name" : str(schedule)},
+            "entries" : {"total" : 0, "created" : 0, "unchanged" : 0},
+            "abstract_events" : {"created" : 0, "deleted" : 0},
+            "events" : {"created" : 0, "deleted" : 0},
+            "missing" : missing,
+            "conflicts" : [],
+            "errors" : []
+        }
+        new_abstract_events = []
+
+        for index, entry in enumerate(cls._read_event_data(event_data, {})):
+            fingerprint = cls.get_import_fingerprint(entry, calendar_fingerprint, occurrences)
+            found_fingerprints.add(fingerprint)
+            plan["entries"]["total"] += 1
+
+            if fingerprint in existing_fingerprints:
+                plan["entries"]["unchanged"] += 1
+
+                continue
+
+            try:
+                parsed = cls.build_abstract_events(*cls.parse_data(entry, global_calendar, week_days, reference_lookup), schedule)
+            except (ObjectDoesNotExist, KeyError, IndexError, ValueError) as e:
+                plan["errors"].append({"entry" : index, "subject" : entry.get("subject"), "error" : str(e)})
+
+                continue
+
+            plan["entries"]["created"] += 1
+            plan["abstract_events"]["created"] += len(parsed)
+            plan["events"]["created"] += sum(len(dates) for _, _, _, dates in parsed)
+            new_abstract_events.extend((index, *abstract_event) for abstract_event in parsed)
+
+        deleted_abstract_events = AbstractEvent.objects.filter(
+            schedule=schedule, import_fingerprint__in=existing_fingerprints - found_fingerprints
+        )
+        deleted_pks = set(deleted_abstract_events.values_list("pk", flat=True))
+        plan["abstract_events"]["deleted"] = len(deleted_pks)
+
+        if deleted_pks:
+            plan["events"]["deleted"] = Event.objects.filter(abstract_event__in=deleted_pks).count()
+
+        for index, abstract_event, participants, places, _ in new_abstract_events:
+            resources = {
+                (conflicts.PARTICIPANT, resource.pk) : resource
+                for resource in participants if resource.pk is not None
+            } | {
+                (conflicts.PLACE, resource.pk) : resource
+                for resource in places if resource.pk is not None
+            }
+
+            for kind, resource_pk, other_pk in schedule_occupancy.find(
+                abstract_event,
+                [pk for k, pk in resources if k == conflicts.PARTICIPANT],
+                [pk for k, pk in resources if k == conflicts.PLACE]
+            ):
+                if other_pk in deleted_pks:
+                    continue
+
+                plan["conflicts"].append({
+                    "entry" : index,
+                    "subject" : abstract_event.subject.name,
+                    "abstract_day" : abstract_event.abstract_day.name,
+                    "time_slot" : repr(abstract_event.time_slot),
+                    "resource" : repr(resources[(kind, resource_pk)]),
+                    "abstract_event_id" : other_pk
+                })
+
+        return plan
+
+    @classmethod
+    def _add_missing_reference_lookup(cls, reference_data : dict, reference_lookup : dict) -> dict:
+        """Adds not saved models for reference data missing in database
+        into reference lookup, same as _ensure_reference_data would create them
+
+        Returns missing reference data
+        """
+
+        missing = {
+            "subjects" : [],
+            "kinds" : [],
+            "participants" : [],
+            "places" : [],
+            "time_slots" : []
+        }
+
+        for name in sorted(reference_data.get("subjects", set()) - reference_lookup["subjects"].keys()):
+            reference_lookup["subjects"][name] = Subject(name=name)
+            missing["subjects"].append(name)
+
+        for name in sorted(reference_data.get("kinds", set()) - reference_lookup["kinds"].keys()):
+            reference_lookup["kinds"][name] = EventKind(name=name)
+            missing["kinds"].append(name)
+
+        for names, role, is_group in (
+            (reference_data.get("teacher_names", set()), EventParticipant.Role.TEACHER, False),
+            (reference_data.get("group_names", set()), EventParticipant.Role.STUDENT, True)
+        ):
+            for name in sorted(names - reference_lookup["participants"].keys()):
+                reference_lookup["participants"][name] = EventParticipant(name=name, role=role, is_group=is_group)
+                missing["participants"].append(name)
+
+        for building, room in sorted(reference_data.get("places", set()) - reference_lookup["places"].keys()):
+            reference_lookup["places"][(building, room)] = EventPlace(building=building, room=room)
+            missing["places"].append(f"{building} {room}".strip())
+
+        # only TimeSlots with start time are created
+        for alt_name, start_time, end_time in sorted(reference_data.get("time_slots", set())):
+            if not start_time:
+                continue
+
+            try:
+                time_slot = TimeSlot(
+                    alt_name=alt_name,
+                    start_time=datetime.strptime(start_time, "%H:%M").time(),
+                    end_time=datetime.strptime(end_time, "%H:%M").time() if end_time else None
+                )
+            except ValueError:
+                continue
+
+            if time_slot.start_time not in reference_lookup["time_slots_by_start_time"]:
+                reference_lookup["time_slots_by_start_time"][time_slot.start_time] = time_slot
+                missing["time_slots"].append(repr(time_slot))
+
+        return missing
 
-        for entry in entries:
-            cls.use_parsed_data(*cls.parse_data(entry, global_calendar, week_days, reference_lookup), schedule)
-        
     @classmethod
     def make_calendar(cls, weeks, months : list[str], schedule : Schedule) -> dict:
         """
@@ -617,7 +1124,10 @@ class EventImportAPI:
             "kinds" : {},
             "participants" : {},
             "places" : {},
-            "time_slots" : TimeSlot.objects.none()
+            # {(week number, week day name) : AbstractDay}
+            "abstract_days" : {},
+            "time_slots_by_start_time" : {},
+            "time_slots_by_alt_name" : {}
         }
 
         subjects = ref_data.get("subjects", set())
@@ -652,29 +1162,40 @@ class EventImportAPI:
                     (place.building, place.room) : place for place in place_queryset
                 }
 
-        time_slots = ref_data.get("time_slots", set())
-        if time_slots:
-            start_times = {start_time for _, start_time, _ in time_slots if start_time}
-            alt_names = {alt_name for alt_name, start_time, _ in time_slots if not start_time}
-
-                        
-            if start_times:
-                print("qweqwewqewqeq")
-                reference_lookup["time_slots"] = TimeSlot.objects.filter(start_time__in=start_times)
+        # TimeSlots with alt_name are preferred for same start time
+        for time_slot in sorted(TimeSlot.objects.all(), key=lambda time_slot: (not time_slot.alt_name, time_slot.pk)):
+            reference_lookup["time_slots_by_start_time"].setdefault(time_slot.start_time.replace(second=0, microsecond=0), time_slot)
 
-            if alt_names:
-                reference_lookup["time_slots"] |= TimeSlot.objects.filter(alt_name__in=alt_names)
+            if time_slot.alt_name:
+                reference_lookup["time_slots_by_alt_name"].setdefault(time_slot.alt_name, time_slot)
 
-            # reference_lookup["time_slots"].update({
-            #     (
-            #         time_slot.alt_name, 
-            #         time_slot.start_time.strftime("%H:%M").removeprefix("0"), 
-            #         time_slot.end_time.strftime("%H:%M").removeprefix("0") if time_slot.end_time else ""
-            #     ) : time_slot for time_slot in time_slot_queryset_from_start_times | time_slot_queryset_from_alt_names
-            # })
+        for abstract_day in AbstractDay.objects.order_by("day_number"):
+            if abstract_day.name:
+                reference_lookup["abstract_days"].setdefault((abstract_day.name[0], abstract_day.name.split()[-1]), abstract_day)
 
         return reference_lookup
 
+    @staticmethod
+    def _find_time_slot(normalized_time_slot : tuple[str, str, str], reference_lookup : dict) -> TimeSlot|None:
+        """Finds TimeSlot by start time (firstly) or alt name (secondly)
+        of normalized time slot repr in reference lookup
+        """
+
+        alt_name, start_time, _ = normalized_time_slot
+
+        if start_time:
+            match_ = re.search(r"\d{1,2}:\d{2}", start_time)
+
+            if not match_:
+                return None
+
+            try:
+                return reference_lookup["time_slots_by_start_time"].get(datetime.strptime(match_[0], "%H:%M").time())
+            except ValueError:
+                return None
+
+        return reference_lookup["time_slots_by_alt_name"].get(re.sub(r"\s", "", alt_name))
+
     @classmethod
     def parse_data(cls, entry, global_calendar, week_days : list[str], reference_lookup : dict):
         """Finds existing models for JSON data
@@ -738,10 +1259,13 @@ class EventImportAPI:
                 f"Не удалось найти аудитории: {', '.join(missing_places)}"
             )
 
-        abstract_day = AbstractDay.objects.get(
-            name__startswith=1 if week_id == "first_week" else 2,
-            name__endswith=week_days[week_day_index].capitalize()
+        abstract_day = reference_lookup["abstract_days"].get(
+            ("1" if week_id == "first_week" else "2", week_days[week_day_index].capitalize())
         )
+        if abstract_day is None:
+            raise AbstractDay.DoesNotExist(
+                f"Не найден день '{week_days[week_day_index]}' {'первой' if week_id == 'first_week' else 'второй'} недели."
+            )
 
         time_slots = []
         missing_time_slots = []
@@ -751,10 +1275,7 @@ class EventImportAPI:
             if not normalized_time_slot:
                 continue
             
-            ## TODO: select timeslot with alt_name > without altname
-            time_slot = reference_lookup["time_slots"].filter(
-                **filters.TimeSlotFilter.by_repr(normalized_time_slot[1] if normalized_time_slot[1] else normalized_time_slot[0])
-            ).first()
+            time_slot = cls._find_time_slot(normalized_time_slot, reference_lookup)
 
             if time_slot:
                 time_slots.append(time_slot)
@@ -780,32 +1301,38 @@ class EventImportAPI:
         return kind, subject, participants, places, abstract_day, time_slots, holds_on_dates, calendar
   
     @staticmethod
-    def use_parsed_data(kind : EventKind, 
-                        subject : Subject,
-                        participants : list[EventParticipant],
-                        places : list[EventPlace],
-                        abstract_day : AbstractDay,
-                        time_slots : list[TimeSlot],
-                        holds_on_dates : list[date]|list[None],
-                        calendar : dict,
-                        schedule : Schedule):
-        """Creates AbstractEvents and Events for given TimeSlots and dates (if needed)
+    def build_abstract_events(kind : EventKind, 
+                              subject : Subject,
+                              participants : list[EventParticipant],
+                              places : list[EventPlace],
+                              abstract_day : AbstractDay,
+                              time_slots : list[TimeSlot],
+                              holds_on_dates : list[date]|list[None],
+                              calendar : list[date],
+                              schedule : Schedule) -> list[tuple[AbstractEvent, list[EventParticipant], list[EventPlace], list[date]]]:
+        """Makes not saved AbstractEvents for given TimeSlots and dates (if needed)
+
+        Returns list of (AbstractEvent, participants, places, Event dates)
+        for WriteAPI.create_abstract_events
         """
 
-        for date_ in holds_on_dates:
-            for time_slot in time_slots:
-                created_abstract_event = WriteAPI.create_abstract_event(
-                    kind,
-                    subject,
-                    participants,
-                    places,
-                    abstract_day,
-                    time_slot,
-                    date_,
-                    schedule
-                )
-
-                WriteAPI.fill_semester_by_dates(created_abstract_event, calendar)
+        return [
+            (
+                AbstractEvent(
+                    kind=kind,
+                    subject=subject,
+                    abstract_day=abstract_day,
+                    time_slot=time_slot,
+                    holds_on_date=date_,
+                    schedule=schedule
+                ),
+                participants,
+                places,
+                [date_] if date_ else calendar
+            )
+            for date_ in holds_on_dates
+            for time_slot in time_slots
+        ]
         
     ## TODO: write tests
     @staticmethod
@@ -927,6 +1454,55 @@ class ReadAPI:
         
         self.found_models = model.objects.filter(**self.filter_query)
 
+    def find_virtual_events(self):
+        """Finds Events by expanding AbstractEvents on the fly
+
+        Filter query must be written for Event fields.
+        Only overriden Events are read from Event table, other occurrences
+        are made from AbstractEvents, DayDateOverrides and EventCancels.
+        Found models are list of Events and VirtualEvents ordered by date
+
+        Raises ValidationError if filter cannot be applied to expanded events
+        """
+
+        abstract_event_query, date_query = split_filter_query(self.filter_query)
+
+        abstract_events = list(AbstractEvent.objects.filter(**abstract_event_query).distinct().select_related(
+            "kind", "subject", "time_slot", "abstract_day", "schedule__starting_day_number", "schedule__schedule_template"
+        ).prefetch_related("participants", "places"))
+
+        overriden_dates = set()
+
+        for ae_pk, date_, day_source in Event.objects.filter(
+            abstract_event__in=abstract_events, is_event_overriden=True
+        ).values_list("abstract_event", "date", "date_override__day_source"):
+            overriden_dates.add((ae_pk, day_source or date_))
+
+        # dates moved by DayDateOverride can come into date range from outside
+        departments = calendar_index.get_departments_by_schedules(ae.schedule_id for ae in abstract_events)
+        day_sources = {
+            ddo.day_source
+            for calendar in calendar_index.get_calendars(departments.values()).values()
+            for ddo in calendar.date_overrides
+            if is_date_matched(calendar.resolve_date(ddo.day_source)[0], date_query)
+        }
+        abstract_events_dates = [
+            (ae, [d for d in WriteAPI.get_semester_dates(ae) if d in day_sources or is_date_matched(d, date_query)])
+            for ae in abstract_events
+        ]
+
+        found_events = list(Event.objects.filter(
+            **self.filter_query, is_event_overriden=True
+        ).distinct().select_related(
+            "kind_override", "subject_override", "time_slot_override", "abstract_event__abstract_day"
+        ).prefetch_related("participants_override", "places_override"))
+
+        for source_date, e in WriteAPI.build_events(abstract_events_dates):
+            if (e.abstract_event_id, source_date) not in overriden_dates and is_date_matched(e.date, date_query):
+                found_events.append(VirtualEvent.from_event(e))
+
+        self.found_models = sorted(found_events, key=lambda e: (e.date, get_start_time(e)))
+
     def get_found_models(self) -> QuerySet:
         """Returns found models
 
@@ -1020,6 +1596,17 @@ class ReadAPI:
 
 
 class WriteAPI:
+    BULK_BATCH_SIZE = 1000
+    RECONCILED_EVENT_FIELDS = [
+        "date",
+        "date_override",
+        "kind_override",
+        "subject_override",
+        "time_slot_override",
+        "is_event_canceled",
+        "event_cancel"
+    ]
+
     @staticmethod
     def create_event(date_ : str|date, abstract_event : AbstractEvent):
         """Creates new Event from abstract_event on specified date
@@ -1071,8 +1658,74 @@ class WriteAPI:
         abstract_event.participants.set(participants)
         abstract_event.places.set(places)
 
+        # imports check whole schedule by sweep if needed
+        if not bulk_operations.is_active():
+            is_double_usage_found, message = Utilities.check_abstract_event(abstract_event, participants, places)
+
+            if is_double_usage_found:
+                logger.warning(strip_tags(re.sub("(<br>)+", " ", message)).strip())
+
         return abstract_event
         
+    @classmethod
+    def create_abstract_events(cls, parsed : list[tuple[AbstractEvent, list[EventParticipant], list[EventPlace], list[date]]]) -> list[AbstractEvent]:
+        """Creates given not saved AbstractEvents with its participants, places,
+        AbstractEventChanges and Events for given dates in bulk
+
+        Same as create_abstract_event followed by fill_semester_by_dates
+        for every AbstractEvent, but with few queries for all of them.
+        AbstractEvent signals are not called and double usage is not checked
+
+        Returns created AbstractEvents
+        """
+
+        if not parsed:
+            return []
+
+        abstract_events = [ae for ae, _, _, _ in parsed]
+
+        AbstractEvent.objects.bulk_create(abstract_events, batch_size=cls.BULK_BATCH_SIZE)
+
+        for ae in abstract_events:
+            # as after save, so changes tracking not fetches rows again
+            ae._loaded_values = ae.get_current_values()
+
+        participants_links = []
+        places_links = []
+
+        for ae, participants, places, _ in parsed:
+            # same participant or place could be given twice
+            participants_links.extend(
+                AbstractEvent.participants.through(abstractevent_id=ae.pk, eventparticipant_id=pk)
+                for pk in dict.fromkeys(p.pk for p in participants)
+            )
+            places_links.extend(
+                AbstractEvent.places.through(abstractevent_id=ae.pk, eventplace_id=pk)
+                for pk in dict.fromkeys(p.pk for p in places)
+            )
+
+        AbstractEvent.participants.through.objects.bulk_create(participants_links, batch_size=cls.BULK_BATCH_SIZE)
+        AbstractEvent.places.through.objects.bulk_create(places_links, batch_size=cls.BULK_BATCH_SIZE)
+
+        with instrumentation.stage("create_changes"):
+            bulk_operations.create_changes(abstract_events)
+
+        with instrumentation.stage("create_events"):
+            cls.create_events([(ae, dates) for ae, _, _, dates in parsed])
+
+        with instrumentation.stage("update_schedule_occupancy"):
+            schedule_occupancy.update_on_commit(abstract_events)
+            schedule_occupancy.update_resources_on_commit([
+                (link.abstractevent_id, kind, "post_add", {getattr(link, related_field)})
+                for kind, links, related_field in (
+                    (conflicts.PARTICIPANT, participants_links, "eventparticipant_id"),
+                    (conflicts.PLACE, places_links, "eventplace_id")
+                )
+                for link in links
+            ])
+
+        return abstract_events
+
     @staticmethod
     def get_semester_filling_parameters(abstract_event : AbstractEvent):
         """Intended for internal usage
@@ -1110,30 +1763,289 @@ class WriteAPI:
                 abstract_event.schedule.schedule_template.repetition_period
 
     @classmethod
-    def fill_semester_by_repeating(cls, abstract_event : AbstractEvent):
-        """Creates Events from given AbstractEvent for every semester working day
+    def get_semester_dates(cls, abstract_event : AbstractEvent) -> list[date]:
+        """Returns every date given AbstractEvent holds on
         using Schedule parameters
+
+        Dates are not corrected by DayDateOverrides
         """
 
-        # creates single Event 
+        # single date
         # if abstract_event holds only on expected date
         if abstract_event.holds_on_date != None:
-            cls.create_event(abstract_event.holds_on_date, abstract_event)
-        else:
-            semester_start_date, semester_end_date, date_, repetition_period = cls.get_semester_filling_parameters(abstract_event)
+            return [abstract_event.holds_on_date]
 
-            while date_ <= semester_end_date: # TODO: check < or <=
-                if date_ >= semester_start_date:
-                    cls.create_event(date_, abstract_event)
-                
-                    # creating Event for only first acceptable date
-                    # if abstract_event is not repeatable
-                    if not abstract_event.schedule.schedule_template.repeatable:
-                        break
-                
-                date_ += timedelta(days=repetition_period)
+        semester_start_date, semester_end_date, date_, repetition_period = cls.get_semester_filling_parameters(abstract_event)
+        dates = []
+
+        while date_ <= semester_end_date: # TODO: check < or <=
+            if date_ >= semester_start_date:
+                dates.append(date_)
+            
+                # taking only first acceptable date
+                # if abstract_event is not repeatable
+                if not abstract_event.schedule.schedule_template.repeatable:
+                    break
+            
+            date_ += timedelta(days=repetition_period)
+
+        return dates
+
+    @classmethod
+    def build_events(cls, abstract_events_dates : list[tuple[AbstractEvent, list[date]]]) -> list[tuple[date, Event]]:
+        """Makes not saved Events from given AbstractEvents for its dates
+
+        DayDateOverrides and EventCancels resolves in memory
+
+        Returns list of (source date, Event)
+        """
+
+        abstract_events_dates = [(ae, dates) for ae, dates in abstract_events_dates if dates]
+
+        if not abstract_events_dates:
+            return []
+
+        departments = calendar_index.get_departments_by_schedules(ae.schedule_id for ae, _ in abstract_events_dates)
+        calendars = calendar_index.get_calendars(departments.values())
+
+        events = []
+
+        for ae, dates in abstract_events_dates:
+            calendar = calendars[departments.get(ae.schedule_id)]
+            
+            for date_ in dates:
+                if isinstance(date_, str):
+                    date_ = date.fromisoformat(date_)
+
+                event_date, date_override = calendar.resolve_date(date_)
+                event_cancel = calendar.get_cancel(event_date)
+
+                events.append((date_, Event(
+                    date=event_date,
+                    date_override=date_override,
+                    kind_override_id=ae.kind_id,
+                    subject_override_id=ae.subject_id,
+                    time_slot_override_id=ae.time_slot_id,
+                    abstract_event=ae,
+                    is_event_canceled=event_cancel is not None,
+                    event_cancel=event_cancel
+                )))
+
+        return events
+
+    @classmethod
+    def create_events(cls, abstract_events_dates : list[tuple[AbstractEvent, list[date]]]) -> list[Event]:
+        """Creates Events from given AbstractEvents for its dates in bulk
+
+        Events and their participants and places saves with few queries.
+        Not calling Event signals
+
+        Returns created Events
+        """
+
+        events = [e for _, e in cls.build_events(abstract_events_dates)]
+
+        if not events:
+            return []
+
+        Event.objects.bulk_create(events, batch_size=cls.BULK_BATCH_SIZE)
+
+        cls.copy_m2m_into_events(events, [ae for ae, _ in abstract_events_dates])
+
+        room_occupancy.invalidate_on_commit({e.date for e in events})
+
+        return events
+
+    @classmethod
+    def reconcile_events(cls, abstract_events : list[AbstractEvent]):
+        """Brings not overriden Events of given AbstractEvents to its semester dates
+
+        Existing Events matches with expected ones by source date
+        (date before DayDateOverride applying). Matched Events updates only
+        in changed fields, not matched ones reuses for missing dates,
+        so Event ids keeps when AbstractEvent moves to another day.
+        Only rest of Events deletes and only rest of dates inserts.
+
+        Overriden Events are never changed and occupy its dates
+        """
+
+        abstract_events = list(abstract_events)
+
+        if not abstract_events:
+            return
+
+        expected = cls.build_events([(ae, cls.get_semester_dates(ae)) for ae in abstract_events])
+
+        overriden_dates = set()
+        current = defaultdict(dict)
+        obsolete = defaultdict(list)
+
+        for e in Event.objects.filter(abstract_event__in=abstract_events).select_related("date_override"):
+            source_date = e.date_override.day_source if e.date_override else e.date
+
+            if e.is_event_overriden:
+                overriden_dates.add((e.abstract_event_id, source_date))
+            elif source_date in current[e.abstract_event_id]:
+                obsolete[e.abstract_event_id].append(e)
+            else:
+                current[e.abstract_event_id][source_date] = e
+
+        matched = []
+        missing = defaultdict(list)
+
+        for source_date, e in expected:
+            if (e.abstract_event_id, source_date) in overriden_dates:
+                continue
+
+            existing_event = current[e.abstract_event_id].pop(source_date, None)
+
+            if existing_event:
+                matched.append((existing_event, e))
+            else:
+                missing[e.abstract_event_id].append(e)
+
+        for ae_pk, events in current.items():
+            obsolete[ae_pk].extend(events.values())
+
+        to_create = []
+
+        for ae_pk, events in missing.items():
+            reusable = sorted(obsolete.pop(ae_pk, []), key=lambda e: e.date)
+
+            matched.extend(zip(reusable, events))
+            to_create.extend(events[len(reusable):])
+
+            if len(reusable) > len(events):
+                obsolete[ae_pk] = reusable[len(events):]
+
+        to_delete = [e.pk for events in obsolete.values() for e in events]
+
+        if to_delete:
+            Event.objects.filter(pk__in=to_delete).delete()
+
+        changed_events = []
+        changed_fields = set()
+
+        for existing_event, e in matched:
+            is_changed = False
+
+            for field in cls.RECONCILED_EVENT_FIELDS:
+                attname = Event._meta.get_field(field).attname
+
+                if getattr(existing_event, attname) != getattr(e, attname):
+                    setattr(existing_event, attname, getattr(e, attname))
+                    changed_fields.add(field)
+                    is_changed = True
+
+            if is_changed:
+                changed_events.append(existing_event)
+
+        if changed_events:
+            Event.objects.bulk_update(changed_events, sorted(changed_fields), batch_size=cls.BULK_BATCH_SIZE)
+
+        if to_create:
+            Event.objects.bulk_create(to_create, batch_size=cls.BULK_BATCH_SIZE)
+
+        cls.reconcile_events_m2m(abstract_events, [e for e, _ in matched], to_create)
+
+        # Events could leave any date
+        room_occupancy.invalidate_on_commit()
+
+    @classmethod
+    def reconcile_events_m2m(cls, abstract_events : list[AbstractEvent], existing_events : list[Event], new_events : list[Event]):
+        """Brings participants and places of Events to its AbstractEvents ones
+
+        Inserts only missing links and deletes only obsolete ones
+        """
+
+        if new_events:
+            cls.copy_m2m_into_events(new_events, abstract_events)
+
+        if not existing_events:
+            return
+
+        existing_pks = {e.pk for e in existing_events}
+
+        for ae_field, event_field, related_field in (
+            ("participants", "participants_override", "eventparticipant"),
+            ("places", "places_override", "eventplace")
+        ):
+            AbstractEventThrough = getattr(AbstractEvent, ae_field).through
+            EventThrough = getattr(Event, event_field).through
+
+            expected = defaultdict(set)
+
+            for ae_pk, related_pk in AbstractEventThrough.objects.filter(
+                abstractevent__in=abstract_events
+            ).values_list("abstractevent", related_field):
+                expected[ae_pk].add(related_pk)
+
+            current = defaultdict(set)
+            to_delete = []
+
+            for through_pk, event_pk, ae_pk, related_pk in EventThrough.objects.filter(
+                event__abstract_event__in=abstract_events,
+                event__is_event_overriden=False
+            ).values_list("pk", "event", "event__abstract_event", related_field):
+                if event_pk not in existing_pks:
+                    continue
+
+                if related_pk in expected[ae_pk]:
+                    current[event_pk].add(related_pk)
+                else:
+                    to_delete.append(through_pk)
+
+            if to_delete:
+                EventThrough.objects.filter(pk__in=to_delete).delete()
+
+            to_create = [
+                EventThrough(**{"event_id" : e.pk, f"{related_field}_id" : related_pk})
+                for e in existing_events
+                for related_pk in expected[e.abstract_event_id] - current[e.pk]
+            ]
+
+            if to_create:
+                EventThrough.objects.bulk_create(to_create, batch_size=cls.BULK_BATCH_SIZE)
+
+    @classmethod
+    def copy_m2m_into_events(cls, events : list[Event], abstract_events : list[AbstractEvent]):
+        """Inserts participants and places of AbstractEvents into its Events in bulk
+        """
         
-        cls.check_for_day_date_override(abstract_event)
+        participants = defaultdict(list)
+        places = defaultdict(list)
+
+        for ae_pk, participant_pk in AbstractEvent.participants.through.objects.filter(
+            abstractevent__in=abstract_events
+        ).values_list("abstractevent", "eventparticipant"):
+            participants[ae_pk].append(participant_pk)
+
+        for ae_pk, place_pk in AbstractEvent.places.through.objects.filter(
+            abstractevent__in=abstract_events
+        ).values_list("abstractevent", "eventplace"):
+            places[ae_pk].append(place_pk)
+
+        EventParticipantThrough = Event.participants_override.through
+        EventPlaceThrough = Event.places_override.through
+
+        EventParticipantThrough.objects.bulk_create([
+            EventParticipantThrough(event_id=e.pk, eventparticipant_id=participant_pk)
+            for e in events
+            for participant_pk in participants[e.abstract_event_id]
+        ], batch_size=cls.BULK_BATCH_SIZE)
+        EventPlaceThrough.objects.bulk_create([
+            EventPlaceThrough(event_id=e.pk, eventplace_id=place_pk)
+            for e in events
+            for place_pk in places[e.abstract_event_id]
+        ], batch_size=cls.BULK_BATCH_SIZE)
+
+    @classmethod
+    def fill_semester_by_repeating(cls, abstract_event : AbstractEvent):
+        """Creates Events from given AbstractEvent for every semester working day
+        using Schedule parameters
+        """
+
+        cls.create_events([(abstract_event, cls.get_semester_dates(abstract_event))])
 
     @classmethod
     def fill_semester_by_dates(cls, abstract_event : AbstractEvent, dates : list[date]):
@@ -1145,36 +2057,29 @@ class WriteAPI:
         # creates single Event 
         # if abstract_event holds only on expected date
         if abstract_event.holds_on_date != None:
-            cls.create_event(abstract_event.holds_on_date, abstract_event)
-        else:
-            for date_ in dates:
-                cls.create_event(date_, abstract_event)
-        
-        cls.check_for_day_date_override(abstract_event)
+            dates = [abstract_event.holds_on_date]
+
+        cls.create_events([(abstract_event, dates)])
 
     @classmethod
+    @calendar_index.calendar_scope()
     def check_for_day_date_override(cls, abstract_event : AbstractEvent):
-        reader = ReadAPI({"department" : abstract_event.department})
+        calendar = calendar_index.get_schedule_calendar(abstract_event.schedule_id)
 
-        # getting all DayDateOverrides for AbstractEvent
-        reader.find_models(DayDateOverride)
-        date_overrides = reader.get_found_models()
+        if not calendar.date_overrides:
+            return
 
-        reader.clear_filter_query()
-        reader.add_filter({"abstract_event" : abstract_event})
+        events = list(Event.objects.filter(
+            abstract_event=abstract_event, 
+            date__in=calendar.overrides_by_source.keys()
+        ))
 
         # applying date overrides to Events
-        for ddo in date_overrides:
-            reader.add_filter(filters.DateFilter.from_singe_date(ddo.day_source))
-            
-            reader.find_models(Event)
-            
-            if reader.get_found_models().exists():
-                for e in reader.get_found_models():
+        for ddo in calendar.date_overrides:
+            for e in events:
+                if e.date == ddo.day_source:
                     cls.apply_date_override(ddo, e)
 
-            reader.remove_last_filter()
-
     @staticmethod
     def apply_date_override(date_override : DayDateOverride, event : Event, call_save_method : bool = True):
         """Apply DayDateOverride to given Event
@@ -1193,39 +2098,40 @@ class WriteAPI:
 
     @classmethod
     def fill_event_table(cls, abstract_event):
-        """Clear Event table and fill it from given AbstractEvent
+        """Bring Event table in line with given AbstractEvent or AbstractEvents
+
+        Changes only Events that differs from expected ones
         """
-        
-        # deleting only not overriden events
-        filter_query = filters.EventFilter.not_overriden()
 
         try:
-            iterator = iter(abstract_event)
+            iter(abstract_event)
         # working with single AbstractEvent
         except TypeError:
-            # deleting Events only for specified AbstractEvent
-            filter_query.update({"abstract_event__pk" : abstract_event.pk})
-
-            Event.objects.filter(**filter_query).delete()
-            
-            # filling semester by Events from abstract_event
-            cls.fill_semester_by_repeating(abstract_event)
+            abstract_event = [abstract_event]
         # working with lsit of AbstractEvents
         else:
-            # deleting Events only for specified AbstractEvents
-            filter_query.update({"abstract_event__in" : abstract_event})
+            if isinstance(abstract_event, QuerySet):
+                abstract_event = abstract_event.select_related(
+                    "abstract_day", "schedule__starting_day_number", "schedule__schedule_template"
+                )
 
-            Event.objects.filter(**filter_query).delete()
-            
-            # filling semester by Events from every AbstractEvent
-            for ae in abstract_event:
-                cls.fill_semester_by_repeating(ae)
+        cls.reconcile_events(abstract_event)
                 
         return True
     
-    @staticmethod
-    def update_events(abstract_event : AbstractEvent, update_non_m2m : bool = True, update_m2m : bool = True):
+    @classmethod
+    def update_events(cls,
+                      abstract_event : AbstractEvent,
+                      update_non_m2m : bool = True,
+                      update_m2m : bool = True,
+                      update_participants : bool = True,
+                      update_places : bool = True):
         """Refresh fields of Events with given AbstractEvent
+
+        Overriden Events are not changed.
+        Fields updates by single UPDATE, participants and places
+        by single DELETE and INSERT for each through table.
+        Not calling Event signals
         """
         
         if not update_non_m2m and not update_m2m:
@@ -1234,19 +2140,44 @@ class WriteAPI:
         filter_query = {"abstract_event" : abstract_event}
         filter_query.update(filters.EventFilter.not_overriden())
 
-        for e in Event.objects.filter(**filter_query):
-            if update_non_m2m:
-                e.kind_override = abstract_event.kind
-                e.subject_override = abstract_event.subject
-                e.time_slot_override = abstract_event.time_slot
+        events = Event.objects.filter(**filter_query)
+
+        if update_non_m2m or update_m2m and update_places:
+            room_occupancy.invalidate_on_commit()
+
+        if update_non_m2m:
+            events.update(
+                kind_override=abstract_event.kind,
+                subject_override=abstract_event.subject,
+                time_slot_override=abstract_event.time_slot
+            )
 
-            if update_m2m:
-                e.participants_override.clear()
-                e.participants_override.add(*abstract_event.participants.all())
-                e.places_override.clear()
-                e.places_override.add(*abstract_event.places.all())
+        if not update_m2m:
+            return
+        
+        m2m_fields = []
 
-            e.save()
+        if update_participants:
+            m2m_fields.append(("participants", "participants_override", "eventparticipant"))
+        
+        if update_places:
+            m2m_fields.append(("places", "places_override", "eventplace"))
+
+        event_pks = list(events.values_list("pk", flat=True))
+
+        if not event_pks:
+            return
+
+        for ae_field, event_field, related_field in m2m_fields:
+            EventThrough = getattr(Event, event_field).through
+            related_pks = list(getattr(abstract_event, ae_field).values_list("pk", flat=True))
+
+            EventThrough.objects.filter(event__in=events).delete()
+            EventThrough.objects.bulk_create([
+                EventThrough(**{"event_id" : event_pk, f"{related_field}_id" : related_pk})
+                for event_pk in event_pks
+                for related_pk in related_pks
+            ], batch_size=cls.BULK_BATCH_SIZE)
     
     @staticmethod
     def apply_event_canceling(event_cancel : EventCancel, event : Event, call_save_method : bool = True):
@@ -1265,6 +2196,109 @@ class WriteAPI:
         if call_save_method:
             event.save()
 
+    @staticmethod
+    def apply_event_cancel_in_bulk(event_cancel : EventCancel) -> int:
+        """Cancels Events of EventCancel Department on its date by single UPDATE
+
+        Returns count of canceled Events
+        """
+
+        filter_query = filters.DateFilter.from_singe_date(event_cancel.date)
+        filter_query.update(filters.EventFilter.by_department(event_cancel.department_id))
+
+        count = Event.objects.filter(**filter_query).update(is_event_canceled=True, event_cancel=event_cancel)
+
+        if count:
+            logger.info("%r: отменено событий: %d", event_cancel, count)
+
+            room_occupancy.invalidate_on_commit([event_cancel.date])
+
+        return count
+
+    @staticmethod
+    def undo_event_cancel_in_bulk(event_cancel : EventCancel) -> int:
+        """Undo canceling of Events canceled by given EventCancel by single UPDATE
+
+        Returns count of restored Events
+        """
+
+        count = Event.objects.filter(event_cancel=event_cancel).update(is_event_canceled=False, event_cancel=None)
+
+        if count:
+            logger.info("%r: восстановлено событий: %d", event_cancel, count)
+
+            room_occupancy.invalidate_on_commit([event_cancel.date])
+
+        return count
+
+    @classmethod
+    def apply_date_override_in_bulk(cls, date_override : DayDateOverride) -> int:
+        """Moves Events of DayDateOverride Department from its source to destination date
+
+        Returns count of moved Events
+        """
+
+        filter_query = filters.DateFilter.from_singe_date(date_override.day_source)
+        filter_query.update(filters.EventFilter.by_department(date_override.department_id))
+
+        count = cls.move_events(
+            Event.objects.filter(**filter_query), 
+            date_override.day_destination, 
+            date_override, 
+            date_override.department_id
+        )
+
+        if count:
+            logger.info("%r: перенесено событий: %d", date_override, count)
+
+        return count
+
+    @classmethod
+    def undo_date_override_in_bulk(cls, date_override : DayDateOverride) -> int:
+        """Returns Events moved by given DayDateOverride back to its source date
+
+        Returns count of moved Events
+        """
+
+        count = cls.move_events(
+            Event.objects.filter(date_override=date_override), 
+            date_override.day_source, 
+            None, 
+            date_override.department_id
+        )
+
+        if count:
+            logger.info("%r: возвращено событий: %d", date_override, count)
+
+        return count
+
+    @staticmethod
+    def move_events(events : QuerySet, date_ : date, date_override : DayDateOverride|None, department_pk : int|None) -> int:
+        """Moves given Events to date and attaches DayDateOverride by two UPDATEs
+
+        EventCancel on new date attaches as it happens on Event saving,
+        manualy canceled Events stays canceled
+
+        Returns count of moved Events
+        """
+
+        event_cancel = calendar_index.get_calendar(department_pk).get_cancel(date_)
+        manualy_canceled = Q(is_event_canceled=True, event_cancel__isnull=True)
+
+        count = events.exclude(manualy_canceled).update(
+            date=date_,
+            date_override=date_override,
+            is_event_canceled=event_cancel is not None,
+            event_cancel=event_cancel
+        )
+        count += events.filter(manualy_canceled).update(date=date_, date_override=date_override)
+
+        # source dates of moved Events are not known
+        if count:
+            room_occupancy.invalidate_on_commit()
+
+        return count
+
     @staticmethod
     def make_changes_file(abs_event_changes) -> HttpResponse|None:
         """Makes XLS file for given AbstractEventChanges
@@ -1,8 +1,9 @@
-import json
+from datetime import date
 
 from django.shortcuts import redirect
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, generics, status, viewsets
+from rest_framework import filters, generics, mixins, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.routers import APIRootView
@@ -11,13 +12,21 @@ from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 
 from api.filters import EventFilter, ScheduleFilter
-from api.importers import JSONImporter
-from api.models import Event, EventKind, EventParticipant, EventPlace, Schedule, Subject
+import api.import_jobs as import_jobs
+from api.utilities import ReadAPI
+from api.utility_filters import DateFilter
+import api.room_occupancy as room_occupancy
+from api.free_time import find_free_time
+from api.models import Event, EventKind, EventParticipant, EventPlace, ImportJob, Schedule, Subject
 from api.serializers import (
     EventParticipantSerializer,
     EventPlaceSerializer,
     EventSerializer,
+    VirtualEventSerializer,
+    FreeRoomSerializer,
+    FreeTimeSerializer,
     FileUploadSerializer,
+    ImportJobSerializer,
     ScheduleSerializer,
     SubjectSerializer,
 )
@@ -34,7 +43,9 @@ class SchedulesAPIRootView(APIRootView):
     - [Расписание](/api/schedules)<br>
     - [Занятие](/api/events)<br>
         - [Тип занятия](/api/events/kind) (только чтение) <br>
+        - [Общее свободное время участников](/api/events/free_time) (только чтение) <br>
     - [Место проведения](/api/lessonrooms)<br>
+        - [Свободные места проведения](/api/lessonrooms/free) (только чтение) <br>
     - [Тип события](/api/events/kind)<br>
     - [Группы](/api/groups) и [преподаватели](/api/teachers)<br>
 
@@ -172,6 +183,39 @@ class LessonRoomViewSet(CommonViewSet):
     def get_view_name(self):
         return "Место проведения"
 
+    @action(detail=False, methods=["get"], filter_backends=[])
+    def free(self, request):
+        """
+        # GET
+        - Возвращает места проведения, свободные во всех заданных датах <br>
+        Для каждого места возвращаются ID свободных временных интервалов по датам
+
+        ## Аргументы GET-запроса: <br>
+        - `date` - список дат в формате ISO-8601 (обязательный) <br>
+        - `time_slot` - список ID временных интервалов, в которые место должно быть свободно <br>
+        - `building` - строка, корпус <br>
+        - `min_window` - целое число, минимальное количество идущих подряд свободных временных интервалов <br>
+        """
+
+        try:
+            dates = [date.fromisoformat(d) for d in request.query_params.getlist("date")]
+            time_slots = [int(pk) for pk in request.query_params.getlist("time_slot")]
+            min_window = int(request.query_params.get("min_window", 1))
+
+            if not dates or min_window < 1:
+                raise ValueError()
+
+            free_rooms = room_occupancy.index.find_free_rooms(
+                dates, time_slots, request.query_params.get("building"), min_window
+            )
+        except ValueError:
+            return Response(
+                {"detail": "Необходимо указать date в формате ISO-8601, существующие time_slot и положительный min_window"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(FreeRoomSerializer(free_rooms, many=True).data)
+
 
 class GroupViewSet(CommonViewSet):
     """
@@ -294,6 +338,83 @@ class EventViewSet(CommonViewSet):
     def get_view_name(self):
         return "Занятие"
 
+    @action(detail=False, methods=["get"], filter_backends=[])
+    def virtual(self, request):
+        """
+        # GET
+        - Возвращает занятия, развернутые из запланированных событий без хранения каждого занятия <br>
+        Учитываются переносы дней, отмены и измененные вручную занятия (у них задан `id`)
+
+        ## Аргументы GET-запроса: <br>
+        - `date_from`, `date_to` - даты (от и до включительно) в формате ISO-8601 (обязательные) <br>
+        - `schedule` - целое число, ID расписания <br>
+        - `participants` - список ID участников <br>
+        - `possible_rooms` - список ID мест проведения <br>
+        """
+
+        try:
+            reader = ReadAPI(DateFilter.from_date(request.query_params["date_from"], request.query_params["date_to"]))
+        except (KeyError, ValueError):
+            return Response(
+                {"detail": "Необходимо указать date_from и date_to в формате ISO-8601"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if "schedule" in request.query_params:
+            reader.add_filter({"abstract_event__schedule" : request.query_params["schedule"]})
+
+        if "participants" in request.query_params:
+            reader.add_filter({"participants_override__in" : request.query_params.getlist("participants")})
+
+        if "possible_rooms" in request.query_params:
+            reader.add_filter({"places_override__in" : request.query_params.getlist("possible_rooms")})
+
+        # unsupported filters raise ValidationError which is returned as 400
+        try:
+            reader.find_virtual_events()
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(VirtualEventSerializer(reader.get_found_models(), many=True).data)
+
+    @action(detail=False, methods=["get"], filter_backends=[])
+    def free_time(self, request):
+        """
+        # GET
+        - Возвращает даты, временные интервалы и места проведения, в которые свободны все заданные участники <br>
+        Сначала идут ближайшие к дате `near` варианты, затем более ранние временные интервалы
+
+        ## Аргументы GET-запроса: <br>
+        - `participants` - список ID участников (обязательный) <br>
+        - `date_from`, `date_to` - даты (от и до включительно) в формате ISO-8601 (обязательные) <br>
+        - `time_slot` - список ID допустимых временных интервалов <br>
+        - `building` - строка, корпус <br>
+        - `near` - желаемая дата в формате ISO-8601, по умолчанию `date_from` <br>
+        - `limit` - целое число, максимальное количество вариантов, по умолчанию 50 <br>
+        """
+
+        try:
+            participants = [int(pk) for pk in request.query_params.getlist("participants")]
+            date_from = date.fromisoformat(request.query_params["date_from"])
+            date_to = date.fromisoformat(request.query_params["date_to"])
+            time_slots = [int(pk) for pk in request.query_params.getlist("time_slot")]
+            near = date.fromisoformat(request.query_params["near"]) if "near" in request.query_params else None
+            limit = int(request.query_params.get("limit", 50))
+
+            if not participants or limit < 1:
+                raise ValueError()
+        except (KeyError, ValueError):
+            return Response(
+                {"detail": "Необходимо указать participants, date_from и date_to в формате ISO-8601 и положительный limit"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        free_time = find_free_time(
+            participants, date_from, date_to, time_slots, request.query_params.get("building"), near, limit
+        )
+
+        return Response(FreeTimeSerializer(free_time, many=True).data)
+
 
 class ScheduleViewSet(CommonViewSet):
     """
@@ -389,6 +510,11 @@ class JSONImportAPIView(APIView):
     и списка `holding_info`, который содержит объекты информации о проведении. Этот объект содержит ключ `date`, а также `place_id` и `slot_id`, являющиеся одним `idnumber` места проведения и временного интервала проведения события соответственно <br>
 
     Также, стоит отметить, что у всех объектов, импортируемых через JSON, должен быть уникальный строковый идентификатор, который хранится в ключе `idnumber`
+
+    # Выполнение импорта
+
+    Файл ставится в очередь импорта, ответ содержит ID задачи импорта `job_id`.
+    Состояние задачи можно узнать по адресу [/api/import/jobs/ID/](/api/import/jobs)
     """
 
     permission_classes = [IsAdminUser]
@@ -399,22 +525,63 @@ class JSONImportAPIView(APIView):
         if serializer.is_valid():
             json_file = serializer.validated_data.get("file", None)
             if json_file:
-                # Обработка файла
-                file_data = json_file.read().decode("utf-8")
-                json_content = json.loads(file_data)
-                return self.process_content(json_content)
+                return self.enqueue(request, json_file)
 
-        json_content = json.loads(request.body.decode("utf-8"))
-        return self.process_content(json_content)
+        return self.enqueue(request, request.body)
 
-    def process_content(self, json_content):
-        JSONImporter(json_content).import_data()
-        return Response({"result": True}, status=status.HTTP_200_OK)
+    def enqueue(self, request, json_content):
+        job = import_jobs.enqueue(ImportJob.Kind.JSON, json_content, author=request.user)
+        return Response({"job_id": job.pk, "status": job.status}, status=status.HTTP_202_ACCEPTED)
 
     def get_view_name(self):
         return "Импортирование данных из JSON"
 
 
+class ImportJobViewSet(
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    # GET
+    - Возвращает список задач импорта или задачу с заданным ID <br>
+    Пример формата:
+    ```json
+    {
+        "id": 5,
+        "kind": "events",
+        "status": "running", // "queued", "running", "done" или "failed"
+        "options": {},
+        "processed": 1500, // обработано записей файла
+        "total": 4200, // всего записей файла, если известно
+        "stages": {"read": 0.8, "reference_data": 0.1, "entries": 3.2}, // время этапов импорта в секундах
+        "result": null, // результат импорта после выполнения
+        "error": null, // текст ошибки, если импорт не удался
+        "datecreated": "2025-01-01T00:00:00Z",
+        "started_at": "2025-01-01T00:00:05Z",
+        "finished_at": null
+    }
+    ```
+
+    # POST
+    Ставит файл в очередь импорта, файл импортируется процессом `manage.py import_worker` <br>
+    - `kind` - тип импорта, одно из значений: "events", "json", "schedules", "subjects", "teachers", "students", "places", "faculties", "departments" <br>
+    - `file` - JSON файл <br>
+    - `options` - параметры импорта, например `{"save_archive_schedules": false}` для "schedules" <br>
+    """
+
+    permission_classes = [IsAdminUser]
+    queryset = ImportJob.objects.order_by("-pk")
+    serializer_class = ImportJobSerializer
+
+    def perform_create(self, serializer):
+        serializer.save(author=self.request.user)
+
+    def get_view_name(self):
+        return "Задачи импорта"
+
+
 class ObtainAPIUserToken(ObtainAuthToken):
     """
     View для получения токена авторизации
@@ -0,0 +1,168 @@
+"""Events expanded from AbstractEvents on reading
+
+Occurrences are not stored as Event rows. Only exceptions stays in database:
+overriden Events, DayDateOverrides and EventCancels
+"""
+
+from datetime import date, time
+from rest_framework.exceptions import ValidationError
+from api.models import (
+    AbstractEvent,
+    Event,
+    EventParticipant,
+    EventPlace,
+    DayDateOverride,
+    EventCancel
+)
+
+
+class RelatedObjects(list):
+    """List of related objects which can be used as many-to-many manager
+    """
+
+    def all(self):
+        return self
+
+
+class VirtualEvent:
+    """Single occurrence of AbstractEvent without Event row
+
+    Provides Event fields and methods used for reading
+    """
+
+    pk = None
+    id = None
+    is_event_overriden = False
+
+    def __init__(self,
+                 abstract_event : AbstractEvent,
+                 date_ : date,
+                 date_override : DayDateOverride|None,
+                 event_cancel : EventCancel|None,
+                 participants : list[EventParticipant],
+                 places : list[EventPlace]):
+        self.abstract_event = abstract_event
+        self.date = date_
+        self.date_override = date_override
+        self.kind_override = abstract_event.kind
+        self.subject_override = abstract_event.subject
+        self.time_slot_override = abstract_event.time_slot
+        self.is_event_canceled = event_cancel is not None
+        self.event_cancel = event_cancel
+        self.participants_override = RelatedObjects(participants)
+        self.places_override = RelatedObjects(places)
+
+    @classmethod
+    def from_event(cls, event : Event) -> "VirtualEvent":
+        """Makes VirtualEvent from not saved Event built by WriteAPI.build_events
+        """
+
+        ae = event.abstract_event
+
+        return cls(
+            ae,
+            event.date,
+            event.date_override,
+            event.event_cancel,
+            ae.participants.all(),
+            ae.places.all()
+        )
+
+    @property
+    def department(self):
+        return self.abstract_event.schedule.schedule_template.department
+
+    def get_groups(self):
+        return RelatedObjects(p for p in self.participants_override if p.is_group)
+
+    def get_teachers(self):
+        return RelatedObjects(
+            p for p in self.participants_override
+            if p.role in [EventParticipant.Role.TEACHER, EventParticipant.Role.ASSISTANT]
+        )
+
+    def __repr__(self):
+        return f"Занятие по {self.abstract_event.subject.name}"
+
+
+# Event field lookups and its AbstractEvent analogues
+ABSTRACT_EVENT_LOOKUPS = {
+    "participants_override" : "participants",
+    "places_override" : "places",
+    "subject_override" : "subject",
+    "kind_override" : "kind",
+    "time_slot_override" : "time_slot",
+}
+
+
+def split_filter_query(filter_query : dict) -> tuple[dict, dict]:
+    """Splits Event filter query into AbstractEvent filter query and date filter query
+
+    Raises ValidationError if filter cannot be applied to expanded events
+    """
+
+    abstract_event_query = {}
+    date_query = {}
+
+    for lookup, value in filter_query.items():
+        field, _, rest = lookup.partition("__")
+
+        if field == "date":
+            date_query[lookup] = value
+        elif field == "abstract_event":
+            abstract_event_query[rest or "pk"] = value
+        elif field in ABSTRACT_EVENT_LOOKUPS:
+            abstract_event_query["__".join(filter(None, [ABSTRACT_EVENT_LOOKUPS[field], rest]))] = value
+        else:
+            raise_unsupported(lookup)
+
+    return abstract_event_query, date_query
+
+
+def raise_unsupported(lookup : str):
+    raise ValidationError({lookup : [f"Фильтр {lookup} не поддерживается для развернутых занятий"]})
+
+
+def to_date(value : str|date) -> date:
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def is_date_matched(date_ : date, date_query : dict) -> bool:
+    """Checks if date satisfies date filter query
+
+    Raises ValidationError if filter cannot be applied to expanded events
+    """
+
+    for lookup, value in date_query.items():
+        match lookup:
+            case "date" | "date__exact":
+                matched = date_ == to_date(value)
+            case "date__range":
+                matched = to_date(value[0]) <= date_ <= to_date(value[1])
+            case "date__gte":
+                matched = date_ >= to_date(value)
+            case "date__gt":
+                matched = date_ > to_date(value)
+            case "date__lte":
+                matched = date_ <= to_date(value)
+            case "date__lt":
+                matched = date_ < to_date(value)
+            case "date__in":
+                matched = date_ in [to_date(d) for d in value]
+            case _:
+                raise_unsupported(lookup)
+
+        if not matched:
+            return False
+
+    return True
+
+
+def get_start_time(event : Event|VirtualEvent) -> time:
+    """Returns start time of Event for ordering, Events without time slot are the last
+    """
+
+    if event.time_slot_override is None:
+        return time.max
+
+    return event.time_slot_override.start_time
@@ -1,6 +1,9 @@
 from api.utilities import Utilities, ReadAPI, WriteAPI
+from api.virtual_events import get_start_time
 from api.utility_filters import *
 from api.models import Event
+from django.conf import settings
+from django.db.models import QuerySet
 from collections import defaultdict
 
 
@@ -38,10 +41,13 @@ def get_table_data(filters):
     if filters["time_slot"]:
         reader.add_filter(TimeSlotFilter.by_repr_event_relative(filters["time_slot"]))
 
-    reader.find_models(Event)
+    if settings.VIRTUAL_EVENTS:
+        reader.find_virtual_events()
+    else:
+        reader.find_models(Event)
 
     if filters["teacher"]:
-        entries = format_events(reader.get_found_models().filter(**ParticipantFilter.by_name(filters["teacher"])).distinct())
+        entries = format_events(filter_by_teacher(reader.get_found_models(), filters["teacher"]))
     else:
         entries = format_events(reader.get_found_models())
 
@@ -52,11 +58,26 @@ def get_table_data(filters):
     return list(zip(entries, row_spans, calendar))
 
 
+def filter_by_teacher(events, teacher):
+    """Filters events by teacher name or list of names
+    """
+
+    if isinstance(events, QuerySet):
+        return events.filter(**ParticipantFilter.by_name(teacher)).distinct()
+
+    names = teacher if type(teacher) is list else [teacher]
+
+    return [e for e in events if any(p.name in names for p in e.participants_override.all())]
+
+
 def format_events(events):
     """Format events by grouping them and ordering by date
     """
     
-    events = events.order_by("time_slot_override__start_time", "date")
+    if isinstance(events, QuerySet):
+        events = events.order_by("time_slot_override__start_time", "date")
+    else:
+        events = sorted(events, key=lambda e: (get_start_time(e), e.date))
 
     # grouping found events by date
     grouped_events = defaultdict(list)
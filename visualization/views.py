@@ -1,6 +1,7 @@
 from api.utilities import ReadAPI
 from django.shortcuts import render
 from django.template.defaulttags import register
+from rest_framework.exceptions import ValidationError
 from visualization.logic import *
 
 @register.filter
@@ -48,7 +49,12 @@ def index(request):
         selected["time_slot"] = get_POST_value(request.POST, "time_slot[]")
 
         context["selected"] = selected
-        context["data"] = get_table_data(selected)
+
+        try:
+            context["data"] = get_table_data(selected)
+        except ValidationError as e:
+            context["data"] = []
+            context["error"] = " ".join(str(message) for messages in e.detail.values() for message in messages)
 
         context["groups"] = ReadAPI.get_all_groups().values_list("name", flat=True)
         context["teachers"] = ReadAPI.get_all_teachers().values_list("name", flat=True)
@@ -104,6 +104,12 @@ else:
         }
     }
 
+    # progress of import jobs is written in own connection,
+    # so it is visible before import transaction is committed.
+    # SQLite allows single writer, so without this connection
+    # progress is visible only when job finishes
+    DATABASES["import_progress"] = {**DATABASES["default"], "TEST" : {"MIRROR" : "default"}}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -144,6 +150,10 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static'
 ]
 
+# Uploaded files, e.g. files of import jobs
+MEDIA_ROOT = BASE_DIR / "media"
+MEDIA_URL = "media/"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -161,3 +171,49 @@ REST_FRAMEWORK = {
     ),
     "EXCEPTION_HANDLER": "api.handlers.exception_response_handler",
 }
+
+
+# Events are expanded from AbstractEvents on reading
+# instead of using materialized Event rows
+VIRTUAL_EVENTS = getenv("VIRTUAL_EVENTS", "false").lower() == "true"
+
+
+# Writes dateaccessed of loaded records after requests, so read endpoints
+# make writes when enabled. Disabled by default
+ACCESS_TRACKING = getenv("ACCESS_TRACKING", "false").lower() == "true"
+# Accessed records are written when request finished and by long-running
+# workers when buffer is full or interval in seconds passed
+ACCESS_TRACKING_BUFFER_SIZE = int(getenv("ACCESS_TRACKING_BUFFER_SIZE", "1000"))
+ACCESS_TRACKING_FLUSH_INTERVAL = int(getenv("ACCESS_TRACKING_FLUSH_INTERVAL", "60"))
+
+# Seconds after which room occupancy bitmaps of date are reloaded
+# even if no Event changes were seen by this process
+ROOM_OCCUPANCY_TTL = int(getenv("ROOM_OCCUPANCY_TTL", "300"))
+
+# Seconds after which occupancy index of AbstractEvents used for conflict
+# checking on save is reloaded even if no changes were seen by this process
+SCHEDULE_OCCUPANCY_TTL = int(getenv("SCHEDULE_OCCUPANCY_TTL", "300"))
+
+# Seconds without progress after which running import job
+# is considered to be lost by its worker and failed
+IMPORT_JOB_TIMEOUT = int(getenv("IMPORT_JOB_TIMEOUT", "3600"))
+# Seconds after which file checked on import preview page
+# and not confirmed is deleted
+IMPORT_PREVIEW_TIMEOUT = int(getenv("IMPORT_PREVIEW_TIMEOUT", "3600"))
+
+# Journal of bulk changes made in Events
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+        },
+    },
+    "loggers": {
+        "api": {
+            "handlers": ["console"],
+            "level": getenv("API_LOG_LEVEL", "INFO"),
+        },
+    },
+}